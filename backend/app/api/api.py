@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import users, auth, posts, categories, comments, tags
+from app.api.endpoints import admin, users, auth, posts, categories, comments, tags, search
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
@@ -8,4 +8,6 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(posts.router, prefix="/posts", tags=["posts"])
 api_router.include_router(categories.router, prefix="/categories", tags=["categories"])
 api_router.include_router(comments.router, prefix="/comments", tags=["comments"])
-api_router.include_router(tags.router, prefix="/tags", tags=["tags"])
\ No newline at end of file
+api_router.include_router(tags.router, prefix="/tags", tags=["tags"])
+api_router.include_router(search.router, prefix="/search", tags=["search"])
+api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
@@ -0,0 +1,151 @@
+from typing import Any, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pymongo.database import Database
+
+from app.core.auth import get_current_active_superuser
+from app.core.cache import response_cache
+from app.core.hashing import password_hasher
+from app.core.revocation import revocation_store
+from app.core.user_cache import user_cache
+from app.db.mongodb import get_database, pool_settings
+from app.db.pool_monitor import pool_monitor
+from app.models.bulk import ImportReport
+from app.models.user import UserInDB
+from app.services.export import (
+    EXPORT_COLLECTIONS, FILE_EXTENSIONS, MEDIA_TYPES, export_query, make_compressor, make_decompressor,
+    read_ndjson, stream_export,
+)
+from app.services.importer import import_ndjson
+from app.services.search import search_service
+
+router = APIRouter()
+
+
+@router.get("/cache")
+async def read_cache_stats(
+    current_user: UserInDB = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Hit, miss and eviction counters of the response cache.
+    """
+    return await response_cache.stats()
+
+
+@router.get("/user-cache")
+async def read_user_cache_stats(
+    current_user: UserInDB = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Hit, miss and eviction counters of this worker's authenticated-user cache.
+    """
+    return user_cache.stats()
+
+
+@router.get("/mongo-pool")
+async def read_mongo_pool_stats(
+    current_user: UserInDB = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    This worker's MongoDB connection pools: open and checked-out connections, waiters and wait times per server.
+    """
+    return {**pool_settings(), "pools": pool_monitor.stats()}
+
+
+@router.get("/password-hashing")
+async def read_password_hashing_stats(
+    current_user: UserInDB = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Queue depth, throughput and rehash counters of this worker's bcrypt pool.
+    """
+    return password_hasher.stats()
+
+
+@router.get("/revocations")
+async def read_revocation_stats(
+    current_user: UserInDB = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Size and freshness of this worker's token revocation list (claims mode).
+    """
+    return revocation_store.stats()
+
+
+@router.get("/search")
+async def read_search_stats(
+    current_user: UserInDB = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Size and readiness of the full-text search index.
+    """
+    return await search_service.stats()
+
+
+@router.get("/export/{collection}")
+async def export_collection(
+    collection: str,
+    db: Database = Depends(get_database),
+    compression: str = Query("gzip", pattern="^(none|gzip|zstd)$"),
+    after: Optional[str] = None,
+    include_password_hashes: bool = False,
+    current_user: UserInDB = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Stream a collection as NDJSON (MongoDB relaxed Extended JSON), one document per line in _id order.
+
+    To resume an interrupted download, pass the `_id` of the last complete
+    line as `after`. Password hashes are left out of user exports unless
+    `include_password_hashes` is set.
+    """
+    if collection not in EXPORT_COLLECTIONS:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown collection: {collection}",
+        )
+    # Check the parameters before the response starts streaming
+    try:
+        export_query(after)
+        make_compressor(compression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    filename = collection + FILE_EXTENSIONS[compression]
+    return StreamingResponse(
+        stream_export(db, collection, compression, after, include_password_hashes),
+        media_type=MEDIA_TYPES[compression],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/import/{collection}", response_model=ImportReport)
+async def import_collection(
+    collection: str,
+    request: Request,
+    db: Database = Depends(get_database),
+    compression: Optional[str] = Query(None, pattern="^(none|gzip|zstd)$"),
+    current_user: UserInDB = Depends(get_current_active_superuser),
+) -> Any:
+    """
+    Import NDJSON records, as written by the export, from the request body.
+
+    The body is read as a stream and inserted in chunks; invalid records,
+    unknown references and duplicates are reported per line without
+    aborting the import. Posts without an `author_id` are attributed to the
+    caller. Counters, caches and the search index are updated at the end.
+    """
+    if collection not in EXPORT_COLLECTIONS:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown collection: {collection}",
+        )
+    if compression is None:
+        compression = "gzip" if request.headers.get("content-encoding") == "gzip" else "none"
+    try:
+        make_decompressor(compression)
+        return await import_ndjson(
+            db, collection, read_ndjson(request.stream(), compression), default_author_id=current_user.id,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,19 +1,41 @@
 from datetime import timedelta
 from typing import Any
 
+from bson import ObjectId
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from jose import JWTError, jwt
 from pymongo.database import Database
 
 from app.core.auth import authenticate_user
 from app.core.config import settings
-from app.core.security import create_access_token, get_password_hash
+from app.core.hashing import password_hasher
+from app.core.security import create_access_token, create_refresh_token, user_claims
 from app.db.mongodb import get_database
-from app.models.user import Token, UserCreate, UserInDB
+from app.models.user import Token, TokenRefresh, UserCreate, UserInDB
 
 router = APIRouter()
 
 
+def _issue_tokens(user: dict) -> dict:
+    """
+    A new access and refresh token pair for a user document.
+    """
+    if settings.AUTH_MODE == "claims":
+        # Claims are trusted until the token expires, so keep that short
+        access_token_expires = timedelta(minutes=settings.CLAIMS_ACCESS_TOKEN_EXPIRE_MINUTES)
+    else:
+        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    user_id = str(user.get("_id", user.get("id")))
+    return {
+        "access_token": create_access_token(
+            user_id, expires_delta=access_token_expires, claims=user_claims(user)
+        ),
+        "refresh_token": create_refresh_token(user_id, user.get("token_version", 0)),
+        "token_type": "bearer",
+    }
+
+
 @router.post("/login", response_model=Token)
 async def login_access_token(
     db: Database = Depends(get_database), form_data: OAuth2PasswordRequestForm = Depends()
@@ -28,13 +50,39 @@ async def login_access_token(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    return {
-        "access_token": create_access_token(
-            user.id, expires_delta=access_token_expires
-        ),
-        "token_type": "bearer",
-    }
+    return _issue_tokens(user.dict())
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(
+    token_in: TokenRefresh, db: Database = Depends(get_database)
+) -> Any:
+    """
+    Exchange a refresh token for a new token pair carrying the user's current claims
+    """
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(
+            token_in.refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+    except JWTError:
+        raise credentials_exception
+    if payload.get("typ") != "refresh":
+        raise credentials_exception
+    try:
+        user = await db.users.find_one({"_id": ObjectId(payload.get("sub"))})
+    except:
+        raise credentials_exception
+    if not user:
+        raise credentials_exception
+    # Revoked refresh tokens and deactivated users get no new tokens
+    if payload.get("tv", 0) < user.get("token_version", 0) or not user.get("is_active", True):
+        raise credentials_exception
+    return _issue_tokens(user)
 
 
 @router.post("/register", response_model=UserInDB, status_code=status.HTTP_201_CREATED)
@@ -63,7 +111,7 @@ async def register_user(
             )
     
     # Create new user
-    hashed_password = get_password_hash(user_in.password)
+    hashed_password = await password_hasher.hash(user_in.password)
     user_data = user_in.dict()
     user_data["hashed_password"] = hashed_password
     user_data["is_active"] = True
@@ -1,35 +1,59 @@
 from typing import Any, List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from pymongo.database import Database
 from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 from datetime import datetime
 
 from app.core.auth import get_current_active_superuser, get_current_active_user
+from app.core.cache import make_cache_key, response_cache
+from app.core.http_cache import is_not_modified, make_etag, not_modified, set_validators
 from app.db.mongodb import get_database
+from app.db.read_routing import get_read_database
 from app.models.category import Category, CategoryCreate, CategoryUpdate, CategoryWithCount
 from app.models.user import UserInDB
+from app.services.versions import get_versions
+from app.services.invalidation import CATEGORIES_TAG, invalidate_category
 
 router = APIRouter()
 
+# Post writes move the post counters stored on categories
+CATEGORY_PAYLOAD_COLLECTIONS = ("categories", "posts")
+
 
 @router.get("/", response_model=List[CategoryWithCount])
 async def read_categories(
-    db: Database = Depends(get_database),
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_read_database),
     skip: int = 0,
     limit: int = 100,
 ) -> Any:
     """
     Retrieve categories with post count.
     """
+    cache_key = make_cache_key("categories", skip=skip, limit=limit)
+    versions, last_modified = await get_versions(db, CATEGORY_PAYLOAD_COLLECTIONS)
+    etag = make_etag(cache_key, *(versions[name] for name in CATEGORY_PAYLOAD_COLLECTIONS))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    
+    # Keyed by the entity tag, so version bumps made anywhere, the CLIs included, retire old entries
+    cached = await response_cache.get(etag)
+    if cached is not None:
+        return cached
+    
     categories = await db.categories.find().skip(skip).limit(limit).to_list(length=limit)
     result = []
     for category in categories:
         category["id"] = str(category.pop("_id"))
-        # Count posts in this category
-        post_count = await db.posts.count_documents({"category_id": category["id"]})
-        result.append(CategoryWithCount(**category, post_count=post_count))
+        # Post count is maintained on the document itself
+        result.append(CategoryWithCount(**category))
+    result = jsonable_encoder(result)
+    await response_cache.set(etag, result, {CATEGORIES_TAG})
     return result
 
 
@@ -53,8 +77,10 @@ async def create_category(
         category_data = category_in.dict()
         category_data["created_at"] = datetime.utcnow()
         category_data["updated_at"] = category_data["created_at"]
+        category_data["post_count"] = 0
         result = await db.categories.insert_one(category_data)
         category_data["id"] = str(result.inserted_id)
+        await invalidate_category(db, category_data["id"])
         return category_data
     except DuplicateKeyError:
         raise HTTPException(
@@ -66,12 +92,26 @@ async def create_category(
 @router.get("/{category_id}", response_model=CategoryWithCount)
 async def read_category(
     *,
-    db: Database = Depends(get_database),
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_read_database),
     category_id: str,
 ) -> Any:
     """
     Get category by ID.
     """
+    cache_key = make_cache_key("category", id=category_id)
+    versions, last_modified = await get_versions(db, CATEGORY_PAYLOAD_COLLECTIONS)
+    etag = make_etag(cache_key, *(versions[name] for name in CATEGORY_PAYLOAD_COLLECTIONS))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    
+    # Keyed by the entity tag, so version bumps made anywhere, the CLIs included, retire old entries
+    cached = await response_cache.get(etag)
+    if cached is not None:
+        return cached
+    
     try:
         category = await db.categories.find_one({"_id": ObjectId(category_id)})
     except:
@@ -85,9 +125,9 @@ async def read_category(
             detail="The category with this id does not exist in the system",
         )
     category["id"] = str(category.pop("_id"))
-    # Count posts in this category
-    post_count = await db.posts.count_documents({"category_id": category["id"]})
-    return CategoryWithCount(**category, post_count=post_count)
+    result = jsonable_encoder(CategoryWithCount(**category))
+    await response_cache.set(etag, result, {CATEGORIES_TAG, f"category:{category_id}"})
+    return result
 
 
 @router.put("/{category_id}", response_model=Category)
@@ -125,10 +165,11 @@ async def update_category(
     
     category_data = category.copy()
     update_data = category_in.dict(exclude_unset=True)
-    for field in update_data:
-        category_data[field] = update_data[field]
-    category_data["updated_at"] = datetime.utcnow()
-    await db.categories.update_one({"_id": ObjectId(category_id)}, {"$set": category_data})
+    update_data["updated_at"] = datetime.utcnow()
+    category_data.update(update_data)
+    # Only set the changed fields so concurrent post count updates are preserved
+    await db.categories.update_one({"_id": ObjectId(category_id)}, {"$set": update_data})
+    await invalidate_category(db, category_id)
     category_data["id"] = str(category_data.pop("_id"))
     return category_data
 
@@ -165,5 +206,6 @@ async def delete_category(
         )
     
     await db.categories.delete_one({"_id": ObjectId(category_id)})
+    await invalidate_category(db, category_id)
     category["id"] = str(category.pop("_id"))
     return category
\ No newline at end of file
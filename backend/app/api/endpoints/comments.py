@@ -1,30 +1,59 @@
 from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request, Response, status
 from pymongo.database import Database
 from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 from datetime import datetime
 
-from app.core.auth import get_current_active_superuser, get_current_active_user
+from app.core.auth import get_current_active_superuser, get_current_active_user, get_current_user_optional
+from app.core.http_cache import is_not_modified, make_etag, not_modified, set_validators
 from app.db.mongodb import get_database
-from app.models.comment import Comment, CommentCreate, CommentUpdate
+from app.db.read_routing import get_read_database
+from app.models.bulk import BulkActionResult
+from app.models.comment import Comment, CommentCreate, CommentSelection, CommentUpdate, PendingCount
 from app.models.user import UserInDB
+from app.services.counters import adjust_comment_counts
+from app.services.invalidation import invalidate_post_comments
+from app.services.moderation import author_post_ids, moderate_comments, owned_post_ids, pending_query, selection_query
+from app.services.pagination import KEYSET_SORT, NEXT_CURSOR_HEADER, apply_cursor, next_cursor
+from app.services.versions import get_versions
 
 router = APIRouter()
 
+# The pending badge stops counting here and reports "at least" this many
+PENDING_COUNT_LIMIT = 1000
+
+
+async def _pending_scope(db: Database, current_user: UserInDB, post_id: Optional[str]) -> dict:
+    """
+    Moderation queue filter: every pending comment for superusers, those on their own posts for authors.
+    """
+    if current_user.is_superuser:
+        return pending_query([post_id] if post_id else None)
+    if post_id:
+        post_ids = list(await owned_post_ids(db, current_user.id, [post_id]))
+    else:
+        post_ids = await author_post_ids(db, current_user.id)
+    return pending_query(post_ids)
+
 
 @router.get("/", response_model=List[Comment])
 async def read_comments(
-    db: Database = Depends(get_database),
+    response: Response,
+    db: Database = Depends(get_read_database),
     post_id: Optional[str] = None,
     approved_only: bool = True,
     skip: int = 0,
     limit: int = 100,
-    current_user: Optional[UserInDB] = Depends(get_current_active_user),
+    cursor: Optional[str] = None,
+    current_user: Optional[UserInDB] = Depends(get_current_user_optional),
 ) -> Any:
     """
     Retrieve comments with filtering options.
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to fetch the next
+    page without the cost of `skip`.
     """
     # Build query
     query = {}
@@ -33,12 +62,25 @@ async def read_comments(
     if post_id:
         query["post_id"] = post_id
     
-    # Filter by approval status
-    if approved_only and (not current_user or not current_user.is_superuser):
+    # Filter by approval status; only superusers may list unapproved comments
+    if approved_only or not (current_user and current_user.is_superuser):
         query["is_approved"] = True
     
+    # Continue after the cursor position when one is given
+    try:
+        query = apply_cursor(query, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     # Fetch comments
-    comments = await db.comments.find(query).sort("date", -1).skip(skip).limit(limit).to_list(length=limit)
+    comments_cursor = db.comments.find(query).sort(KEYSET_SORT)
+    if not cursor:
+        comments_cursor = comments_cursor.skip(skip)
+    comments = await comments_cursor.limit(limit).to_list(length=limit)
+    
+    next_page = next_cursor(comments, limit)
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
     
     # Process comments
     for comment in comments:
@@ -52,7 +94,7 @@ async def create_comment(
     *,
     db: Database = Depends(get_database),
     comment_in: CommentCreate,
-    current_user: Optional[UserInDB] = Depends(None),
+    current_user: Optional[UserInDB] = Depends(get_current_user_optional),
 ) -> Any:
     """
     Create new comment.
@@ -94,16 +136,115 @@ async def create_comment(
         comment_data["author_email"] = current_user.email
     
     result = await db.comments.insert_one(comment_data)
+    await adjust_comment_counts(
+        db, comment_data["post_id"], total=1, approved=1 if comment_data["is_approved"] else 0
+    )
+    await invalidate_post_comments(db, comment_data["post_id"])
     comment_data["id"] = str(result.inserted_id)
     return comment_data
 
 
+@router.get("/pending", response_model=List[Comment])
+async def read_pending_comments(
+    response: Response,
+    db: Database = Depends(get_database),
+    post_id: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    current_user: UserInDB = Depends(get_current_active_user),
+) -> Any:
+    """
+    Comments awaiting approval, newest first.
+
+    Superusers see every pending comment and authors those on their own
+    posts. Pass the `X-Next-Cursor` response header back as `cursor` to
+    fetch the next page.
+    """
+    query = await _pending_scope(db, current_user, post_id)
+    
+    # Continue after the cursor position when one is given
+    try:
+        query = apply_cursor(query, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    comments = await db.comments.find(query).sort(KEYSET_SORT).limit(limit).to_list(length=limit)
+    
+    next_page = next_cursor(comments, limit)
+    if next_page:
+        response.headers[NEXT_CURSOR_HEADER] = next_page
+    
+    for comment in comments:
+        comment["id"] = str(comment.pop("_id"))
+    return comments
+
+
+@router.get("/pending/count", response_model=PendingCount)
+async def read_pending_count(
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_database),
+    current_user: UserInDB = Depends(get_current_active_user),
+) -> Any:
+    """
+    Number of comments awaiting the caller's approval, for a badge.
+
+    Counting stops at `PENDING_COUNT_LIMIT` (`capped` is then set), and the
+    response revalidates with an ETag that changes with any comment write.
+    """
+    versions, last_modified = await get_versions(db, ["comments"])
+    etag = make_etag("comments:pending", current_user.id, current_user.is_superuser, versions["comments"])
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    response.headers["Cache-Control"] = "private, no-cache"
+    
+    query = await _pending_scope(db, current_user, None)
+    count = await db.comments.count_documents(query, limit=PENDING_COUNT_LIMIT)
+    return {"count": count, "capped": count >= PENDING_COUNT_LIMIT}
+
+
+@router.post("/bulk/{action}", response_model=BulkActionResult)
+async def moderate_comments_in_bulk(
+    *,
+    db: Database = Depends(get_database),
+    action: str = Path(..., pattern="^(approve|reject|delete)$"),
+    selection: CommentSelection,
+    current_user: UserInDB = Depends(get_current_active_user),
+) -> Any:
+    """
+    Approve, reject (unapprove) or delete many comments at once.
+
+    Comments are selected by `ids`, `post_id` and/or `author_email`; all
+    given criteria must match. Authors may only moderate comments on their
+    own posts, which is checked once per affected post.
+    """
+    try:
+        query = selection_query(selection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Check permissions
+    if not current_user.is_superuser:
+        post_ids = set(await db.comments.distinct("post_id", query))
+        owned = await owned_post_ids(db, current_user.id, post_ids)
+        if post_ids - owned:
+            raise HTTPException(
+                status_code=403,
+                detail=f"Not authorized to {action} some of these comments",
+            )
+        # Comments matching the selection later, e.g. on other posts, stay out of reach
+        query["post_id"] = {"$in": list(owned)}
+    
+    return await moderate_comments(db, action, query)
+
+
 @router.get("/{comment_id}", response_model=Comment)
 async def read_comment(
     *,
     db: Database = Depends(get_database),
     comment_id: str,
-    current_user: Optional[UserInDB] = Depends(None),
+    current_user: Optional[UserInDB] = Depends(get_current_user_optional),
 ) -> Any:
     """
     Get comment by ID.
@@ -185,7 +326,32 @@ async def update_comment(
         comment_data[field] = update_data[field]
     comment_data["updated_at"] = datetime.utcnow()
     
-    await db.comments.update_one({"_id": ObjectId(comment_id)}, {"$set": comment_data})
+    # Write only over the state the counter deltas below are computed from;
+    # an approval or move made meanwhile would otherwise be counted twice
+    result = await db.comments.update_one(
+        {
+            "_id": ObjectId(comment_id),
+            "post_id": comment["post_id"],
+            "is_approved": True if comment.get("is_approved") else {"$ne": True},
+        },
+        {"$set": comment_data},
+    )
+    if not result.modified_count:
+        raise HTTPException(
+            status_code=409,
+            detail="The comment was changed by another request; reload it and try again",
+        )
+    
+    # Keep the post counters in sync when the comment moves or changes approval
+    was_approved = 1 if comment.get("is_approved") else 0
+    is_approved = 1 if comment_data.get("is_approved") else 0
+    if comment_data["post_id"] != comment["post_id"]:
+        await adjust_comment_counts(db, comment["post_id"], total=-1, approved=-was_approved)
+        await adjust_comment_counts(db, comment_data["post_id"], total=1, approved=is_approved)
+        await invalidate_post_comments(db, comment_data["post_id"])
+    else:
+        await adjust_comment_counts(db, comment["post_id"], approved=is_approved - was_approved)
+    await invalidate_post_comments(db, comment["post_id"])
     comment_data["id"] = str(comment_data.pop("_id"))
     return comment_data
 
@@ -229,7 +395,12 @@ async def delete_comment(
             )
     
     # Delete the comment
-    await db.comments.delete_one({"_id": ObjectId(comment_id)})
+    result = await db.comments.delete_one({"_id": ObjectId(comment_id)})
+    if result.deleted_count:
+        await adjust_comment_counts(
+            db, comment["post_id"], total=-1, approved=-1 if comment.get("is_approved") else 0
+        )
+        await invalidate_post_comments(db, comment["post_id"])
     comment["id"] = str(comment.pop("_id"))
     return comment
 
@@ -277,6 +448,13 @@ async def approve_comment(
     comment_data["is_approved"] = True
     comment_data["updated_at"] = datetime.utcnow()
     
-    await db.comments.update_one({"_id": ObjectId(comment_id)}, {"$set": comment_data})
+    # Only count the approval once, even if two moderators race on it
+    result = await db.comments.update_one(
+        {"_id": ObjectId(comment_id), "is_approved": {"$ne": True}},
+        {"$set": comment_data},
+    )
+    if result.modified_count:
+        await adjust_comment_counts(db, comment["post_id"], approved=1)
+        await invalidate_post_comments(db, comment["post_id"])
     comment_data["id"] = str(comment_data.pop("_id"))
     return comment_data
\ No newline at end of file
@@ -1,140 +1,272 @@
-from typing import Any, List, Optional
+from typing import Any, List, Optional, Set
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pymongo.database import Database
-from pymongo.errors import DuplicateKeyError
+from pymongo.errors import DuplicateKeyError, ExecutionTimeout
 from bson import ObjectId
 from datetime import datetime
 
-from app.core.auth import get_current_active_superuser, get_current_active_user
+from app.core.auth import get_current_active_superuser, get_current_active_user, get_current_user_optional
+from app.core.config import settings
+from app.core.cache import make_cache_key, response_cache
+from app.core.http_cache import is_not_modified, make_etag, not_modified, set_validators
 from app.db.mongodb import get_database
-from app.models.post import Post, PostCreate, PostUpdate, PostWithDetails
+from app.db.read_routing import get_read_database
+from app.models.post import Post, PostCreate, PostFacets, PostUpdate, PostWithDetails
 from app.models.user import UserInDB
+from app.services.counters import apply_post_count_changes
+from app.services.invalidation import invalidate_post, invalidate_post_comments, post_listing_tags, post_payload_tags
+from app.services.pagination import NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, apply_cursor, next_cursor
+from app.services.query_planner import INDEXED
+from app.services.search import search_service
+from app.services.facets import compute_facets
+from app.services.loaders import Loaders, get_loaders, get_read_loaders, to_object_ids
+from app.services.post_filters import KEYSET_SORTS, POST_SORTS, PostFilters, check_query_plan, get_post_filters
+from app.services.posts import add_post_details, enrich_posts, parse_fields, post_projection, select_fields
+from app.services.rendering import needs_render, render_post_text
+from app.services.text import summarize
+from app.services.versions import get_versions
 
 router = APIRouter()
 
+# Collections whose contents end up in a PostWithDetails payload
+POST_PAYLOAD_COLLECTIONS = ("posts", "users", "categories", "tags")
+# Facets of a search cover this many of the best matches
+FACET_SEARCH_LIMIT = 1000
+
+
+async def _verify_references(loaders: Loaders, category_id: Optional[str], tag_ids: Optional[List[str]]) -> None:
+    """
+    Raise a 404 unless the category and every tag exist; lookups are batched per collection.
+    """
+    tag_ids = tag_ids or []
+    if category_id and not ObjectId.is_valid(category_id):
+        raise HTTPException(
+            status_code=404,
+            detail="Invalid category ID",
+        )
+    for tag_id in tag_ids:
+        if not ObjectId.is_valid(tag_id):
+            raise HTTPException(
+                status_code=404,
+                detail=f"Invalid tag ID: {tag_id}",
+            )
+    
+    category = loaders.categories.load(category_id) if category_id else None
+    tags = loaders.tags.load_many(tag_ids)
+    if category is not None and not await category:
+        raise HTTPException(
+            status_code=404,
+            detail="The category does not exist in the system",
+        )
+    for tag_id, tag in zip(tag_ids, await tags):
+        if not tag:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Tag with ID {tag_id} does not exist in the system",
+            )
+
+
+def _listing(items: List[dict], selected: Optional[Set[str]], response: Response) -> Any:
+    # Sparse items would fail PostWithDetails validation, so they bypass the response model
+    if selected is None:
+        return items
+    return JSONResponse(content=items, headers=dict(response.headers))
+
 
 @router.get("/", response_model=List[PostWithDetails])
 async def read_posts(
-    db: Database = Depends(get_database),
-    skip: int = 0,
-    limit: int = 10,
-    category_id: Optional[str] = None,
-    tag_id: Optional[str] = None,
-    author_id: Optional[str] = None,
-    search: Optional[str] = None,
-    include_invisible: bool = False,
-    current_user: Optional[UserInDB] = Depends(get_current_active_user),
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_read_database),
+    loaders: Loaders = Depends(get_read_loaders),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    filters: PostFilters = Depends(get_post_filters),
+    sort: str = Query("newest", pattern="^(newest|oldest|title|popular)$"),
+    fields: Optional[str] = None,
+    view: Optional[str] = Query(None, pattern="^(full|summary)$"),
+    current_user: Optional[UserInDB] = Depends(get_current_user_optional),
 ) -> Any:
     """
     Retrieve posts with filtering options.
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to fetch the next
+    page without the cost of `skip`. Public listings support conditional requests.
+    `fields` (comma separated) returns only the named fields, and `view=summary`
+    returns the stored excerpt, word count and reading time in place of `text`.
+    `search` results are ranked by relevance with a highlighted `snippet`, and
+    the `X-Total-Count` header holds the number of matches.
+
+    `sort` orders by `newest` (default), `oldest`, `title` or `popular`; only the
+    date orders are paged by cursor. Combinations of filters and sort that no
+    index serves are refused, and partly served ones only page through their
+    first `QUERY_CAPPED_WINDOW` posts.
     """
-    # Build query
-    query = {}
-    
-    # Filter by visibility
-    if not include_invisible or not current_user or (not current_user.is_superuser and not author_id == current_user.id):
-        query["is_visible"] = True
-    
-    # Filter by category
-    if category_id:
-        query["category_id"] = category_id
-    
-    # Filter by tag
-    if tag_id:
-        query["tags"] = tag_id
-    
-    # Filter by author
-    if author_id:
-        query["author_id"] = author_id
-    
-    # Search in title and text
-    if search:
-        query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"text": {"$regex": search, "$options": "i"}}
-        ]
+    # Sparse fieldsets are read with a projection and skip model validation
+    try:
+        selected = parse_fields(fields, view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if cursor and sort not in KEYSET_SORTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cursor paging is not supported for sort={sort}",
+        )
     
-    # Fetch posts
-    cursor = db.posts.find(query).sort("date", -1).skip(skip).limit(limit)
-    posts = await cursor.to_list(length=limit)
+    query, ranked = filters.build_query(current_user)
     
-    # Enhance posts with details
-    result = []
-    for post in posts:
-        post["id"] = str(post.pop("_id"))
+    # Public listings are the same for every caller and can be served from cache
+    cache_key = None
+    if query.get("is_visible"):
+        cache_key = make_cache_key(
+            "posts", skip=None if cursor else skip, limit=limit, cursor=cursor,
+            **filters.cache_params(), sort=None if ranked else sort, ranked=ranked,
+            fields=",".join(sorted(selected)) if selected is not None else None,
+        )
+        versions, last_modified = await get_versions(db, POST_PAYLOAD_COLLECTIONS)
+        etag = make_etag(cache_key, *(versions[name] for name in POST_PAYLOAD_COLLECTIONS))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+        set_validators(response, etag, last_modified)
         
-        # Get author info
-        author = await db.users.find_one({"_id": ObjectId(post["author_id"])})
-        author_name = author["full_name"] if author and author.get("full_name") else author["username"] if author else "Unknown"
+        # Keyed by the entity tag, so version bumps made anywhere, the CLIs included, retire old entries
+        cached = await response_cache.get(etag)
+        if cached is not None:
+            if cached["next_cursor"]:
+                response.headers[NEXT_CURSOR_HEADER] = cached["next_cursor"]
+            if cached.get("total") is not None:
+                response.headers[TOTAL_COUNT_HEADER] = str(cached["total"])
+            return _listing(cached["items"], selected, response)
+    
+    projection = post_projection(selected) if selected is not None else None
+    total = None
+    next_page = None
+    if ranked:
+        # Relevance order has no keyset, so search results are paged with skip
+        terms, total, hits = search_service.search(
+            filters.search, **filters.search_filters(current_user), offset=skip, limit=limit,
+        )
+        response.headers[TOTAL_COUNT_HEADER] = str(total)
+        posts = await search_service.load_hits(db, hits, terms, projection)
+    else:
+        order = POST_SORTS[sort]
+        plan = check_query_plan(query, order, skip, limit, current_user)
         
-        # Get category info
-        category = await db.categories.find_one({"_id": ObjectId(post["category_id"])})
-        category_name = category["name"] if category else "Uncategorized"
+        # Continue after the cursor position when one is given
+        try:
+            query = apply_cursor(query, cursor, ascending=KEYSET_SORTS.get(sort, False))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Count comments
-        comment_count = await db.comments.count_documents({"post_id": post["id"]})
+        # Fetch posts; shapes an index does not fully serve get a time limit
+        posts_cursor = db.posts.find(query, projection).sort(order)
+        if not cursor:
+            posts_cursor = posts_cursor.skip(skip)
+        if plan.shape != INDEXED:
+            posts_cursor = posts_cursor.max_time_ms(settings.QUERY_MAX_TIME_MS)
+        try:
+            posts = await posts_cursor.limit(limit).to_list(length=limit)
+        except ExecutionTimeout:
+            raise HTTPException(
+                status_code=503,
+                detail="The listing query took too long; narrow the filters",
+            )
         
-        # Get tag info
-        tags_info = []
-        if "tags" in post and post["tags"]:
-            for tag_id in post["tags"]:
-                tag = await db.tags.find_one({"_id": ObjectId(tag_id)})
-                if tag:
-                    tags_info.append({"id": str(tag["_id"]), "name": tag["name"]})
+        if sort in KEYSET_SORTS:
+            next_page = next_cursor(posts, limit)
+            if next_page:
+                response.headers[NEXT_CURSOR_HEADER] = next_page
+    
+    # Enhance posts with details
+    if selected is None:
+        posts = jsonable_encoder(await enrich_posts(loaders, posts))
+        items = posts
+    else:
+        posts = jsonable_encoder(await add_post_details(loaders, posts))
+        items = [select_fields(post, selected) for post in posts]
+    if cache_key:
+        tags = post_listing_tags(filters.categories, filters.tags, filters.author_id) | post_payload_tags(posts)
+        await response_cache.set(etag, {"items": items, "next_cursor": next_page, "total": total}, tags)
+    return _listing(items, selected, response)
+
+
+@router.get("/facets", response_model=PostFacets)
+async def read_post_facets(
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_read_database),
+    loaders: Loaders = Depends(get_read_loaders),
+    filters: PostFilters = Depends(get_post_filters),
+    facet_limit: int = Query(20, ge=1, le=100),
+    current_user: Optional[UserInDB] = Depends(get_current_user_optional),
+) -> Any:
+    """
+    Category, tag, author and month counts of the posts matching the listing filters.
+
+    Everything is computed by a single aggregation, which reads every matching
+    post and so runs under `QUERY_MAX_TIME_MS`; filters no index can narrow are
+    refused as for listings. Search facets describe the best `FACET_SEARCH_LIMIT` matches.
+    """
+    query, ranked = filters.build_query(current_user)
+    
+    # Public facets are the same for every caller and can be served from cache
+    cache_key = None
+    if query.get("is_visible"):
+        cache_key = make_cache_key(
+            "posts:facets", **filters.cache_params(), ranked=ranked, limit=facet_limit,
+        )
+        versions, last_modified = await get_versions(db, POST_PAYLOAD_COLLECTIONS)
+        etag = make_etag(cache_key, *(versions[name] for name in POST_PAYLOAD_COLLECTIONS))
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified)
+        set_validators(response, etag, last_modified)
         
-        # Create enhanced post
-        post_with_details = PostWithDetails(
-            **post,
-            author_name=author_name,
-            category_name=category_name,
-            comment_count=comment_count,
-            tags_info=tags_info
+        # Keyed by the entity tag, so version bumps made anywhere, the CLIs included, retire old entries
+        cached = await response_cache.get(etag)
+        if cached is not None:
+            return cached
+    
+    # Search results are bounded by FACET_SEARCH_LIMIT; other filters must be narrowed by an index
+    check_query_plan(query, [], 0, 0, current_user)
+    if ranked:
+        _, _, hits = search_service.search(
+            filters.search, **filters.search_filters(current_user), limit=FACET_SEARCH_LIMIT,
         )
-        result.append(post_with_details)
+        query["_id"] = {"$in": to_object_ids(post_id for post_id, _ in hits)}
     
-    return result
+    try:
+        facets = await compute_facets(db, loaders, query, facet_limit, max_time_ms=settings.QUERY_MAX_TIME_MS)
+    except ExecutionTimeout:
+        raise HTTPException(
+            status_code=503,
+            detail="The facet query took too long; narrow the filters",
+        )
+    if cache_key:
+        tags = post_listing_tags(filters.categories, filters.tags, filters.author_id)
+        tags |= {f"category:{bucket['id']}" for bucket in facets["categories"]}
+        tags |= {f"tag:{bucket['id']}" for bucket in facets["tags"]}
+        tags |= {f"user:{bucket['id']}" for bucket in facets["authors"]}
+        await response_cache.set(etag, facets, tags)
+    return facets
 
 
 @router.post("/", response_model=Post, status_code=status.HTTP_201_CREATED)
 async def create_post(
     *,
     db: Database = Depends(get_database),
+    loaders: Loaders = Depends(get_loaders),
     post_in: PostCreate,
     current_user: UserInDB = Depends(get_current_active_user),
 ) -> Any:
     """
     Create new post.
     """
-    # Verify category exists
-    try:
-        category = await db.categories.find_one({"_id": ObjectId(post_in.category_id)})
-        if not category:
-            raise HTTPException(
-                status_code=404,
-                detail="The category does not exist in the system",
-            )
-    except:
-        raise HTTPException(
-            status_code=404,
-            detail="Invalid category ID",
-        )
-    
-    # Verify tags exist
-    if post_in.tags:
-        for tag_id in post_in.tags:
-            try:
-                tag = await db.tags.find_one({"_id": ObjectId(tag_id)})
-                if not tag:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Tag with ID {tag_id} does not exist in the system",
-                    )
-            except:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Invalid tag ID: {tag_id}",
-                )
+    # Verify category and tags exist
+    await _verify_references(loaders, post_in.category_id, post_in.tags)
     
     # Create post
     post_data = post_in.dict()
@@ -142,89 +274,108 @@ async def create_post(
     post_data["date"] = datetime.utcnow()
     post_data["created_at"] = datetime.utcnow()
     post_data["updated_at"] = post_data["created_at"]
+    post_data["comment_count"] = 0
+    post_data["approved_comment_count"] = 0
+    post_data["version"] = 1
+    post_data.update(summarize(post_data["text"]))
+    post_data.update(await render_post_text(post_data["text"]))
     
     # Only admins can directly publish posts
     if not current_user.is_superuser:
         post_data["is_visible"] = False
     
     result = await db.posts.insert_one(post_data)
+    await apply_post_count_changes(db, None, post_data)
     post_data["id"] = str(result.inserted_id)
+    search_service.index_post(post_data)
+    await invalidate_post(db, post_data)
     return post_data
 
 
 @router.get("/{post_id}", response_model=PostWithDetails)
 async def read_post(
     *,
-    db: Database = Depends(get_database),
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_read_database),
+    loaders: Loaders = Depends(get_read_loaders),
     post_id: str,
-    current_user: Optional[UserInDB] = Depends(get_current_active_user),
+    current_user: Optional[UserInDB] = Depends(get_current_user_optional),
 ) -> Any:
     """
     Get post by ID.
+
+    Supports conditional requests: a matching `If-None-Match` or
+    `If-Modified-Since` gets a 304 after a cheap version lookup.
     """
     try:
-        post = await db.posts.find_one({"_id": ObjectId(post_id)})
+        post_meta = await db.posts.find_one(
+            {"_id": ObjectId(post_id)},
+            {"is_visible": 1, "author_id": 1, "updated_at": 1, "modified_at": 1, "version": 1},
+        )
     except:
         raise HTTPException(
             status_code=404,
             detail="The post with this id does not exist in the system",
         )
-    if not post:
+    if not post_meta:
         raise HTTPException(
             status_code=404,
             detail="The post with this id does not exist in the system",
         )
     
     # Check visibility permissions
-    if not post["is_visible"]:
+    if not post_meta["is_visible"]:
         if not current_user:
             raise HTTPException(
                 status_code=403,
                 detail="Not authorized to access this post",
             )
-        if not current_user.is_superuser and current_user.id != post["author_id"]:
+        if not current_user.is_superuser and current_user.id != post_meta["author_id"]:
             raise HTTPException(
                 status_code=403,
                 detail="Not authorized to access this post",
             )
     
-    post["id"] = str(post.pop("_id"))
-    
-    # Get author info
-    author = await db.users.find_one({"_id": ObjectId(post["author_id"])})
-    author_name = author["full_name"] if author and author.get("full_name") else author["username"] if author else "Unknown"
-    
-    # Get category info
-    category = await db.categories.find_one({"_id": ObjectId(post["category_id"])})
-    category_name = category["name"] if category else "Uncategorized"
-    
-    # Count comments
-    comment_count = await db.comments.count_documents({"post_id": post["id"]})
+    # Author, category and tag names are embedded, so their versions are part of the tag
+    versions, references_modified = await get_versions(db, ("users", "categories", "tags"))
+    etag = make_etag(
+        post_id, post_meta.get("updated_at"), post_meta.get("version", 0),
+        versions["users"], versions["categories"], versions["tags"],
+    )
+    last_modified = max(
+        filter(None, (post_meta.get("modified_at"), post_meta.get("updated_at"), references_modified)),
+        default=None,
+    )
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
     
-    # Get tag info
-    tags_info = []
-    if "tags" in post and post["tags"]:
-        for tag_id in post["tags"]:
-            tag = await db.tags.find_one({"_id": ObjectId(tag_id)})
-            if tag:
-                tags_info.append({"id": str(tag["_id"]), "name": tag["name"]})
+    # Only visible posts are cached, so a hit needs no further permission check
+    # Keyed by the entity tag, so re-renders and version bumps made anywhere retire old entries
+    cached = await response_cache.get(etag)
+    if cached is not None:
+        return cached
     
-    # Create enhanced post
-    post_with_details = PostWithDetails(
-        **post,
-        author_name=author_name,
-        category_name=category_name,
-        comment_count=comment_count,
-        tags_info=tags_info
-    )
+    post = await db.posts.find_one({"_id": ObjectId(post_id)})
+    if not post:
+        raise HTTPException(
+            status_code=404,
+            detail="The post with this id does not exist in the system",
+        )
     
-    return post_with_details
+    # Enhance post with details
+    result = jsonable_encoder(await enrich_posts(loaders, [post]))[0]
+    if result["is_visible"]:
+        await response_cache.set(etag, result, post_payload_tags([result]))
+    return result
 
 
 @router.put("/{post_id}", response_model=Post)
 async def update_post(
     *,
     db: Database = Depends(get_database),
+    loaders: Loaders = Depends(get_loaders),
     post_id: str,
     post_in: PostUpdate,
     current_user: UserInDB = Depends(get_current_active_user),
@@ -252,36 +403,8 @@ async def update_post(
             detail="Not authorized to update this post",
         )
     
-    # Verify category exists if being updated
-    if post_in.category_id:
-        try:
-            category = await db.categories.find_one({"_id": ObjectId(post_in.category_id)})
-            if not category:
-                raise HTTPException(
-                    status_code=404,
-                    detail="The category does not exist in the system",
-                )
-        except:
-            raise HTTPException(
-                status_code=404,
-                detail="Invalid category ID",
-            )
-    
-    # Verify tags exist if being updated
-    if post_in.tags:
-        for tag_id in post_in.tags:
-            try:
-                tag = await db.tags.find_one({"_id": ObjectId(tag_id)})
-                if not tag:
-                    raise HTTPException(
-                        status_code=404,
-                        detail=f"Tag with ID {tag_id} does not exist in the system",
-                    )
-            except:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Invalid tag ID: {tag_id}",
-                )
+    # Verify category and tags exist if being updated
+    await _verify_references(loaders, post_in.category_id, post_in.tags)
     
     # Only admins can change visibility
     if post_in.is_visible is not None and not current_user.is_superuser and post_in.is_visible != post["is_visible"]:
@@ -292,11 +415,18 @@ async def update_post(
     
     post_data = post.copy()
     update_data = post_in.dict(exclude_unset=True)
-    for field in update_data:
-        post_data[field] = update_data[field]
-    post_data["updated_at"] = datetime.utcnow()
+    update_data["updated_at"] = datetime.utcnow()
+    if update_data.get("text") is not None and needs_render(post, update_data["text"]):
+        update_data.update(summarize(update_data["text"]))
+        update_data.update(await render_post_text(update_data["text"]))
+    post_data.update(update_data)
+    post_data["version"] = post.get("version", 0) + 1
     
-    await db.posts.update_one({"_id": ObjectId(post_id)}, {"$set": post_data})
+    # Only set the changed fields so concurrent counter updates are preserved
+    await db.posts.update_one({"_id": ObjectId(post_id)}, {"$set": update_data, "$inc": {"version": 1}})
+    await apply_post_count_changes(db, post, post_data)
+    search_service.index_post(post_data)
+    await invalidate_post(db, post, post_data)
     post_data["id"] = str(post_data.pop("_id"))
     return post_data
 
@@ -331,10 +461,17 @@ async def delete_post(
             detail="Not authorized to delete this post",
         )
     
-    # Delete related comments
-    await db.comments.delete_many({"post_id": post_id})
+    # Delete related comments (their counters go away with the post)
+    comments = await db.comments.delete_many({"post_id": post_id})
     
     # Delete the post
-    await db.posts.delete_one({"_id": ObjectId(post_id)})
+    result = await db.posts.delete_one({"_id": ObjectId(post_id)})
+    if comments.deleted_count:
+        # Pending counts and comment listings are validated by the comments version
+        await invalidate_post_comments(db, post_id)
+    if result.deleted_count:
+        await apply_post_count_changes(db, post, None)
+        search_service.remove_post(post_id)
+        await invalidate_post(db, post)
     post["id"] = str(post.pop("_id"))
     return post
\ No newline at end of file
@@ -0,0 +1,27 @@
+import time
+from typing import Any
+
+from fastapi import APIRouter, Query, Response
+
+from app.models.search import Suggestions
+from app.services.search import search_service
+
+router = APIRouter()
+
+
+@router.get("/suggest", response_model=Suggestions)
+async def suggest(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(5, ge=1, le=20),
+) -> Any:
+    """
+    Typeahead suggestions for the search box.
+
+    Returns up to `limit` visible post titles, categories and tags that have
+    a word starting with `q`, answered from in-memory prefix indexes.
+    """
+    started = time.perf_counter()
+    suggestions = search_service.suggest(q, limit)
+    response.headers["Server-Timing"] = f"suggest;dur={(time.perf_counter() - started) * 1000:.3f}"
+    return suggestions
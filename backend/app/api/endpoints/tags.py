@@ -1,35 +1,60 @@
 from typing import Any, List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.encoders import jsonable_encoder
 from pymongo.database import Database
 from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 from datetime import datetime
 
 from app.core.auth import get_current_active_superuser, get_current_active_user
+from app.core.cache import make_cache_key, response_cache
+from app.core.http_cache import is_not_modified, make_etag, not_modified, set_validators
 from app.db.mongodb import get_database
+from app.db.read_routing import get_read_database
 from app.models.tag import Tag, TagCreate, TagUpdate, TagWithCount
 from app.models.user import UserInDB
+from app.services.search import search_service
+from app.services.versions import bump_versions, get_versions
+from app.services.invalidation import TAGS_TAG, invalidate_tag
 
 router = APIRouter()
 
+# Post writes move the post counters stored on tags
+TAG_PAYLOAD_COLLECTIONS = ("tags", "posts")
+
 
 @router.get("/", response_model=List[TagWithCount])
 async def read_tags(
-    db: Database = Depends(get_database),
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_read_database),
     skip: int = 0,
     limit: int = 100,
 ) -> Any:
     """
     Retrieve tags with post count.
     """
+    cache_key = make_cache_key("tags", skip=skip, limit=limit)
+    versions, last_modified = await get_versions(db, TAG_PAYLOAD_COLLECTIONS)
+    etag = make_etag(cache_key, *(versions[name] for name in TAG_PAYLOAD_COLLECTIONS))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    
+    # Keyed by the entity tag, so version bumps made anywhere, the CLIs included, retire old entries
+    cached = await response_cache.get(etag)
+    if cached is not None:
+        return cached
+    
     tags = await db.tags.find().skip(skip).limit(limit).to_list(length=limit)
     result = []
     for tag in tags:
         tag["id"] = str(tag.pop("_id"))
-        # Count posts with this tag
-        post_count = await db.posts.count_documents({"tags": tag["id"]})
-        result.append(TagWithCount(**tag, post_count=post_count))
+        # Post count is maintained on the document itself
+        result.append(TagWithCount(**tag))
+    result = jsonable_encoder(result)
+    await response_cache.set(etag, result, {TAGS_TAG})
     return result
 
 
@@ -53,8 +78,10 @@ async def create_tag(
         tag_data = tag_in.dict()
         tag_data["created_at"] = datetime.utcnow()
         tag_data["updated_at"] = tag_data["created_at"]
+        tag_data["post_count"] = 0
         result = await db.tags.insert_one(tag_data)
         tag_data["id"] = str(result.inserted_id)
+        await invalidate_tag(db, tag_data["id"])
         return tag_data
     except DuplicateKeyError:
         raise HTTPException(
@@ -66,12 +93,26 @@ async def create_tag(
 @router.get("/{tag_id}", response_model=TagWithCount)
 async def read_tag(
     *,
-    db: Database = Depends(get_database),
+    request: Request,
+    response: Response,
+    db: Database = Depends(get_read_database),
     tag_id: str,
 ) -> Any:
     """
     Get tag by ID.
     """
+    cache_key = make_cache_key("tag", id=tag_id)
+    versions, last_modified = await get_versions(db, TAG_PAYLOAD_COLLECTIONS)
+    etag = make_etag(cache_key, *(versions[name] for name in TAG_PAYLOAD_COLLECTIONS))
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified)
+    set_validators(response, etag, last_modified)
+    
+    # Keyed by the entity tag, so version bumps made anywhere, the CLIs included, retire old entries
+    cached = await response_cache.get(etag)
+    if cached is not None:
+        return cached
+    
     try:
         tag = await db.tags.find_one({"_id": ObjectId(tag_id)})
     except:
@@ -85,9 +126,9 @@ async def read_tag(
             detail="The tag with this id does not exist in the system",
         )
     tag["id"] = str(tag.pop("_id"))
-    # Count posts with this tag
-    post_count = await db.posts.count_documents({"tags": tag["id"]})
-    return TagWithCount(**tag, post_count=post_count)
+    result = jsonable_encoder(TagWithCount(**tag))
+    await response_cache.set(etag, result, {TAGS_TAG, f"tag:{tag_id}"})
+    return result
 
 
 @router.put("/{tag_id}", response_model=Tag)
@@ -125,10 +166,11 @@ async def update_tag(
     
     tag_data = tag.copy()
     update_data = tag_in.dict(exclude_unset=True)
-    for field in update_data:
-        tag_data[field] = update_data[field]
-    tag_data["updated_at"] = datetime.utcnow()
-    await db.tags.update_one({"_id": ObjectId(tag_id)}, {"$set": tag_data})
+    update_data["updated_at"] = datetime.utcnow()
+    tag_data.update(update_data)
+    # Only set the changed fields so concurrent post count updates are preserved
+    await db.tags.update_one({"_id": ObjectId(tag_id)}, {"$set": update_data})
+    await invalidate_tag(db, tag_id)
     tag_data["id"] = str(tag_data.pop("_id"))
     return tag_data
 
@@ -156,10 +198,19 @@ async def delete_tag(
             detail="The tag with this id does not exist in the system",
         )
     
-    # Remove tag from all posts that use it
-    await db.posts.update_many({"tags": tag_id}, {"$pull": {"tags": tag_id}})
+    # Remove tag from all posts that use it; the new updated_at lets other
+    # workers' search indexes pick the change up
+    post_ids = await db.posts.distinct("_id", {"tags": tag_id})
+    if post_ids:
+        await db.posts.update_many(
+            {"_id": {"$in": post_ids}},
+            {"$pull": {"tags": tag_id}, "$set": {"updated_at": datetime.utcnow()}, "$inc": {"version": 1}},
+        )
+        await search_service.reindex_posts(db, post_ids)
+        await bump_versions(db, "posts")
     
     # Delete the tag
     await db.tags.delete_one({"_id": ObjectId(tag_id)})
+    await invalidate_tag(db, tag_id)
     tag["id"] = str(tag.pop("_id"))
     return tag
\ No newline at end of file
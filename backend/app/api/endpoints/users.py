@@ -1,18 +1,37 @@
 from typing import Any, List
 
 from fastapi import APIRouter, Body, Depends, HTTPException, status
+from pymongo import ReturnDocument
 from pymongo.database import Database
 from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 from datetime import datetime
 
 from app.core.auth import get_current_active_user, get_current_active_superuser
-from app.core.security import get_password_hash
+from app.core.revocation import revoke_user_tokens
+from app.core.hashing import password_hasher
 from app.db.mongodb import get_database
 from app.models.user import User, UserCreate, UserInDB, UserUpdate
+from app.services.invalidation import invalidate_user
 
 router = APIRouter()
 
+# Changing any of these revokes the tokens already issued to the user
+TOKEN_FIELDS = ("hashed_password", "is_active", "is_superuser")
+
+
+async def _update_data(user_in: UserUpdate) -> dict:
+    update_data = user_in.dict(exclude_unset=True)
+    password = update_data.pop("password", None)
+    if password:
+        update_data["hashed_password"] = await password_hasher.hash(password)
+    update_data["updated_at"] = datetime.utcnow()
+    return update_data
+
+
+def _revokes_tokens(user: dict, update_data: dict) -> bool:
+    return any(field in update_data and update_data[field] != user.get(field) for field in TOKEN_FIELDS)
+
 
 @router.get("/", response_model=List[User])
 async def read_users(
@@ -54,7 +73,7 @@ async def create_user(
                 detail="A user with this username already exists in the system.",
             )
         user_data = user_in.dict()
-        hashed_password = get_password_hash(user_in.password)
+        hashed_password = await password_hasher.hash(user_in.password)
         user_data.pop("password")
         user_data["hashed_password"] = hashed_password
         user_data["created_at"] = datetime.utcnow()
@@ -89,20 +108,23 @@ async def update_user_me(
     """
     Update own user.
     """
-    user_data = current_user.dict()
-    if user_in.password:
-        hashed_password = get_password_hash(user_in.password)
-        user_data["hashed_password"] = hashed_password
-    update_data = user_in.dict(exclude_unset=True)
-    update_data.pop("password", None)
-    for field in update_data:
-        user_data[field] = update_data[field]
-    user_data["updated_at"] = datetime.utcnow()
-    user_id = ObjectId(current_user.id)
-    user_data.pop("id")
-    await db.users.update_one({"_id": user_id}, {"$set": user_data})
-    user_data["id"] = str(user_id)
-    return user_data
+    # Only the fields sent are written; the current user may come from token claims
+    update_data = await _update_data(user_in)
+    user = await db.users.find_one_and_update(
+        {"_id": ObjectId(current_user.id)},
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail="The user with this id does not exist in the system",
+        )
+    if _revokes_tokens(current_user.dict(), update_data):
+        await revoke_user_tokens(db, current_user.id)
+    await invalidate_user(db, current_user.id)
+    user["id"] = str(user.pop("_id"))
+    return user
 
 
 @router.get("/{user_id}", response_model=User)
@@ -153,16 +175,12 @@ async def update_user(
             status_code=404,
             detail="The user with this id does not exist in the system",
         )
-    user_data = user.copy()
-    if user_in.password:
-        hashed_password = get_password_hash(user_in.password)
-        user_data["hashed_password"] = hashed_password
-    update_data = user_in.dict(exclude_unset=True)
-    update_data.pop("password", None)
-    for field in update_data:
-        user_data[field] = update_data[field]
-    user_data["updated_at"] = datetime.utcnow()
-    await db.users.update_one({"_id": ObjectId(user_id)}, {"$set": user_data})
+    update_data = await _update_data(user_in)
+    await db.users.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
+    if _revokes_tokens(user, update_data):
+        await revoke_user_tokens(db, user_id)
+    await invalidate_user(db, user_id)
+    user_data = {**user, **update_data}
     user_data["id"] = str(user_data.pop("_id"))
     return user_data
 
@@ -189,6 +207,9 @@ async def delete_user(
             status_code=404,
             detail="The user with this id does not exist in the system",
         )
+    # Revoked first, so the revocation covers the user's latest token version
+    await revoke_user_tokens(db, user_id)
     await db.users.delete_one({"_id": ObjectId(user_id)})
+    await invalidate_user(db, user_id)
     user["id"] = str(user.pop("_id"))
     return user
\ No newline at end of file
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
@@ -6,11 +8,14 @@ from pymongo.database import Database
 from bson import ObjectId
 
 from app.core.config import settings
-from app.core.security import verify_password
-from app.db.mongodb import get_database
+from app.core.revocation import revocation_store
+from app.core.hashing import password_hasher
+from app.core.user_cache import user_cache
 from app.models.user import UserInDB, TokenData
+from app.services.loaders import Loaders, get_loaders
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login", auto_error=False)
 
 async def get_user(db: Database, username: str = None, email: str = None, user_id: str = None):
     if username:
@@ -34,32 +39,100 @@ async def authenticate_user(db: Database, username: str, password: str):
     user = await get_user(db, username=username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = await password_hasher.verify(password, user.hashed_password)
+    if not verified:
         return False
+    if new_hash:
+        # Upgrade hashes made with another bcrypt cost, unless the password changed meanwhile
+        await db.users.update_one(
+            {"_id": ObjectId(user.id), "hashed_password": user.hashed_password},
+            {"$set": {"hashed_password": new_hash}},
+        )
+        user.hashed_password = new_hash
     return user
 
+def _decode_access_token(token: str, credentials_exception: HTTPException) -> dict:
+    try:
+        payload = jwt.decode(
+            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+        )
+        token_data = TokenData(user_id=payload.get("sub"))
+    except (JWTError, ValidationError):
+        raise credentials_exception
+    # Refresh tokens are only good for getting new access tokens
+    if token_data.user_id is None or payload.get("typ", "access") != "access":
+        raise credentials_exception
+    return payload
+
+def _user_from_claims(payload: dict, credentials_exception: HTTPException) -> UserInDB:
+    """
+    The user described by an access token's claims, unless their tokens have been revoked since.
+    """
+    if payload.get("typ") != "access" or "usr" not in payload:
+        raise credentials_exception
+    token_version = payload.get("tv", 0)
+    if revocation_store.is_revoked(payload["sub"], token_version):
+        raise credentials_exception
+    return UserInDB(
+        id=payload["sub"],
+        username=payload["usr"],
+        email=payload.get("eml"),
+        full_name=payload.get("nam"),
+        is_active=payload.get("act", True),
+        is_superuser=payload.get("su", False),
+        token_version=token_version,
+        # Never put in tokens; endpoints that need it read the user document
+        hashed_password="",
+    )
+
 async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Database = Depends(get_database)
+    token: str = Depends(oauth2_scheme), loaders: Loaders = Depends(get_loaders)
 ):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
-        )
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id)
-    except (JWTError, ValidationError):
-        raise credentials_exception
+    if settings.AUTH_MODE == "claims":
+        return _user_from_claims(_decode_access_token(token, credentials_exception), credentials_exception)
+
+    payload = _decode_access_token(token, credentials_exception)
     
-    user = await get_user(db, user_id=token_data.user_id)
-    if user is None:
+    # Tokens seen recently skip the users lookup, unless the user's tokens
+    # were revoked since, possibly by another worker
+    user_dict = user_cache.get(token)
+    if user_dict is not None and revocation_store.is_revoked(payload["sub"], user_dict.get("token_version", 0)):
+        user_cache.invalidate_user(payload["sub"])
+        user_dict = None
+    cached = user_dict is not None
+    if cached:
+        loaders.users.prime(str(user_dict["_id"]), user_dict)
+    else:
+        # The user document is shared with the rest of the request through the loader
+        generation = user_cache.generation
+        user_dict = await loaders.users.load(payload["sub"])
+        if user_dict is None:
+            raise credentials_exception
+    # Tokens issued before the user's last password, role or activation change are revoked
+    if payload.get("tv", 0) < user_dict.get("token_version", 0):
         raise credentials_exception
+    if not cached:
+        user_cache.set(token, user_dict, payload.get("exp"), generation)
+    user_dict = dict(user_dict)
+    user_dict["id"] = str(user_dict.pop("_id"))
+    return UserInDB(**user_dict)
+
+async def get_current_user_optional(
+    token: Optional[str] = Depends(oauth2_scheme_optional), loaders: Loaders = Depends(get_loaders)
+) -> Optional[UserInDB]:
+    """
+    Resolve the current user when a token is sent, or None for anonymous requests.
+    """
+    if not token:
+        return None
+    user = await get_current_user(token=token, loaders=loaders)
+    if not user.is_active:
+        return None
     return user
 
 async def get_current_active_user(current_user: UserInDB = Depends(get_current_user)):
@@ -0,0 +1,391 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+InvalidationListener = Callable[[Set[str]], None]
+
+# Set for requests that must see their own recent writes; their lookups always miss
+skip_cache_reads: ContextVar[bool] = ContextVar("skip_cache_reads", default=False)
+# Oldest state the current request's database reads may reflect, for reads
+# from a secondary; fills are dropped if an invalidation came after it
+reads_as_of: ContextVar[Optional[float]] = ContextVar("cache_reads_as_of", default=None)
+# Invalidation generation seen by each of the current request's cache misses
+_miss_generations: ContextVar[Optional[Dict[Tuple[int, str], int]]] = ContextVar("cache_miss_generations", default=None)
+
+
+def make_cache_key(namespace: str, **params: Any) -> str:
+    """
+    Build a cache key that does not depend on parameter order; None values are ignored.
+    """
+    parts = [f"{name}={params[name]}" for name in sorted(params) if params[name] is not None]
+    return f"{namespace}?{'&'.join(parts)}"
+
+
+class CacheBackend(ABC):
+    """
+    Tag-invalidated cache of JSON-compatible values.
+
+    Each entry is stored with the set of tags it depends on (e.g. `post:<id>`);
+    invalidating a tag drops every entry carrying it. Listeners registered with
+    `subscribe` are told about every invalidation, including those made by
+    other workers when the backend is shared.
+
+    A miss records the invalidation generation, and `set` of the same key
+    in the same request is dropped if an invalidation happened since: the
+    value was then read from the database before that invalidation. Values
+    read from a secondary may be older than the request, so their `set` is
+    also dropped if the last invalidation followed `reads_as_of`.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.stale_fills = 0
+        self._listeners: List[InvalidationListener] = []
+
+    def _record_miss(self, key: str, generation: int) -> None:
+        misses = _miss_generations.get()
+        if misses is None:
+            misses = {}
+            _miss_generations.set(misses)
+        misses[(id(self), key)] = generation
+
+    def _miss_generation(self, key: str) -> Optional[int]:
+        """
+        Generation seen when this request missed `key`, or None if it did not look it up.
+        """
+        misses = _miss_generations.get()
+        return misses.pop((id(self), key), None) if misses else None
+
+    @staticmethod
+    def _read_before(invalidated_at: float) -> bool:
+        """
+        Whether this request's reads may predate an invalidation made at `invalidated_at`.
+        """
+        as_of = reads_as_of.get()
+        return as_of is not None and invalidated_at > as_of
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, tags: Iterable[str] = (), ttl_seconds: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    async def start(self) -> None:
+        """
+        Start background work such as listening for remote invalidations.
+        """
+
+    async def close(self) -> None:
+        """
+        Release connections and stop background work.
+        """
+
+    def subscribe(self, listener: InvalidationListener) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, tags: Set[str]) -> None:
+        for listener in self._listeners:
+            try:
+                listener(tags)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed: {e}")
+
+    async def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stale_fills": self.stale_fills,
+        }
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "tags")
+
+    def __init__(self, value: Any, expires_at: float, tags: Set[str]):
+        self.value = value
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Bounded LRU cache with per-entry TTL, private to the current process.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, ttl_seconds: int):
+        super().__init__(ttl_seconds)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._tag_index: Dict[str, Set[str]] = {}
+        self.evictions = 0
+        self.invalidations = 0
+        # Bumped by every invalidation so fills that raced one are dropped
+        self.generation = 0
+        self.invalidated_at = 0.0
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = None if skip_cache_reads.get() else self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            self._record_miss(key, self.generation)
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    async def set(self, key: str, value: Any, tags: Iterable[str] = (), ttl_seconds: Optional[int] = None) -> None:
+        since = self._miss_generation(key)
+        if (since is not None and since != self.generation) or self._read_before(self.invalidated_at):
+            self.stale_fills += 1
+            return
+        if key in self._entries:
+            self._remove(key)
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        entry = _Entry(value, time.monotonic() + ttl, set(tags))
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._tag_index.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        tags = set(tags)
+        self.generation += 1
+        self.invalidated_at = time.time()
+        for tag in tags:
+            for key in self._tag_index.pop(tag, set()):
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+        self._notify(tags)
+
+    async def clear(self) -> None:
+        self.generation += 1
+        self.invalidated_at = time.time()
+        self._entries.clear()
+        self._tag_index.clear()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        for tag in entry.tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    async def stats(self) -> dict:
+        stats = await super().stats()
+        stats.update({
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        })
+        return stats
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Cache shared by every worker through a Redis-protocol server.
+
+    Every tag has a version counter. Entries record the versions of their tags
+    when stored and are treated as misses once any of them has moved on, so an
+    invalidation is one INCR per tag and is seen by all workers at once. The
+    invalidated tags are also published so workers can drop in-process state.
+
+    A shared generation counter moves with every invalidation, along with
+    the time of the last one; fills check both under WATCH, so one that
+    raced an invalidation on any worker is dropped.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, ttl_seconds: int, prefix: str = "tinyblog:cache:"):
+        super().__init__(ttl_seconds)
+        self._client = client
+        self._prefix = prefix
+        self._channel = f"{prefix}invalidations"
+        self._origin = uuid.uuid4().hex
+        self._pubsub = None
+        self._listener_task: Optional[asyncio.Task] = None
+        self.invalidations = 0
+
+    @classmethod
+    def from_url(cls, url: str, ttl_seconds: int) -> "RedisCacheBackend":
+        try:
+            from redis import asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("The redis package is required for CACHE_BACKEND=redis")
+        return cls(aioredis.from_url(url, decode_responses=True), ttl_seconds)
+
+    def _entry_key(self, key: str) -> str:
+        return f"{self._prefix}entry:{key}"
+
+    def _tag_key(self, tag: str) -> str:
+        return f"{self._prefix}tag:{tag}"
+
+    @property
+    def _generation_key(self) -> str:
+        return f"{self._prefix}generation"
+
+    @property
+    def _invalidated_at_key(self) -> str:
+        return f"{self._prefix}invalidated_at"
+
+    async def _tag_versions(self, tags: List[str]) -> List[int]:
+        if not tags:
+            return []
+        versions = await self._client.mget([self._tag_key(tag) for tag in tags])
+        return [int(version or 0) for version in versions]
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw, generation = await self._client.mget([self._entry_key(key), self._generation_key])
+        if skip_cache_reads.get():
+            raw = None
+        if raw is not None:
+            entry = json.loads(raw)
+            tags = list(entry["tags"])
+            if await self._tag_versions(tags) == [entry["tags"][tag] for tag in tags]:
+                self.hits += 1
+                return entry["value"]
+        self.misses += 1
+        self._record_miss(key, int(generation or 0))
+        return None
+
+    async def set(self, key: str, value: Any, tags: Iterable[str] = (), ttl_seconds: Optional[int] = None) -> None:
+        from redis.exceptions import WatchError
+
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        since = self._miss_generation(key)
+        if ttl <= 0:
+            return
+        tags = sorted(set(tags))
+        async with self._client.pipeline(transaction=True) as pipe:
+            # Commands run at once until multi(); the write fails if an invalidation follows the check
+            await pipe.watch(self._generation_key)
+            generation, invalidated_at = await pipe.mget(self._generation_key, self._invalidated_at_key)
+            if (since is not None and int(generation or 0) != since) or self._read_before(float(invalidated_at or 0)):
+                self.stale_fills += 1
+                return
+            versions = await self._tag_versions(tags)
+            entry = {"value": value, "tags": dict(zip(tags, versions))}
+            pipe.multi()
+            pipe.set(self._entry_key(key), json.dumps(entry), ex=ttl)
+            try:
+                await pipe.execute()
+            except WatchError:
+                self.stale_fills += 1
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        tags = sorted(set(tags))
+        if not tags:
+            return
+        async with self._client.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(self._tag_key(tag))
+            pipe.incr(self._generation_key)
+            pipe.set(self._invalidated_at_key, time.time())
+            pipe.publish(self._channel, json.dumps({"origin": self._origin, "tags": tags}))
+            await pipe.execute()
+        self.invalidations += len(tags)
+        # Remote workers hear about this through the channel, local listeners right away
+        self._notify(set(tags))
+
+    async def clear(self) -> None:
+        async with self._client.pipeline(transaction=True) as pipe:
+            pipe.incr(self._generation_key)
+            pipe.set(self._invalidated_at_key, time.time())
+            await pipe.execute()
+        async for key in self._client.scan_iter(match=f"{self._prefix}entry:*"):
+            await self._client.delete(key)
+
+    async def start(self) -> None:
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self._channel)
+        self._listener_task = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Lost cache invalidation channel: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            if message and message.get("type") == "message":
+                payload = json.loads(message["data"])
+                if payload["origin"] != self._origin:
+                    self._notify(set(payload["tags"]))
+
+    async def close(self) -> None:
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+        await self._client.close()
+
+    async def stats(self) -> dict:
+        stats = await super().stats()
+        stats["invalidations"] = self.invalidations
+        try:
+            info = await self._client.info("stats")
+        except Exception as e:
+            # Some Redis-protocol servers do not implement INFO
+            logger.debug(f"Could not read cache server stats: {e}")
+            return stats
+        stats["evictions"] = info.get("evicted_keys", 0)
+        stats["expirations"] = info.get("expired_keys", 0)
+        return stats
+
+
+def create_cache_backend() -> CacheBackend:
+    if settings.CACHE_BACKEND == "redis":
+        return RedisCacheBackend.from_url(settings.REDIS_URL, settings.RESPONSE_CACHE_TTL_SECONDS)
+    return MemoryCacheBackend(
+        max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    )
+
+
+response_cache = create_cache_backend()
@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.database import Database
+from pymongo.errors import PyMongoError
+
+from app.core.cache import response_cache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REVOCATIONS_COLLECTION = "revocations"
+# Revocation records are kept this long; claims access tokens must expire sooner
+REVOCATION_RETENTION = timedelta(days=1)
+REVOCATION_RELOAD_INTERVAL = timedelta(hours=1)
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings: no false negatives, a small rate of false positives.
+    """
+
+    def __init__(self, size_bits: int, hash_count: int):
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self._bits = bytearray((size_bits + 7) // 8)
+
+    def _positions(self, value: str) -> Iterable[int]:
+        # Double hashing: k positions from two halves of one digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size_bits for i in range(self.hash_count))
+
+    def add(self, value: str) -> None:
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class RevocationSet:
+    """
+    Users whose tokens below some token version are revoked.
+
+    Most users have no recent revocation, so lookups go through a Bloom
+    filter first and only consult the exact map on a (possible) match.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, int]] = None):
+        self.valid_from: Dict[str, int] = dict(entries or {})
+        self.bloom = BloomFilter(settings.REVOCATION_BLOOM_BITS, settings.REVOCATION_BLOOM_HASHES)
+        for user_id in self.valid_from:
+            self.bloom.add(user_id)
+
+    def add(self, user_id: str, token_version: int) -> None:
+        if token_version > self.valid_from.get(user_id, -1):
+            self.valid_from[user_id] = token_version
+            self.bloom.add(user_id)
+
+    def is_revoked(self, user_id: str, token_version: int) -> bool:
+        if user_id not in self.bloom:
+            return False
+        return token_version < self.valid_from.get(user_id, token_version)
+
+
+class RevocationStore:
+    """
+    Per-worker copy of the recent revocation records used to check claims
+    tokens and the users cached behind database-mode tokens.
+
+    Local revocations apply at once. Revocations made by other workers are
+    picked up when their `user:<id>` cache invalidation is relayed, and by
+    polling every REVOCATION_POLL_INTERVAL_SECONDS.
+    """
+
+    def __init__(self):
+        self.revoked = RevocationSet()
+        self.watermark: Optional[datetime] = None
+        self.loaded_at: Optional[datetime] = None
+        # Revocations applied locally while a full load is in flight
+        self._loading: Optional[Dict[str, int]] = None
+        self._db: Optional[Database] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Set[asyncio.Task] = set()
+        self.syncs = 0
+
+    def is_revoked(self, user_id: str, token_version: int) -> bool:
+        return self.revoked.is_revoked(user_id, token_version)
+
+    def add(self, user_id: str, token_version: int) -> None:
+        self.revoked.add(user_id, token_version)
+        if self._loading is not None:
+            self._loading[user_id] = max(token_version, self._loading.get(user_id, 0))
+
+    async def load(self, db: Database) -> None:
+        """
+        Replace the local set with the records still within REVOCATION_RETENTION,
+        which also drops the expired ones.
+        """
+        started = datetime.utcnow()
+        self._loading = {}
+        try:
+            entries, watermark = await self._read(db, {"updated_at": {"$gte": started - REVOCATION_RETENTION}})
+            revoked = RevocationSet(entries)
+            for user_id, token_version in self._loading.items():
+                revoked.add(user_id, token_version)
+        finally:
+            self._loading = None
+        self.revoked = revoked
+        self.watermark = watermark or self.watermark
+        self.loaded_at = started
+        self.syncs += 1
+
+    async def refresh(self, db: Database) -> None:
+        """
+        Apply revocation records written since the last sync.
+        """
+        query = {"updated_at": {"$gte": self.watermark}} if self.watermark else {}
+        entries, watermark = await self._read(db, query)
+        for user_id, token_version in entries.items():
+            self.revoked.add(user_id, token_version)
+        self.watermark = watermark or self.watermark
+        self.syncs += 1
+
+    async def _read(self, db: Database, query: dict) -> Tuple[Dict[str, int], Optional[datetime]]:
+        entries = {}
+        watermark = None
+        async for record in db[REVOCATIONS_COLLECTION].find(query):
+            entries[record["_id"]] = record["token_version"]
+            if watermark is None or record["updated_at"] > watermark:
+                watermark = record["updated_at"]
+        return entries, watermark
+
+    async def start(self, db: Database) -> None:
+        self._db = db
+        await self.load(db)
+        response_cache.subscribe(self._on_invalidation)
+        self._task = asyncio.create_task(self._poll(db))
+
+    async def stop(self) -> None:
+        for task in [self._task, *self._pending]:
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._pending.clear()
+
+    def _on_invalidation(self, tags: Set[str]) -> None:
+        if self._db is not None and any(tag.startswith("user:") for tag in tags):
+            task = asyncio.ensure_future(self._refresh_quietly(self._db))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _refresh_quietly(self, db: Database) -> None:
+        try:
+            # Reload in full now and then to forget expired revocations
+            if self.loaded_at is None or datetime.utcnow() - self.loaded_at > REVOCATION_RELOAD_INTERVAL:
+                await self.load(db)
+            else:
+                await self.refresh(db)
+        except PyMongoError as e:
+            logger.error(f"Failed to refresh token revocations: {e}")
+
+    async def _poll(self, db: Database) -> None:
+        while True:
+            await asyncio.sleep(settings.REVOCATION_POLL_INTERVAL_SECONDS)
+            await self._refresh_quietly(db)
+
+    def stats(self) -> dict:
+        return {
+            "revoked_users": len(self.revoked.valid_from),
+            "watermark": self.watermark,
+            "loaded_at": self.loaded_at,
+            "syncs": self.syncs,
+        }
+
+
+async def revoke_user_tokens(db: Database, user_id: str) -> int:
+    """
+    Invalidate every token issued to a user so far; returns the new token version.
+
+    Call it when a user's password, activation or role changes, or just
+    before the user is deleted, then invalidate the user as usual.
+    """
+    user = await db.users.find_one_and_update(
+        {"_id": ObjectId(user_id)},
+        {"$inc": {"token_version": 1}},
+        projection={"token_version": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    previous = await db[REVOCATIONS_COLLECTION].find_one({"_id": user_id})
+    token_version = max(
+        user["token_version"] if user else 0,
+        previous["token_version"] + 1 if previous else 1,
+    )
+    await db[REVOCATIONS_COLLECTION].update_one(
+        {"_id": user_id},
+        {"$max": {"token_version": token_version}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    revocation_store.add(user_id, token_version)
+    return token_version
+
+
+revocation_store = RevocationStore()
@@ -0,0 +1,117 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from app.core.cache import response_cache
+from app.core.config import settings
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class _CachedUser:
+    __slots__ = ("user_id", "document", "expires_at")
+
+    def __init__(self, user_id: str, document: dict, expires_at: float):
+        self.user_id = user_id
+        self.document = document
+        self.expires_at = expires_at
+
+
+class UserCache:
+    """
+    Bounded TTL cache of the user documents behind access tokens, private to the current process.
+
+    Entries are keyed by token hash, so a hit skips the users lookup, and
+    never outlive the token. Writes to a user invalidate the `user:<id>`
+    cache tag, which drops the user's entries in this worker and, with a
+    shared cache backend, in every other one. Revoked tokens are also
+    caught through the revocation store, which every worker polls, so a
+    cached document is reloaded once its token version is revoked.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _CachedUser]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        # Bumped by every invalidation so lookups that raced one are not cached
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[dict]:
+        key = token_key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry.expires_at <= time.time():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.document
+
+    def set(self, token: str, document: dict, token_expires_at: Optional[float], generation: int) -> None:
+        """
+        Cache the user document for a token, unless an invalidation happened since `generation` was read.
+        """
+        if generation != self.generation:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at:
+            expires_at = min(expires_at, token_expires_at)
+        key = token_key(token)
+        user_id = str(document["_id"])
+        self._remove(key)
+        self._entries[key] = _CachedUser(user_id, document, expires_at)
+        self._by_user.setdefault(user_id, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: str) -> None:
+        self.generation += 1
+        self.invalidations += 1
+        for key in self._by_user.pop(user_id, set()):
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._entries.clear()
+        self._by_user.clear()
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            keys = self._by_user.get(entry.user_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_user[entry.user_id]
+
+    def on_invalidation(self, tags: Set[str]) -> None:
+        for tag in tags:
+            if tag.startswith("user:"):
+                self.invalidate_user(tag[len("user:"):])
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+user_cache = UserCache(settings.USER_CACHE_MAX_ENTRIES, settings.USER_CACHE_TTL_SECONDS)
+response_cache.subscribe(user_cache.on_invalidation)
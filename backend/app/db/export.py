@@ -0,0 +1,68 @@
+import argparse
+import asyncio
+import os
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.db.mongodb import db
+from app.services.export import COMPRESSIONS, EXPORT_COLLECTIONS, FILE_EXTENSIONS, dump_document, iter_export, make_compressor
+
+# Bytes of NDJSON handed to the compressor at once
+WRITE_CHUNK_SIZE = 64 * 1024
+
+async def export_to_file(collection: str, path: str, compression: str, after: Optional[str] = None, include_password_hashes: bool = False):
+    """
+    Export a collection to an NDJSON file, closing it cleanly and reporting the
+    checkpoint to resume from when interrupted.
+    """
+    compressor = make_compressor(compression)
+    count = 0
+    last_id = after
+    buffer = bytearray()
+    with open(path, "wb") as output:
+        try:
+            async for document in iter_export(db.db, collection, after, include_password_hashes):
+                buffer += dump_document(document)
+                count += 1
+                last_id = str(document["_id"])
+                if len(buffer) >= WRITE_CHUNK_SIZE:
+                    output.write(compressor.compress(bytes(buffer)))
+                    buffer.clear()
+        except BaseException:
+            print(f"{collection}: interrupted after {count} documents; resume into a new file with --after {last_id}")
+            raise
+        finally:
+            output.write(compressor.compress(bytes(buffer)) + compressor.flush())
+    print(f"{collection}: exported {count} documents to {path}")
+
+async def export(target: str, output: str, compression: str, after: Optional[str] = None, include_password_hashes: bool = False):
+    """
+    Export one collection to a file, or every collection into a directory.
+    """
+    if target != "all":
+        await export_to_file(target, output, compression, after, include_password_hashes)
+        return
+    os.makedirs(output, exist_ok=True)
+    for collection in EXPORT_COLLECTIONS:
+        path = os.path.join(output, collection + FILE_EXTENSIONS[compression])
+        await export_to_file(collection, path, compression, None, include_password_hashes)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export collections as NDJSON")
+    parser.add_argument("collection", choices=EXPORT_COLLECTIONS + ("all",))
+    parser.add_argument("output", help="output file, or directory when exporting all collections")
+    parser.add_argument("--compression", choices=COMPRESSIONS, default="gzip")
+    parser.add_argument("--after", help="resume after this _id")
+    parser.add_argument("--include-password-hashes", action="store_true")
+    args = parser.parse_args()
+    if args.after and args.collection == "all":
+        parser.error("--after needs a single collection")
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db.client = client
+    db.db = client[settings.DATABASE_NAME]
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(export(args.collection, args.output, args.compression, args.after, args.include_password_hashes))
@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import os
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.db.mongodb import db
+from app.services.export import EXPORT_COLLECTIONS, FILE_EXTENSIONS, read_ndjson
+from app.services.importer import import_ndjson, shutdown_importer
+from app.services.rendering import shutdown_renderer
+
+READ_CHUNK_SIZE = 1024 * 1024
+
+def _compression_for(path: str) -> str:
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return "none"
+
+async def _read_file(path: str):
+    with open(path, "rb") as source:
+        while True:
+            chunk = source.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+async def import_file(collection: str, path: str):
+    """
+    Import one NDJSON file and print its report.
+    """
+    report = await import_ndjson(db.db, collection, read_ndjson(_read_file(path), _compression_for(path)))
+    print(f"{collection}: imported {report.inserted} records from {path}, {report.failed} rejected")
+    for error in report.errors:
+        print(f"  line {error.line}{f' ({error.id})' if error.id else ''}: {error.detail}")
+    if report.errors_truncated:
+        print(f"  ... {report.failed - len(report.errors)} more")
+
+async def import_data(target: str, source: str):
+    """
+    Import one collection from a file, or every exported collection found in a directory.
+    """
+    try:
+        if target != "all":
+            await import_file(target, source)
+            return
+        # Referenced collections come first
+        for collection in EXPORT_COLLECTIONS:
+            for extension in FILE_EXTENSIONS.values():
+                path = os.path.join(source, collection + extension)
+                if os.path.exists(path):
+                    await import_file(collection, path)
+                    break
+    finally:
+        shutdown_importer()
+        shutdown_renderer()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import NDJSON files written by app.db.export")
+    parser.add_argument("collection", choices=EXPORT_COLLECTIONS + ("all",))
+    parser.add_argument("source", help="NDJSON file (.gz and .zst are decompressed), or directory when importing all collections")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db.client = client
+    db.db = client[settings.DATABASE_NAME]
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(import_data(args.collection, args.source))
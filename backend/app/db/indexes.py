@@ -0,0 +1,168 @@
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.database import Database
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "migrations"
+INDEX_MIGRATION_ID = "indexes"
+
+# Declarative index spec, one entry per collection. Listings filter on their
+# equality fields first, then sort by (date, _id) for keyset pagination.
+INDEX_SPEC: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("username", ASCENDING)], unique=True),
+    ],
+    "posts": [
+        IndexModel([("date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("is_visible", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("category_id", ASCENDING), ("is_visible", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("tags", ASCENDING), ("is_visible", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("author_id", ASCENDING), ("is_visible", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+        # "popular" sort of public listings
+        IndexModel([("is_visible", ASCENDING), ("approved_comment_count", DESCENDING), ("_id", DESCENDING)]),
+        # Search index catch-up reads posts changed since its watermark
+        IndexModel([("updated_at", ASCENDING)]),
+    ],
+    "comments": [
+        IndexModel([("post_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("post_id", ASCENDING), ("is_approved", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("is_approved", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)]),
+        # Moderation queue; only holds the (few) comments awaiting approval
+        IndexModel([("date", DESCENDING), ("_id", DESCENDING)], partialFilterExpression={"is_approved": False}),
+    ],
+    "categories": [
+        IndexModel([("name", ASCENDING)], unique=True),
+    ],
+    "tags": [
+        IndexModel([("name", ASCENDING)], unique=True),
+    ],
+    # Token revocations only matter while the tokens they cover can still be used
+    "revocations": [
+        IndexModel([("updated_at", ASCENDING)], expireAfterSeconds=24 * 60 * 60),
+    ],
+}
+
+
+# index_information() fields that describe the index rather than how it was created
+_DESCRIPTIVE_FIELDS = {"key", "name", "v", "ns", "background", "2dsphereIndexVersion", "textIndexVersion"}
+# Changed in place with collMod rather than by rebuilding the index
+TTL_OPTION = "expireAfterSeconds"
+# Collation fields the server fills in when they are left out
+_COLLATION_DEFAULTS = {
+    "caseLevel": False, "caseFirst": "off", "strength": 3, "numericOrdering": False,
+    "alternate": "non-ignorable", "maxVariable": "punct", "normalization": False, "backwards": False,
+}
+
+
+def _normalize(value):
+    # The server returns whole numbers as floats in some places
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {name: _normalize(item) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    return value
+
+
+def _signature(key, options: dict) -> Tuple:
+    """
+    Identity of an index independent of its name and TTL: its key and every creation option.
+    """
+    creation = {}
+    for name, value in options.items():
+        if name in _DESCRIPTIVE_FIELDS or name == TTL_OPTION or value is False:
+            continue
+        if name == "collation":
+            value = {
+                field: item for field, item in value.items()
+                if field != "version" and _COLLATION_DEFAULTS.get(field, object()) != item
+            }
+        creation[name] = _normalize(value)
+    # Whether an index expires documents cannot be changed in place, only after how long
+    creation["ttl"] = TTL_OPTION in options
+    return (
+        tuple((field, direction if isinstance(direction, str) else int(direction)) for field, direction in key),
+        json.dumps(creation, sort_keys=True, default=str),
+    )
+
+
+def _spec_signatures(models: List[IndexModel]) -> Dict[Tuple, IndexModel]:
+    return {_signature(model.document["key"].items(), model.document): model for model in models}
+
+
+def index_spec_version(spec: Dict[str, List[IndexModel]] = INDEX_SPEC) -> str:
+    """
+    Fingerprint of the index spec, recorded once the spec has been applied.
+    """
+    canonical = {
+        collection: sorted(
+            repr((signature, model.document.get(TTL_OPTION)))
+            for signature, model in _spec_signatures(models).items()
+        )
+        for collection, models in sorted(spec.items())
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+async def _migrate_collection(database: Database, collection_name: str, models: List[IndexModel]) -> None:
+    collection = database[collection_name]
+    wanted = _spec_signatures(models)
+    existing = await collection.index_information()
+
+    present = set()
+    obsolete = []
+    for name, info in existing.items():
+        if name == "_id_":
+            continue
+        signature = _signature(info["key"], info)
+        if signature not in wanted:
+            obsolete.append(name)
+            continue
+        present.add(signature)
+        ttl = wanted[signature].document.get(TTL_OPTION)
+        if ttl is not None and _normalize(info.get(TTL_OPTION)) != ttl:
+            await database.command({"collMod": collection_name, "index": {"name": name, TTL_OPTION: ttl}})
+            logger.info(f"Changed the TTL of {collection_name}.{name} to {ttl}s")
+
+    # Build new indexes before dropping old ones so queries always have one to use
+    missing = [model for signature, model in wanted.items() if signature not in present]
+    if missing:
+        names = await collection.create_indexes(missing)
+        logger.info(f"Created indexes on {collection_name}: {', '.join(names)}")
+
+    for name in obsolete:
+        logger.info(f"Dropping index {collection_name}.{name}: no longer in the index spec")
+        await collection.drop_index(name)
+
+
+async def apply_index_migrations(database: Database, force: bool = False) -> bool:
+    """
+    Bring the indexes in line with INDEX_SPEC.
+
+    Does nothing when the recorded version already matches the spec, unless
+    `force` is set. Returns True when indexes were migrated.
+    """
+    version = index_spec_version()
+    applied = await database[MIGRATIONS_COLLECTION].find_one({"_id": INDEX_MIGRATION_ID})
+    if applied and applied.get("version") == version and not force:
+        logger.info("Indexes are up to date")
+        return False
+
+    for collection_name, models in INDEX_SPEC.items():
+        await _migrate_collection(database, collection_name, models)
+
+    await database[MIGRATIONS_COLLECTION].update_one(
+        {"_id": INDEX_MIGRATION_ID},
+        {"$set": {"version": version, "applied_at": datetime.utcnow()}},
+        upsert=True,
+    )
+    logger.info(f"Applied index spec version {version[:12]}")
+    return True
@@ -5,45 +5,23 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.errors import DuplicateKeyError
 
 from app.core.config import settings
-from app.core.security import get_password_hash
+from app.core.hashing import password_hasher
+from app.db.indexes import INDEX_SPEC, apply_index_migrations
 from app.db.mongodb import db
 
 logger = logging.getLogger(__name__)
 
 async def init_db():
     try:
-        # Create collections if they don't exist
         collections = await db.db.list_collection_names()
         
-        # Create indexes for Users collection
-        if "users" not in collections:
-            await db.db.create_collection("users")
-        await db.db.users.create_index("email", unique=True)
-        await db.db.users.create_index("username", unique=True)
-        
-        # Create indexes for Posts collection
-        if "posts" not in collections:
-            await db.db.create_collection("posts")
-        await db.db.posts.create_index("title")
-        await db.db.posts.create_index("date")
-        await db.db.posts.create_index("category_id")
-        await db.db.posts.create_index("author_id")
-        
-        # Create indexes for Categories collection
-        if "categories" not in collections:
-            await db.db.create_collection("categories")
-        await db.db.categories.create_index("name", unique=True)
-        
-        # Create indexes for Comments collection
-        if "comments" not in collections:
-            await db.db.create_collection("comments")
-        await db.db.comments.create_index("post_id")
-        await db.db.comments.create_index("date")
+        # Create collections if they don't exist
+        for collection_name in INDEX_SPEC:
+            if collection_name not in collections:
+                await db.db.create_collection(collection_name)
         
-        # Create indexes for Tags collection
-        if "tags" not in collections:
-            await db.db.create_collection("tags")
-        await db.db.tags.create_index("name", unique=True)
+        # Create or update indexes
+        await apply_index_migrations(db.db)
         
         # Create first superuser if it doesn't exist
         try:
@@ -52,7 +30,7 @@ async def init_db():
                 user_data = {
                     "email": settings.FIRST_SUPERUSER,
                     "username": "admin",
-                    "hashed_password": get_password_hash(settings.FIRST_SUPERUSER_PASSWORD),
+                    "hashed_password": await password_hasher.hash(settings.FIRST_SUPERUSER_PASSWORD),
                     "is_active": True,
                     "is_superuser": True,
                     "full_name": "Initial Admin User",
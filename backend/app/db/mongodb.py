@@ -1,7 +1,14 @@
+import asyncio
+import importlib.util
+
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.database import Database
 
 from app.core.config import settings
+from app.db.pool_monitor import pool_monitor
+
+# Python package each optional wire compressor needs
+_COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy"}
 
 class MongoDB:
     client: AsyncIOMotorClient = None
@@ -12,12 +19,61 @@ db = MongoDB()
 async def get_database() -> Database:
     return db.db
 
+def available_compressors() -> list:
+    compressors = [name.strip() for name in (settings.MONGODB_COMPRESSORS or "").split(",") if name.strip()]
+    return [
+        name for name in compressors
+        if name not in _COMPRESSOR_PACKAGES or importlib.util.find_spec(_COMPRESSOR_PACKAGES[name])
+    ]
+
+def client_options() -> dict:
+    """
+    Pool, timeout, compression and read preference options for the API's client.
+
+    Only the options set in Settings are passed, so the others keep their value from the URI.
+    """
+    configured = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGODB_SOCKET_TIMEOUT_MS,
+        "readPreference": settings.MONGODB_READ_PREFERENCE,
+    }
+    options = {name: value for name, value in configured.items() if value is not None}
+    options["event_listeners"] = [pool_monitor]
+    compressors = available_compressors()
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+def pool_settings() -> dict:
+    """
+    The client's effective pool options, whether they came from Settings or the URI.
+    """
+    options = db.client.options
+    return {
+        "max_pool_size": options.pool_options.max_pool_size,
+        "min_pool_size": options.pool_options.min_pool_size,
+        "compressors": available_compressors(),
+        "read_preference": options.read_preference.mongos_mode,
+    }
+
+async def warm_pool(client: AsyncIOMotorClient, connections: int) -> None:
+    """
+    Open up to `connections` pooled connections now rather than on the first requests.
+    """
+    # Concurrent pings each check out a connection of their own
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(max(connections, 1))))
+
 async def connect_to_mongo():
-    db.client = AsyncIOMotorClient(settings.MONGODB_URI)
+    db.client = AsyncIOMotorClient(settings.MONGODB_URI, **client_options())
     db.db = db.client[settings.DATABASE_NAME]
+    # The effective minimum, whether it came from Settings or the URI
+    await warm_pool(db.client, db.client.options.pool_options.min_pool_size)
     print(f"Connected to MongoDB: {settings.MONGODB_URI}, Database: {settings.DATABASE_NAME}")
 
 async def close_mongo_connection():
     if db.client:
         db.client.close()
-        print("Closed MongoDB connection")
\ No newline at end of file
+        print("Closed MongoDB connection")
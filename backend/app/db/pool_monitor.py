@@ -0,0 +1,105 @@
+import threading
+import time
+from typing import Dict
+
+from pymongo import monitoring
+
+
+class _PoolCounters:
+    __slots__ = (
+        "open", "checked_out", "waiters", "max_waiters", "check_outs",
+        "check_out_failures", "wait_seconds", "max_wait_seconds", "cleared",
+    )
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+
+    def as_dict(self) -> dict:
+        stats = {name: getattr(self, name) for name in self.__slots__}
+        stats["average_wait_ms"] = self.wait_seconds * 1000 / self.check_outs if self.check_outs else 0.0
+        stats["max_wait_ms"] = self.max_wait_seconds * 1000
+        del stats["wait_seconds"], stats["max_wait_seconds"]
+        return stats
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Live connection pool statistics per server, from the driver's CMAP events.
+
+    Events arrive on the driver's threads (Motor runs operations in a
+    thread pool), so counters are updated under a lock and check-out wait
+    times are measured per thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pools: Dict[str, _PoolCounters] = {}
+
+    def _pool(self, address) -> _PoolCounters:
+        key = f"{address[0]}:{address[1]}"
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _PoolCounters()
+        return pool
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address).cleared += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address).open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._pool(event.address).open -= 1
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiters += 1
+            pool.max_waiters = max(pool.max_waiters, pool.waiters)
+
+    def connection_checked_out(self, event):
+        waited = time.perf_counter() - getattr(self._local, "started", time.perf_counter())
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiters -= 1
+            pool.checked_out += 1
+            pool.check_outs += 1
+            pool.wait_seconds += waited
+            pool.max_wait_seconds = max(pool.max_wait_seconds, waited)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiters -= 1
+            pool.check_out_failures += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._pool(event.address).checked_out -= 1
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            return {address: pool.as_dict() for address, pool in self._pools.items()}
+
+
+pool_monitor = PoolMonitor()
@@ -0,0 +1,105 @@
+import hashlib
+import hmac
+import time
+
+from fastapi import Request
+from pymongo import ReadPreference
+from pymongo.database import Database
+from pymongo.read_preferences import SecondaryPreferred
+from starlette.datastructures import MutableHeaders
+
+from app.core.cache import reads_as_of, skip_cache_reads
+from app.core.config import settings
+from app.db.mongodb import db
+
+# Time of the client's last write, sent back by browsers (cookie) or API clients (header)
+LAST_WRITE_COOKIE = "tinyblog_last_write"
+LAST_WRITE_HEADER = "X-Last-Write"
+
+_READ_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Logging in or refreshing a token writes nothing the client then reads
+_UNSTAMPED_PATHS = {f"{settings.API_V1_STR}/auth/login", f"{settings.API_V1_STR}/auth/refresh"}
+
+
+def _signature(stamp: str) -> str:
+    return hmac.new(settings.SECRET_KEY.encode(), f"last_write:{stamp}".encode(), hashlib.sha256).hexdigest()
+
+
+def sign_last_write(when: float) -> str:
+    """
+    Last-write stamp for `when`, signed so clients cannot forge one to skip the cache.
+    """
+    stamp = f"{when:.3f}"
+    return f"{stamp}.{_signature(stamp)}"
+
+
+def last_write(request: Request) -> float:
+    value = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    stamp, _, signature = (value or "").rpartition(".")
+    if not stamp or not hmac.compare_digest(signature, _signature(stamp)):
+        return 0.0
+    try:
+        stamp = float(stamp)
+    except ValueError:
+        return 0.0
+    # Stamps are only ever issued for the past; a future one would pin the client to the primary
+    return stamp if stamp <= time.time() else 0.0
+
+
+def wrote_recently(request: Request) -> bool:
+    return time.time() - last_write(request) < settings.READ_YOUR_WRITES_SECONDS
+
+
+async def get_read_database(request: Request) -> Database:
+    """
+    Database for public reads: a secondary within the staleness bound, or the
+    primary (bypassing the response cache) for clients that wrote recently.
+
+    Secondary reads may be up to READ_MAX_STALENESS_SECONDS old, so responses
+    built from them are not cached when an invalidation came within that time.
+    """
+    if not settings.READ_FROM_SECONDARIES:
+        return db.db
+    if wrote_recently(request):
+        # Cached responses may have been filled from a secondary that lags the write
+        skip_cache_reads.set(True)
+        return db.db.with_options(read_preference=ReadPreference.PRIMARY)
+    reads_as_of.set(time.time() - settings.READ_MAX_STALENESS_SECONDS)
+    return db.db.with_options(
+        read_preference=SecondaryPreferred(max_staleness=settings.READ_MAX_STALENESS_SECONDS)
+    )
+
+
+class LastWriteMiddleware:
+    """
+    Stamps the response of every successful write with the last-write cookie and header.
+
+    Logins and token refreshes are not stamped.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in _READ_METHODS
+            or not settings.READ_FROM_SECONDARIES
+            or scope["path"].rstrip("/") in _UNSTAMPED_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_stamp(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                stamp = sign_last_write(time.time())
+                headers = MutableHeaders(scope=message)
+                headers.append(LAST_WRITE_HEADER, stamp)
+                headers.append(
+                    "set-cookie",
+                    f"{LAST_WRITE_COOKIE}={stamp}; Max-Age={settings.READ_YOUR_WRITES_SECONDS}; "
+                    "Path=/; HttpOnly; SameSite=lax",
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_stamp)
@@ -0,0 +1,31 @@
+import asyncio
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.db.mongodb import db
+from app.services.counters import rebuild_post_counts, reconcile_comment_counts
+from app.services.posts import backfill_post_summaries
+from app.services.versions import bump_versions
+
+async def reconcile():
+    """
+    Rebuild all denormalized counters and post summaries from their source data.
+    """
+    comments = await reconcile_comment_counts(db.db)
+    print(f"Comment counters corrected on {comments} posts")
+    taxonomy = await rebuild_post_counts(db.db)
+    print(f"Post counters corrected on {taxonomy} categories and tags")
+    summaries = await backfill_post_summaries(db.db)
+    print(f"Excerpts stored on {summaries} posts")
+    if comments or taxonomy or summaries:
+        # Running servers key their cached responses by these versions
+        await bump_versions(db.db, "posts", "categories", "tags")
+
+if __name__ == "__main__":
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db.client = client
+    db.db = client[settings.DATABASE_NAME]
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(reconcile())
@@ -0,0 +1,26 @@
+import asyncio
+import sys
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.core.config import settings
+from app.db.mongodb import db
+from app.services.rendering import RENDERER_VERSION, rerender_posts, shutdown_renderer
+
+async def render(force: bool = False):
+    """
+    Re-render stored post HTML after a renderer version change.
+    """
+    try:
+        rendered = await rerender_posts(db.db, force=force)
+    finally:
+        shutdown_renderer()
+    print(f"Rendered {rendered} posts with renderer version {RENDERER_VERSION}")
+
+if __name__ == "__main__":
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db.client = client
+    db.db = client[settings.DATABASE_NAME]
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(render(force="--force" in sys.argv[1:]))
@@ -3,8 +3,16 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api.api import api_router
-from app.db.mongodb import connect_to_mongo, close_mongo_connection
+from app.core.cache import response_cache
+from app.core.hashing import password_hasher
+from app.core.revocation import revocation_store
+from app.db.mongodb import connect_to_mongo, close_mongo_connection, db
 from app.db.init_db import init_db
+from app.db.read_routing import LastWriteMiddleware
+from app.services.importer import shutdown_importer
+from app.services.refdata import reference_store
+from app.services.rendering import shutdown_renderer
+from app.services.search import search_service
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -26,6 +34,9 @@ app.add_middleware(
     max_age=600,  # Cache preflight request for 10 minutes
 )
 
+# Lets clients that just wrote read their writes when reads go to secondaries
+app.add_middleware(LastWriteMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
@@ -34,10 +45,22 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 async def startup_db_client():
     await connect_to_mongo()
     await init_db()
+    await response_cache.start()
+    await reference_store.start(db.db)
+    await search_service.start(db.db)
+    # Checks claims tokens, and cached users against revocations made by other workers
+    await revocation_store.start(db.db)
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await revocation_store.stop()
+    await search_service.stop()
+    await reference_store.stop()
+    shutdown_renderer()
+    shutdown_importer()
+    password_hasher.shutdown()
+    await response_cache.close()
     await close_mongo_connection()
 
 
@@ -0,0 +1,23 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+class RecordError(BaseModel):
+    line: int
+    id: Optional[str] = None
+    detail: str
+
+
+class ImportReport(BaseModel):
+    collection: str
+    inserted: int = 0
+    failed: int = 0
+    errors: List[RecordError] = []
+    errors_truncated: bool = False
+
+
+class BulkActionResult(BaseModel):
+    action: str
+    matched: int = 0
+    modified: int = 0
+    posts: int = 0
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -34,4 +34,15 @@ class CommentInDBBase(CommentBase):
 
 
 class Comment(CommentInDBBase):
-    pass
\ No newline at end of file
+    pass
+
+
+class PendingCount(BaseModel):
+    count: int
+    capped: bool = False
+
+
+class CommentSelection(BaseModel):
+    ids: Optional[List[str]] = None
+    post_id: Optional[str] = None
+    author_email: Optional[str] = None
@@ -29,6 +29,12 @@ class PostInDBBase(PostBase):
     date: datetime = Field(default_factory=datetime.utcnow)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    comment_count: int = 0
+    approved_comment_count: int = 0
+    excerpt: Optional[str] = None
+    word_count: int = 0
+    reading_time: int = 0
+    html: Optional[str] = None
 
     class Config:
         populate_by_name = True
@@ -41,5 +47,26 @@ class Post(PostInDBBase):
 class PostWithDetails(Post):
     author_name: str
     category_name: str
-    comment_count: int = 0
-    tags_info: List[dict] = []
\ No newline at end of file
+    tags_info: List[dict] = []
+    # Only set on search results
+    score: Optional[float] = None
+    snippet: Optional[str] = None
+
+
+class FacetCount(BaseModel):
+    id: str
+    name: str
+    count: int
+
+
+class MonthCount(BaseModel):
+    month: str
+    count: int
+
+
+class PostFacets(BaseModel):
+    total: int
+    categories: List[FacetCount] = []
+    tags: List[FacetCount] = []
+    authors: List[FacetCount] = []
+    months: List[MonthCount] = []
\ No newline at end of file
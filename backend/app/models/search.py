@@ -0,0 +1,13 @@
+from typing import List
+from pydantic import BaseModel
+
+
+class Suggestion(BaseModel):
+    id: str
+    text: str
+
+
+class Suggestions(BaseModel):
+    posts: List[Suggestion] = []
+    categories: List[Suggestion] = []
+    tags: List[Suggestion] = []
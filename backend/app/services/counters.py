@@ -0,0 +1,181 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from app.services.loaders import to_object_ids
+
+logger = logging.getLogger(__name__)
+
+BULK_WRITE_CHUNK_SIZE = 1000
+
+
+async def adjust_comment_counts(db: Database, post_id: str, total: int = 0, approved: int = 0) -> None:
+    """
+    Atomically shift the denormalized comment counters stored on a post.
+    """
+    increments = {}
+    if total:
+        increments["comment_count"] = total
+    if approved:
+        increments["approved_comment_count"] = approved
+    if not increments:
+        return
+    try:
+        object_id = ObjectId(post_id)
+    except (InvalidId, TypeError):
+        return
+    # The counters are part of the post representation, so they move its version too
+    increments["version"] = 1
+    await db.posts.update_one(
+        {"_id": object_id},
+        {"$inc": increments, "$set": {"modified_at": datetime.utcnow()}},
+    )
+
+
+async def apply_comment_count_deltas(db: Database, deltas: Dict[str, Tuple[int, int]]) -> None:
+    """
+    Shift the comment counters of many posts in one bulk write; `deltas` maps
+    post ids to (total, approved) changes.
+    """
+    now = datetime.utcnow()
+    operations = []
+    for post_id, (total, approved) in deltas.items():
+        increments = {}
+        if total:
+            increments["comment_count"] = total
+        if approved:
+            increments["approved_comment_count"] = approved
+        object_ids = to_object_ids([post_id])
+        if increments and object_ids:
+            increments["version"] = 1
+            operations.append(UpdateOne({"_id": object_ids[0]}, {"$inc": increments, "$set": {"modified_at": now}}))
+    await _bulk_write(db.posts, operations)
+
+
+async def _bulk_write(collection, operations: list) -> int:
+    modified = 0
+    for start in range(0, len(operations), BULK_WRITE_CHUNK_SIZE):
+        chunk = operations[start:start + BULK_WRITE_CHUNK_SIZE]
+        result = await collection.bulk_write(chunk, ordered=False)
+        modified += result.modified_count
+    return modified
+
+
+async def reconcile_comment_counts(db: Database, post_ids: Optional[Iterable[str]] = None) -> int:
+    """
+    Recompute the comment counters of every post, or of the given posts, from the comments collection.
+
+    Returns the number of posts whose stored counters were corrected.
+    """
+    post_query = {}
+    pipeline = []
+    if post_ids is not None:
+        post_ids = list(post_ids)
+        post_query = {"_id": {"$in": to_object_ids(post_ids)}}
+        pipeline.append({"$match": {"post_id": {"$in": post_ids}}})
+    pipeline += [
+        {"$group": {
+            "_id": "$post_id",
+            "total": {"$sum": 1},
+            "approved": {"$sum": {"$cond": [{"$eq": ["$is_approved", True]}, 1, 0]}},
+        }},
+    ]
+    counts: Dict[str, dict] = {}
+    async for row in db.comments.aggregate(pipeline):
+        counts[row["_id"]] = row
+
+    operations = []
+    projection = {"comment_count": 1, "approved_comment_count": 1}
+    async for post in db.posts.find(post_query, projection):
+        row = counts.get(str(post["_id"]), {})
+        expected = {
+            "comment_count": row.get("total", 0),
+            "approved_comment_count": row.get("approved", 0),
+        }
+        if any(post.get(field) != value for field, value in expected.items()):
+            # The counters are part of the post's representation, so its version moves too
+            operations.append(UpdateOne({"_id": post["_id"]}, {"$set": expected, "$inc": {"version": 1}}))
+
+    modified = await _bulk_write(db.posts, operations)
+    logger.info(f"Reconciled comment counters on {modified} posts")
+    return modified
+
+
+def _post_count_contribution(post: Optional[dict]) -> Tuple[Optional[str], Set[str]]:
+    """
+    Category and tags a post counts towards; only visible posts are counted.
+    """
+    if not post or not post.get("is_visible"):
+        return None, set()
+    return post.get("category_id"), set(post.get("tags") or [])
+
+
+async def _increment_post_count(collection, ids: Iterable[str], delta: int) -> None:
+    object_ids = to_object_ids(ids)
+    if object_ids:
+        await collection.update_many({"_id": {"$in": object_ids}}, {"$inc": {"post_count": delta}})
+
+
+async def apply_post_count_changes(db: Database, before: Optional[dict], after: Optional[dict]) -> None:
+    """
+    Shift category and tag post counters for a post going from `before` to `after`.
+
+    Pass None as `before` for a newly created post and as `after` for a deleted one.
+    """
+    old_category, old_tags = _post_count_contribution(before)
+    new_category, new_tags = _post_count_contribution(after)
+
+    operations = []
+    if old_category != new_category:
+        if old_category:
+            operations.append(_increment_post_count(db.categories, [old_category], -1))
+        if new_category:
+            operations.append(_increment_post_count(db.categories, [new_category], 1))
+    if old_tags - new_tags:
+        operations.append(_increment_post_count(db.tags, old_tags - new_tags, -1))
+    if new_tags - old_tags:
+        operations.append(_increment_post_count(db.tags, new_tags - old_tags, 1))
+    if operations:
+        await asyncio.gather(*operations)
+
+
+async def _rebuild_collection_post_counts(collection, pipeline: list) -> int:
+    counts = {}
+    async for row in collection.database.posts.aggregate(pipeline):
+        counts[row["_id"]] = row["count"]
+
+    operations = []
+    async for doc in collection.find({}, {"post_count": 1}):
+        expected = counts.get(str(doc["_id"]), 0)
+        if doc.get("post_count") != expected:
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"post_count": expected}}))
+    return await _bulk_write(collection, operations)
+
+
+async def rebuild_post_counts(db: Database) -> int:
+    """
+    Recompute the post counters stored on categories and tags.
+
+    Returns the number of category and tag documents that were corrected.
+    """
+    category_pipeline = [
+        {"$match": {"is_visible": True}},
+        {"$group": {"_id": "$category_id", "count": {"$sum": 1}}},
+    ]
+    tag_pipeline = [
+        {"$match": {"is_visible": True}},
+        {"$unwind": "$tags"},
+        {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+    ]
+    categories, tags = await asyncio.gather(
+        _rebuild_collection_post_counts(db.categories, category_pipeline),
+        _rebuild_collection_post_counts(db.tags, tag_pipeline),
+    )
+    logger.info(f"Rebuilt post counters on {categories} categories and {tags} tags")
+    return categories + tags
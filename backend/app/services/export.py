@@ -0,0 +1,172 @@
+import zlib
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from bson import ObjectId, json_util
+from bson.json_util import JSONOptions, JSONMode
+from pymongo.database import Database
+
+from app.core.config import settings
+
+# Collections that can be exported and imported as NDJSON, referenced collections first
+EXPORT_COLLECTIONS = ("categories", "tags", "users", "posts", "comments")
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+# Relaxed Extended JSON keeps dates readable and ObjectIds typed, so json_util.loads restores them
+_JSON_OPTIONS = JSONOptions(json_mode=JSONMode.RELAXED, tz_aware=False)
+
+# Flush the compressor at least this often so a stream never holds much in memory
+_CHUNK_SIZE = 64 * 1024
+
+FILE_EXTENSIONS = {"none": ".ndjson", "gzip": ".ndjson.gz", "zstd": ".ndjson.zst"}
+MEDIA_TYPES = {"none": "application/x-ndjson", "gzip": "application/gzip", "zstd": "application/zstd"}
+
+
+class _Identity:
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def make_compressor(compression: str):
+    """
+    Incremental compressor with zlib-style compress/flush, raising ValueError
+    for an unknown or unavailable compression.
+    """
+    if compression == "none":
+        return _Identity()
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("The zstandard package is required for zstd compression")
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class _Passthrough:
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class _GzipStream:
+    def __init__(self):
+        self._inflater = zlib.decompressobj(31)
+
+    def decompress(self, data: bytes) -> bytes:
+        output = bytearray()
+        while data:
+            output += self._inflater.decompress(data)
+            data = self._inflater.unused_data
+            if data:
+                self._inflater = zlib.decompressobj(31)
+        return bytes(output)
+
+
+def make_decompressor(compression: str):
+    """
+    Incremental decompressor for make_compressor output, raising ValueError
+    for an unknown or unavailable compression.
+    """
+    if compression == "none":
+        return _Passthrough()
+    if compression == "gzip":
+        # Also reads concatenated gzip members
+        return _GzipStream()
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("The zstandard package is required for zstd compression")
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def dump_document(document: dict) -> bytes:
+    return json_util.dumps(document, json_options=_JSON_OPTIONS).encode() + b"\n"
+
+
+def load_document(line: bytes) -> dict:
+    return json_util.loads(line, json_options=_JSON_OPTIONS)
+
+
+def export_query(after: Optional[str]) -> dict:
+    """
+    Documents following the `after` checkpoint in _id order, raising ValueError for a malformed id.
+    """
+    if not after:
+        return {}
+    if not ObjectId.is_valid(after):
+        raise ValueError(f"Invalid checkpoint: {after}")
+    return {"_id": {"$gt": ObjectId(after)}}
+
+
+async def iter_export(
+    db: Database,
+    collection: str,
+    after: Optional[str] = None,
+    include_password_hashes: bool = False,
+) -> AsyncIterator[dict]:
+    """
+    Documents of a collection in _id order, starting after the `after` checkpoint.
+
+    Reads go through one cursor with a large batch size; _id order stays
+    stable under concurrent writes, so an interrupted export resumes from
+    the _id of the last document it wrote.
+    """
+    projection: Optional[Dict[str, int]] = None
+    if collection == "users" and not include_password_hashes:
+        projection = {"hashed_password": 0}
+    cursor = db[collection].find(export_query(after), projection).sort("_id", 1)
+    async for document in cursor.batch_size(settings.EXPORT_BATCH_SIZE):
+        yield document
+
+
+async def stream_export(
+    db: Database,
+    collection: str,
+    compression: str = "none",
+    after: Optional[str] = None,
+    include_password_hashes: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    NDJSON bytes of a collection export, compressed as requested, in chunks of about 64 KiB.
+    """
+    compressor = make_compressor(compression)
+    buffer = bytearray()
+    async for document in iter_export(db, collection, after, include_password_hashes):
+        buffer += dump_document(document)
+        if len(buffer) >= _CHUNK_SIZE:
+            chunk = compressor.compress(bytes(buffer))
+            buffer.clear()
+            if chunk:
+                yield chunk
+    chunk = compressor.compress(bytes(buffer)) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+async def read_ndjson(chunks: AsyncIterator[bytes], compression: str = "none") -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Numbered non-blank lines of a possibly compressed NDJSON byte stream.
+    """
+    decompressor = make_decompressor(compression)
+    pending = b""
+    number = 0
+    async for chunk in chunks:
+        try:
+            pending += decompressor.decompress(chunk)
+        except Exception as e:
+            # zlib and zstandard raise their own error types for corrupt input
+            raise ValueError(f"Corrupt {compression} input") from e
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            number += 1
+            if line.strip():
+                yield number, line
+    if pending.strip():
+        yield number + 1, pending
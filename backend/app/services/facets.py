@@ -0,0 +1,68 @@
+from typing import List, Optional
+
+from pymongo.database import Database
+
+from app.services.loaders import Loaders
+
+
+def facet_pipeline(query: dict, limit: int) -> List[dict]:
+    """
+    One aggregation computing every sidebar facet of the posts matching `query`.
+    """
+    def top(field: str) -> List[dict]:
+        return [
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+            {"$match": {"_id": {"$ne": None}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": limit},
+        ]
+
+    return [
+        {"$match": query},
+        {"$facet": {
+            "total": [{"$count": "count"}],
+            "categories": top("category_id"),
+            "tags": [{"$unwind": "$tags"}] + top("tags"),
+            "authors": top("author_id"),
+            "months": [
+                {"$group": {"_id": {"$dateToString": {"format": "%Y-%m", "date": "$date"}}, "count": {"$sum": 1}}},
+                {"$match": {"_id": {"$ne": None}}},
+                {"$sort": {"_id": -1}},
+            ],
+        }},
+    ]
+
+
+async def compute_facets(
+    db: Database, loaders: Loaders, query: dict, limit: int = 20, max_time_ms: Optional[int] = None,
+) -> dict:
+    """
+    Category, tag, author and month counts with names resolved through the request's loaders.
+    """
+    options = {"maxTimeMS": max_time_ms} if max_time_ms else {}
+    result = await db.posts.aggregate(facet_pipeline(query, limit), **options).to_list(length=1)
+    facets = result[0] if result else {}
+
+    category_ids = [bucket["_id"] for bucket in facets.get("categories", [])]
+    tag_ids = [bucket["_id"] for bucket in facets.get("tags", [])]
+    author_ids = [bucket["_id"] for bucket in facets.get("authors", [])]
+    # Queue every key before awaiting so each loader issues a single batch
+    categories = loaders.categories.load_many(category_ids)
+    tags = loaders.tags.load_many(tag_ids)
+    authors = loaders.users.load_many(author_ids)
+    categories, tags, authors = await categories, await tags, await authors
+
+    def counts(buckets: List[dict], docs: List[dict], name) -> List[dict]:
+        return [
+            {"id": bucket["_id"], "name": name(doc) if doc else "Unknown", "count": bucket["count"]}
+            for bucket, doc in zip(buckets, docs)
+        ]
+
+    total = facets.get("total")
+    return {
+        "total": total[0]["count"] if total else 0,
+        "categories": counts(facets.get("categories", []), categories, lambda doc: doc["name"]),
+        "tags": counts(facets.get("tags", []), tags, lambda doc: doc["name"]),
+        "authors": counts(facets.get("authors", []), authors, lambda doc: doc.get("full_name") or doc["username"]),
+        "months": [{"month": bucket["_id"], "count": bucket["count"]} for bucket in facets.get("months", [])],
+    }
@@ -0,0 +1,313 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.models.bulk import ImportReport, RecordError
+from app.models.category import CategoryCreate
+from app.models.comment import CommentCreate
+from app.models.post import PostCreate
+from app.models.tag import TagCreate
+from app.models.user import UserBase
+from app.services.counters import rebuild_post_counts, reconcile_comment_counts
+from app.services.export import EXPORT_COLLECTIONS, load_document
+from app.services.refdata import REFERENCE_COLLECTIONS, reference_store
+from app.services.rendering import render_post_texts
+from app.services.search import search_service
+from app.services.text import summarize
+from app.services.versions import bump_versions
+
+logger = logging.getLogger(__name__)
+
+# Records accepted by each importable collection, checked before any reference lookups
+RECORD_MODELS = {
+    "categories": CategoryCreate,
+    "tags": TagCreate,
+    "users": UserBase,
+    "posts": PostCreate,
+    "comments": CommentCreate,
+}
+# Fields taken from each record; everything else, including rendered HTML,
+# counters and summaries, is dropped and derived again on import
+IMPORT_FIELDS = {
+    "categories": {"name", "description"},
+    "tags": {"name"},
+    "users": {"username", "email", "full_name", "is_active", "is_superuser", "password", "hashed_password"},
+    "posts": {"title", "text", "is_visible", "category_id", "tags", "author_id", "date"},
+    "comments": {"post_id", "text", "author_name", "author_email", "is_approved", "date"},
+}
+DATE_FIELDS = ("date", "created_at", "updated_at")
+# Only the first errors are reported; the count covers all of them
+MAX_REPORTED_ERRORS = 100
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+Record = Tuple[int, dict]
+
+
+def _hash_batch(passwords: List[str]) -> List[str]:
+    return [get_password_hash(password) for password in passwords]
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.IMPORT_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_importer() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'record'}: {item['msg']}"
+        for item in error.errors()
+    )
+
+
+def _parse_date(value: str) -> datetime:
+    # Dates are stored as naive UTC
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _record_id(document: dict) -> Optional[str]:
+    return str(document["_id"]) if "_id" in document else None
+
+
+class Importer:
+    """
+    Validates and inserts one collection's NDJSON records in chunks.
+
+    References are checked per chunk against id sets that grow as chunks
+    are read, so each referenced collection is queried once per chunk at
+    most. Rejected and duplicate records are reported without stopping
+    the import.
+    """
+
+    def __init__(self, db: Database, collection: str, default_author_id: Optional[str] = None):
+        if collection not in RECORD_MODELS:
+            raise ValueError(f"Unknown collection: {collection}")
+        self.db = db
+        self.collection = collection
+        self.default_author_id = default_author_id
+        self.report = ImportReport(collection=collection)
+        self._known: dict = {name: set() for name in EXPORT_COLLECTIONS}
+        self._now = datetime.utcnow()
+
+    def fail(self, line: int, record_id: Optional[str], detail: str) -> None:
+        self.report.failed += 1
+        if len(self.report.errors) < MAX_REPORTED_ERRORS:
+            self.report.errors.append(RecordError(line=line, id=record_id, detail=detail))
+        else:
+            self.report.errors_truncated = True
+
+    async def run(self, lines: AsyncIterator[Tuple[int, bytes]]) -> ImportReport:
+        chunk: List[Record] = []
+        try:
+            async for line, raw in lines:
+                try:
+                    document = load_document(raw)
+                except ValueError as e:
+                    self.fail(line, None, f"Invalid JSON: {e}")
+                    continue
+                if not isinstance(document, dict):
+                    self.fail(line, None, "Each line must hold one JSON object")
+                    continue
+                chunk.append((line, document))
+                if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+                    await self.import_chunk(chunk)
+                    chunk = []
+            if chunk:
+                await self.import_chunk(chunk)
+        finally:
+            # Derived data must cover whatever was inserted, even when the input broke off
+            if self.report.inserted:
+                await self.finish()
+        self.report.errors.sort(key=lambda error: error.line)
+        logger.info(
+            f"Imported {self.report.inserted} {self.collection}, {self.report.failed} records rejected"
+        )
+        return self.report
+
+    async def import_chunk(self, chunk: List[Record]) -> None:
+        records = [record for record in (self._validate(line, document) for line, document in chunk) if record]
+        records = await self._check_references(records)
+        if self.collection == "users":
+            records = await self._hash_passwords(records)
+        elif self.collection == "posts":
+            await self._render(records)
+        if records:
+            await self._insert(records)
+
+    def _validate(self, line: int, document: dict) -> Optional[Record]:
+        fields = IMPORT_FIELDS[self.collection] | {"_id", "created_at", "updated_at"}
+        document = {field: value for field, value in document.items() if field in fields}
+        # Ids may be given as strings; everything else keeps its exported type
+        if isinstance(document.get("_id"), str):
+            if not ObjectId.is_valid(document["_id"]):
+                self.fail(line, document["_id"], "Invalid _id")
+                return None
+            document["_id"] = ObjectId(document["_id"])
+        for field in DATE_FIELDS:
+            if isinstance(document.get(field), str):
+                try:
+                    document[field] = _parse_date(document[field])
+                except ValueError:
+                    self.fail(line, _record_id(document), f"{field}: invalid date")
+                    return None
+        if self.collection == "posts" and not document.get("author_id"):
+            document["author_id"] = self.default_author_id
+
+        model = RECORD_MODELS[self.collection]
+        try:
+            model(**document)
+        except ValidationError as e:
+            self.fail(line, _record_id(document), _validation_message(e))
+            return None
+        if self.collection == "users" and not (document.get("password") or document.get("hashed_password")):
+            self.fail(line, _record_id(document), "password or hashed_password is required")
+            return None
+        if self.collection == "posts" and not document.get("author_id"):
+            self.fail(line, _record_id(document), "author_id is required")
+            return None
+        return line, self._with_defaults(document)
+
+    def _with_defaults(self, document: dict) -> dict:
+        document.setdefault("created_at", document.get("date") or self._now)
+        document.setdefault("updated_at", document["created_at"])
+        if self.collection in ("posts", "comments"):
+            document.setdefault("date", document["created_at"])
+        if self.collection in REFERENCE_COLLECTIONS:
+            # Rebuilt once the posts are imported
+            document["post_count"] = 0
+        elif self.collection == "users":
+            document.setdefault("is_active", True)
+            document.setdefault("is_superuser", False)
+        elif self.collection == "posts":
+            document.setdefault("is_visible", False)
+            document["tags"] = document.get("tags") or []
+            document.setdefault("version", 1)
+            # Counters are reconciled from the comments at the end of the import
+            document["comment_count"] = 0
+            document["approved_comment_count"] = 0
+            document.update(summarize(document["text"]))
+        elif self.collection == "comments":
+            document.setdefault("is_approved", False)
+        return document
+
+    async def _existing(self, collection: str, ids: Iterable[str]) -> Set[str]:
+        """
+        The subset of `ids` present in a collection, looking up unseen ids in one query.
+        """
+        known = self._known[collection]
+        unseen = {value for value in ids if value not in known and ObjectId.is_valid(value)}
+        if unseen:
+            cursor = self.db[collection].find({"_id": {"$in": [ObjectId(value) for value in unseen]}}, {"_id": 1})
+            async for document in cursor:
+                known.add(str(document["_id"]))
+        return known
+
+    async def _check_references(self, records: List[Record]) -> List[Record]:
+        if self.collection == "posts":
+            categories = await self._existing("categories", {doc["category_id"] for _, doc in records})
+            tags = await self._existing("tags", {tag for _, doc in records for tag in doc["tags"]})
+            authors = await self._existing("users", {doc["author_id"] for _, doc in records})
+            checks = [
+                ("category_id", lambda doc: doc["category_id"] in categories),
+                ("tags", lambda doc: all(tag in tags for tag in doc["tags"])),
+                ("author_id", lambda doc: doc["author_id"] in authors),
+            ]
+        elif self.collection == "comments":
+            posts = await self._existing("posts", {doc["post_id"] for _, doc in records})
+            checks = [("post_id", lambda doc: doc["post_id"] in posts)]
+        else:
+            return records
+
+        valid = []
+        for line, document in records:
+            missing = [field for field, check in checks if not check(document)]
+            if missing:
+                self.fail(line, _record_id(document), f"Unknown reference in {', '.join(missing)}")
+            else:
+                valid.append((line, document))
+        return valid
+
+    async def _hash_passwords(self, records: List[Record]) -> List[Record]:
+        pending = [document for _, document in records if document.get("password")]
+        if pending:
+            loop = asyncio.get_running_loop()
+            hashes = await loop.run_in_executor(_get_executor(), _hash_batch, [doc.pop("password") for doc in pending])
+            for document, hashed_password in zip(pending, hashes):
+                document["hashed_password"] = hashed_password
+        return records
+
+    async def _render(self, records: List[Record]) -> None:
+        # Imported HTML is never trusted; every post is rendered and sanitized here
+        if records:
+            rendered = await render_post_texts([document["text"] for _, document in records])
+            for (_, document), fields in zip(records, rendered):
+                document.update(fields)
+
+    async def _insert(self, records: List[Record]) -> None:
+        documents = [document for _, document in records]
+        # insert_many assigns missing ids; report records by the id they came with
+        record_ids = [_record_id(document) for document in documents]
+        try:
+            result = await self.db[self.collection].insert_many(documents, ordered=False)
+            self.report.inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            self.report.inserted += e.details.get("nInserted", 0)
+            for error in e.details.get("writeErrors", []):
+                line, _ = records[error["index"]]
+                detail = "Duplicate key" if error.get("code") == 11000 else error.get("errmsg", "Write failed")
+                self.fail(line, record_ids[error["index"]], detail)
+
+    async def finish(self) -> None:
+        """
+        Bring derived data up to date once, after every chunk is in.
+        """
+        collection = self.collection
+        if collection == "posts":
+            await rebuild_post_counts(self.db)
+            await reconcile_comment_counts(self.db)
+        elif collection == "comments":
+            await reconcile_comment_counts(self.db)
+        await bump_versions(self.db, collection, *(("posts",) if collection == "comments" else ()))
+        if collection in REFERENCE_COLLECTIONS:
+            await reference_store.reload(self.db, collection)
+        if collection == "posts" and search_service.ready:
+            await search_service.sync(self.db)
+        await response_cache.clear()
+
+
+async def import_ndjson(
+    db: Database,
+    collection: str,
+    lines: AsyncIterator[Tuple[int, bytes]],
+    default_author_id: Optional[str] = None,
+) -> ImportReport:
+    """
+    Import numbered NDJSON lines into a collection, as produced by read_ndjson.
+    """
+    return await Importer(db, collection, default_author_id).run(lines)
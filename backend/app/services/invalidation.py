@@ -0,0 +1,95 @@
+from typing import Iterable, Optional, Set
+
+from pymongo.database import Database
+
+from app.core.cache import response_cache
+from app.services.refdata import reference_store
+from app.services.versions import bump_versions
+
+# Cache tags for listings; payloads additionally carry the tags of everything they embed
+CATEGORIES_TAG = "categories"
+TAGS_TAG = "tags"
+ALL_POSTS_TAG = "posts:all"
+
+
+def post_listing_tags(
+    category_ids: Iterable[str] = (),
+    tag_ids: Iterable[str] = (),
+    author_id: Optional[str] = None,
+) -> Set[str]:
+    """
+    Tags for a cached post listing, derived from the filters that define its membership.
+    """
+    tags = set()
+    for category_id in category_ids:
+        tags.add(f"posts:category:{category_id}")
+    for tag_id in tag_ids:
+        tags.add(f"posts:tag:{tag_id}")
+    if author_id:
+        tags.add(f"posts:author:{author_id}")
+    return tags or {ALL_POSTS_TAG}
+
+
+def post_payload_tags(posts: Iterable[dict]) -> Set[str]:
+    """
+    Tags for cached payloads embedding the given posts, their authors, categories and tags.
+    """
+    tags = set()
+    for post in posts:
+        tags.add(f"post:{post['id']}")
+        if post.get("author_id"):
+            tags.add(f"user:{post['author_id']}")
+        if post.get("category_id"):
+            tags.add(f"category:{post['category_id']}")
+        for tag_id in post.get("tags") or []:
+            tags.add(f"tag:{tag_id}")
+    return tags
+
+
+def _post_write_tags(post: dict) -> Set[str]:
+    post_id = post.get("id") or str(post.get("_id"))
+    tags = {f"post:{post_id}", ALL_POSTS_TAG, CATEGORIES_TAG, TAGS_TAG}
+    if post.get("category_id"):
+        tags.add(f"posts:category:{post['category_id']}")
+    for tag_id in post.get("tags") or []:
+        tags.add(f"posts:tag:{tag_id}")
+    if post.get("author_id"):
+        tags.add(f"posts:author:{post['author_id']}")
+    return tags
+
+
+async def invalidate_post(db: Database, *posts: Optional[dict]) -> None:
+    """
+    Purge cached payloads affected by a post write; pass the post before and after the change.
+    """
+    tags = set()
+    for post in posts:
+        if post:
+            tags |= _post_write_tags(post)
+    await bump_versions(db, "posts")
+    await response_cache.invalidate(tags)
+
+
+async def invalidate_post_comments(db: Database, *post_ids: str) -> None:
+    """
+    Purge cached payloads showing the comment counters of the given posts.
+    """
+    await bump_versions(db, "posts", "comments")
+    await response_cache.invalidate({f"post:{post_id}" for post_id in post_ids})
+
+
+async def invalidate_category(db: Database, category_id: str) -> None:
+    await bump_versions(db, "categories")
+    await reference_store.reload(db, "categories")
+    await response_cache.invalidate({CATEGORIES_TAG, f"category:{category_id}"})
+
+
+async def invalidate_tag(db: Database, tag_id: str) -> None:
+    await bump_versions(db, "tags")
+    await reference_store.reload(db, "tags")
+    await response_cache.invalidate({TAGS_TAG, f"tag:{tag_id}", f"posts:tag:{tag_id}"})
+
+
+async def invalidate_user(db: Database, user_id: str) -> None:
+    await bump_versions(db, "users")
+    await response_cache.invalidate({f"user:{user_id}"})
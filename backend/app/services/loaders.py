@@ -0,0 +1,136 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from bson import ObjectId
+from fastapi import Depends
+from pymongo.database import Database
+
+from app.db.mongodb import get_database
+from app.db.read_routing import get_read_database
+from app.services.refdata import reference_store
+
+BatchLoadFn = Callable[[List[str]], Awaitable[Dict[str, Any]]]
+
+
+def to_object_ids(ids: Iterable[str]) -> List[ObjectId]:
+    """
+    Convert string ids to ObjectIds, silently dropping malformed values.
+    """
+    # ObjectId(None) would generate a fresh id, so only strings are converted
+    return [ObjectId(value) for value in set(ids) if isinstance(value, str) and ObjectId.is_valid(value)]
+
+
+class DataLoader:
+    """
+    Coalesces the `load(key)` calls made in the same event-loop tick into a
+    single batch call and memoizes the results for the loader's lifetime.
+    """
+
+    def __init__(self, batch_load_fn: BatchLoadFn):
+        self._batch_load_fn = batch_load_fn
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._queue: List[str] = []
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+
+    def load(self, key: str) -> "asyncio.Future[Optional[Any]]":
+        future = self._futures.get(key)
+        if future is not None:
+            return future
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._futures[key] = future
+        self._queue.append(key)
+        if len(self._queue) == 1:
+            # Dispatch once everything already runnable has had a chance to queue its keys
+            loop.call_soon(self._schedule_dispatch)
+        return future
+
+    def load_many(self, keys: Iterable[str]) -> "asyncio.Future[List[Optional[Any]]]":
+        # Not a coroutine, so the keys are queued as soon as this is called
+        return asyncio.gather(*(self.load(key) for key in keys))
+
+    def prime(self, key: str, value: Any) -> None:
+        if key not in self._futures:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+            self._futures[key] = future
+
+    def clear(self, key: str) -> None:
+        self._futures.pop(key, None)
+
+    def _schedule_dispatch(self) -> None:
+        task = asyncio.ensure_future(self._dispatch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        self.batches += 1
+        try:
+            results = await self._batch_load_fn(keys)
+        except Exception as e:
+            for key in keys:
+                future = self._futures.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+        for key in keys:
+            future = self._futures.get(key)
+            if future is not None and not future.done():
+                future.set_result(results.get(key))
+
+
+def _documents_by_id(collection) -> BatchLoadFn:
+    async def batch_load(ids: List[str]) -> Dict[str, dict]:
+        object_ids = to_object_ids(ids)
+        if not object_ids:
+            return {}
+        docs = await collection.find({"_id": {"$in": object_ids}}).to_list(length=None)
+        return {str(doc["_id"]): doc for doc in docs}
+
+    return batch_load
+
+
+def _reference_documents(collection) -> BatchLoadFn:
+    fetch = _documents_by_id(collection)
+
+    async def batch_load(ids: List[str]) -> Dict[str, dict]:
+        # Serve from the in-memory snapshot and only query ids it does not know yet
+        found = {}
+        for doc_id in ids:
+            doc = reference_store.get(collection.name, doc_id)
+            if doc is not None:
+                found[doc_id] = doc
+        missing = [doc_id for doc_id in ids if doc_id not in found]
+        if missing:
+            found.update(await fetch(missing))
+        return found
+
+    return batch_load
+
+
+class Loaders:
+    """
+    Request-scoped loaders for the documents posts and comments refer to.
+    """
+
+    def __init__(self, db: Database):
+        self.users = DataLoader(_documents_by_id(db.users))
+        self.categories = DataLoader(_reference_documents(db.categories))
+        self.tags = DataLoader(_reference_documents(db.tags))
+
+
+async def get_loaders(db: Database = Depends(get_database)) -> Loaders:
+    """
+    FastAPI caches dependencies per request, so every dependency and endpoint
+    of a request shares the same loaders.
+    """
+    return Loaders(db)
+
+
+async def get_read_loaders(db: Database = Depends(get_read_database)) -> Loaders:
+    """
+    Loaders for public read endpoints, reading wherever get_read_database routes them.
+    """
+    return Loaders(db)
@@ -0,0 +1,143 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo.database import Database
+
+from app.models.bulk import BulkActionResult
+from app.models.comment import CommentSelection
+from app.services.counters import BULK_WRITE_CHUNK_SIZE, apply_comment_count_deltas, reconcile_comment_counts
+from app.services.invalidation import invalidate_post_comments
+from app.services.loaders import to_object_ids
+
+logger = logging.getLogger(__name__)
+
+# Comments each action applies to; anything else is already in the target state
+_ACTION_GUARDS = {
+    "approve": {"is_approved": {"$ne": True}},
+    "reject": {"is_approved": True},
+    "delete": {},
+}
+
+
+def selection_query(selection: CommentSelection) -> dict:
+    """
+    Mongo filter for the selected comments, raising ValueError for an empty
+    selection or malformed ids.
+    """
+    query = {}
+    if selection.ids is not None:
+        object_ids = to_object_ids(selection.ids)
+        if len(object_ids) != len(set(selection.ids)):
+            raise ValueError("Invalid comment ID in ids")
+        query["_id"] = {"$in": object_ids}
+    if selection.post_id:
+        query["post_id"] = selection.post_id
+    if selection.author_email:
+        query["author_email"] = selection.author_email
+    if not query:
+        raise ValueError("Select comments by ids, post_id or author_email")
+    return query
+
+
+async def author_post_ids(db: Database, user_id: str) -> List[str]:
+    """
+    Ids of every post written by the user.
+    """
+    return [str(post["_id"]) async for post in db.posts.find({"author_id": user_id}, {"_id": 1})]
+
+
+def pending_query(post_ids: Optional[List[str]] = None) -> dict:
+    """
+    Filter of the moderation queue, optionally limited to some posts; it
+    matches the partial index on unapproved comments.
+    """
+    query = {"is_approved": False}
+    if post_ids is not None:
+        query["post_id"] = {"$in": post_ids}
+    return query
+
+
+async def owned_post_ids(db: Database, user_id: str, post_ids: Iterable[str]) -> Set[str]:
+    """
+    The subset of `post_ids` written by the user, resolved with one query.
+    """
+    query = {"_id": {"$in": to_object_ids(post_ids)}, "author_id": user_id}
+    return {str(post["_id"]) async for post in db.posts.find(query, {"_id": 1})}
+
+
+def _deltas(action: str, comments: List[dict]) -> Dict[str, Tuple[int, int]]:
+    deltas: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+    for comment in comments:
+        delta = deltas[comment["post_id"]]
+        if action == "approve":
+            delta[1] += 1
+        elif action == "reject":
+            delta[1] -= 1
+        else:
+            delta[0] -= 1
+            delta[1] -= 1 if comment.get("is_approved") else 0
+    return {post_id: (total, approved) for post_id, (total, approved) in deltas.items()}
+
+
+async def _apply_chunk(db: Database, action: str, comments: List[dict]) -> int:
+    """
+    Apply the action to a chunk of comments read with their approval state.
+
+    Every write is guarded by the state the counter deltas were computed
+    from, so a comment changed concurrently is skipped rather than
+    miscounted; if anything was skipped the chunk's posts are recounted.
+    """
+    ids = [comment["_id"] for comment in comments]
+    if action == "delete":
+        approved = [comment["_id"] for comment in comments if comment.get("is_approved")]
+        others = [comment["_id"] for comment in comments if not comment.get("is_approved")]
+        modified = 0
+        if approved:
+            modified += (await db.comments.delete_many({"_id": {"$in": approved}, "is_approved": True})).deleted_count
+        if others:
+            modified += (await db.comments.delete_many({"_id": {"$in": others}, "is_approved": {"$ne": True}})).deleted_count
+    else:
+        result = await db.comments.update_many(
+            {"_id": {"$in": ids}, **_ACTION_GUARDS[action]},
+            {"$set": {"is_approved": action == "approve", "updated_at": datetime.utcnow()}},
+        )
+        modified = result.modified_count
+
+    if modified == len(comments):
+        await apply_comment_count_deltas(db, _deltas(action, comments))
+    else:
+        await reconcile_comment_counts(db, {comment["post_id"] for comment in comments})
+    return modified
+
+
+async def moderate_comments(db: Database, action: str, query: dict) -> BulkActionResult:
+    """
+    Approve, reject or delete every comment matching `query`, adjusting post counters as it goes.
+
+    Comments are handled in chunks of BULK_WRITE_CHUNK_SIZE with one
+    update_many or delete_many and one counter bulk write per chunk.
+    """
+    result = BulkActionResult(action=action)
+    post_ids: Set[str] = set()
+    chunk: List[dict] = []
+    projection = {"post_id": 1, "is_approved": 1}
+    cursor = db.comments.find({**query, **_ACTION_GUARDS[action]}, projection).batch_size(BULK_WRITE_CHUNK_SIZE)
+    async for comment in cursor:
+        chunk.append(comment)
+        if len(chunk) == BULK_WRITE_CHUNK_SIZE:
+            result.modified += await _apply_chunk(db, action, chunk)
+            result.matched += len(chunk)
+            post_ids.update(comment["post_id"] for comment in chunk)
+            chunk = []
+    if chunk:
+        result.modified += await _apply_chunk(db, action, chunk)
+        result.matched += len(chunk)
+        post_ids.update(comment["post_id"] for comment in chunk)
+
+    result.posts = len(post_ids)
+    if post_ids:
+        await invalidate_post_comments(db, *post_ids)
+    logger.info(f"Bulk {action}: {result.modified} of {result.matched} comments on {result.posts} posts")
+    return result
@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+# Sort order shared by every keyset-paginated listing; _id breaks ties between equal dates
+KEYSET_SORT: List[Tuple[str, int]] = [("date", -1), ("_id", -1)]
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Number of matches for listings paged by offset, such as ranked search results
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+def encode_cursor(date: datetime, object_id: ObjectId) -> str:
+    """
+    Build an opaque cursor pointing just after the given (date, _id) position.
+    """
+    payload = json.dumps({"d": date.isoformat(), "i": str(object_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """
+    Decode a cursor produced by encode_cursor, raising ValueError when it is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["d"]), ObjectId(payload["i"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def apply_cursor(query: dict, cursor: Optional[str], ascending: bool = False) -> dict:
+    """
+    Restrict a query to the documents that sort after the cursor position,
+    newest first unless `ascending`.
+    """
+    if not cursor:
+        return query
+    date, object_id = decode_cursor(cursor)
+    operator = "$gt" if ascending else "$lt"
+    after = {"$or": [
+        {"date": {operator: date}},
+        {"date": date, "_id": {operator: object_id}},
+    ]}
+    if not query:
+        return after
+    return {"$and": [query, after]}
+
+
+def next_cursor(documents: List[dict], limit: int) -> Optional[str]:
+    """
+    Cursor for the page following `documents`, or None when this was the last page.
+    """
+    if not documents or len(documents) < limit:
+        return None
+    last = documents[-1]
+    return encode_cursor(last["date"], last["_id"])
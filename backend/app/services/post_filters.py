@@ -0,0 +1,201 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Query
+
+from app.core.config import settings
+from app.models.user import UserInDB
+from app.services.query_planner import CAPPED, SCAN, QueryPlan, plan_query
+from app.services.search import search_service
+
+# Sort orders offered by post listings; _id breaks ties
+POST_SORTS: Dict[str, List[Tuple[str, int]]] = {
+    "newest": [("date", -1), ("_id", -1)],
+    "oldest": [("date", 1), ("_id", 1)],
+    "title": [("title", 1), ("_id", 1)],
+    "popular": [("approved_comment_count", -1), ("_id", -1)],
+}
+# Sorts that can be paged with a (date, _id) cursor, and whether they ascend
+KEYSET_SORTS = {"newest": False, "oldest": True}
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Dates are stored as naive UTC
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class PostFilters:
+    """
+    Filters shared by post listings and facets.
+    """
+
+    def __init__(
+        self,
+        categories: List[str],
+        tags: List[str],
+        match_all_tags: bool = False,
+        author_id: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        search: Optional[str] = None,
+        include_invisible: bool = False,
+    ):
+        self.categories = sorted(set(categories))
+        self.tags = sorted(set(tags))
+        self.match_all_tags = match_all_tags and len(self.tags) > 1
+        self.author_id = author_id
+        self.date_from = _utc(date_from)
+        self.date_to = _utc(date_to)
+        self.search = search
+        self.include_invisible = include_invisible
+
+    def cache_params(self) -> dict:
+        return {
+            "categories": ",".join(self.categories) or None,
+            "tags": ",".join(self.tags) or None,
+            "all_tags": self.match_all_tags or None,
+            "author_id": self.author_id,
+            "date_from": self.date_from.isoformat() if self.date_from else None,
+            "date_to": self.date_to.isoformat() if self.date_to else None,
+            "search": self.search,
+        }
+
+    def visible_only(self, current_user: Optional[UserInDB]) -> bool:
+        # Drafts are listed for superusers, and for authors listing their own posts
+        return not (
+            self.include_invisible
+            and current_user
+            and (current_user.is_superuser or self.author_id == current_user.id)
+        )
+
+    def build_query(self, current_user: Optional[UserInDB]) -> Tuple[dict, bool]:
+        """
+        Mongo filter, and whether search goes through the search index.
+        """
+        query = {}
+
+        # Filter by visibility
+        if self.visible_only(current_user):
+            query["is_visible"] = True
+
+        # Filter by category
+        if self.categories:
+            query["category_id"] = self.categories[0] if len(self.categories) == 1 else {"$in": self.categories}
+
+        # Filter by tags, matching any or all of them
+        if self.tags:
+            if len(self.tags) == 1:
+                query["tags"] = self.tags[0]
+            else:
+                query["tags"] = {"$all" if self.match_all_tags else "$in": self.tags}
+
+        # Filter by author
+        if self.author_id:
+            query["author_id"] = self.author_id
+
+        # Filter by publication date
+        if self.date_from or self.date_to:
+            query["date"] = {}
+            if self.date_from:
+                query["date"]["$gte"] = self.date_from
+            if self.date_to:
+                query["date"]["$lt"] = self.date_to
+
+        # Ranked search runs on the search index once it is ready; until then
+        # fall back to scanning title and text
+        ranked = bool(self.search) and search_service.ready
+        if self.search and not ranked:
+            query["$or"] = [
+                {"title": {"$regex": self.search, "$options": "i"}},
+                {"text": {"$regex": self.search, "$options": "i"}}
+            ]
+        return query, ranked
+
+    def search_filters(self, current_user: Optional[UserInDB]) -> dict:
+        """
+        The same filters as keyword arguments of the search index.
+        """
+        return {
+            "categories": set(self.categories) or None,
+            "tags": set(self.tags) or None,
+            "match_all_tags": self.match_all_tags,
+            "author_id": self.author_id,
+            "date_from": self.date_from,
+            "date_to": self.date_to,
+            "visible_only": self.visible_only(current_user),
+        }
+
+
+def get_post_filters(
+    category_id: Optional[str] = None,
+    categories: List[str] = Query([]),
+    tag_id: Optional[str] = None,
+    tags: List[str] = Query([]),
+    tags_match: str = Query("any", pattern="^(any|all)$"),
+    author_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    search: Optional[str] = None,
+    include_invisible: bool = False,
+) -> PostFilters:
+    """
+    Listing filters: `categories` and `tags` may be repeated (`category_id` and
+    `tag_id` are kept as single-value aliases), `tags_match=all` requires every
+    tag, and `date_from`/`date_to` bound the publication date.
+    """
+    return PostFilters(
+        categories=categories + ([category_id] if category_id else []),
+        tags=tags + ([tag_id] if tag_id else []),
+        match_all_tags=tags_match == "all",
+        author_id=author_id,
+        date_from=date_from,
+        date_to=date_to,
+        search=search,
+        include_invisible=include_invisible,
+    )
+
+
+def check_query_plan(
+    query: dict,
+    sort: List[Tuple[str, int]],
+    skip: int,
+    limit: int,
+    current_user: Optional[UserInDB],
+) -> QueryPlan:
+    """
+    Refuse listing queries no declared index can narrow, and bound the ones only partly served.
+
+    Superusers may run any shape; the caller applies the time limit for
+    CAPPED and SCAN plans.
+    """
+    fields = {field: value for field, value in query.items() if not field.startswith("$")}
+    unindexed = {field for field, value in fields.items() if _is_regex(value)}
+    # Branches of $or (the search fallback) are matched post by post
+    for clause in query.get("$or", []):
+        unindexed |= set(clause)
+    equality = {field for field, value in fields.items() if field not in unindexed and not _is_range(value)}
+    ranges = {field for field, value in fields.items() if field not in unindexed and _is_range(value)}
+    plan = plan_query(equality, ranges, sort, unindexed=unindexed)
+    if current_user and current_user.is_superuser:
+        return plan
+    if plan.shape == SCAN:
+        raise HTTPException(
+            status_code=400,
+            detail="This combination of filters and sort would read every post; filter by category, tag or author, or sort by date",
+        )
+    if plan.shape == CAPPED and skip + limit > settings.QUERY_CAPPED_WINDOW:
+        raise HTTPException(
+            status_code=400,
+            detail=f"This combination of filters and sort can only be paged through its first {settings.QUERY_CAPPED_WINDOW} posts",
+        )
+    return plan
+
+
+def _is_range(value) -> bool:
+    return isinstance(value, dict) and any(operator in value for operator in ("$gt", "$gte", "$lt", "$lte"))
+
+
+def _is_regex(value) -> bool:
+    return isinstance(value, dict) and "$regex" in value
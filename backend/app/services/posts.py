@@ -0,0 +1,114 @@
+from typing import Dict, List, Optional, Set
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from app.models.post import PostWithDetails
+from app.services.counters import BULK_WRITE_CHUNK_SIZE
+from app.services.loaders import Loaders
+from app.services.text import SUMMARY_VERSION, summarize
+
+# Fields resolved from other collections, and the stored field each one needs
+DERIVED_FIELDS = {"author_name": "author_id", "category_name": "category_id", "tags_info": "tags"}
+POST_FIELDS = frozenset(PostWithDetails.model_fields)
+# Only present on ranked search results
+SEARCH_FIELDS = frozenset({"score", "snippet"})
+# Listing teaser: the stored excerpt and reading stats stand in for the full text
+SUMMARY_FIELDS = POST_FIELDS - {"text", "html"}
+
+
+def parse_fields(fields: Optional[str], view: Optional[str] = None) -> Optional[Set[str]]:
+    """
+    Fields requested by `fields=` (comma separated) or implied by `view`.
+
+    Returns None for the full representation and raises ValueError on unknown names.
+    """
+    if fields:
+        selected = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = selected - POST_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        return selected | {"id"}
+    if view == "summary":
+        return set(SUMMARY_FIELDS)
+    return None
+
+
+def post_projection(fields: Set[str]) -> Dict[str, int]:
+    """
+    Mongo projection that reads only what the selected fields need.
+    """
+    projection = {"date": 1}  # always needed for the keyset cursor
+    for name in fields:
+        if name == "id" or name in SEARCH_FIELDS:
+            continue
+        projection[DERIVED_FIELDS.get(name, name)] = 1
+    return projection
+
+
+def select_fields(post: dict, fields: Set[str]) -> dict:
+    return {name: post[name] for name in fields if name in post}
+
+
+async def add_post_details(loaders: Loaders, posts: List[dict]) -> List[dict]:
+    """
+    Attach author, category and tag details to a page of raw post documents.
+
+    References are resolved through the request's loaders, so each referenced
+    collection is queried at most once for the whole page and ids already
+    loaded earlier in the request are not fetched again. Comment counts are
+    read from the counters stored on each post.
+    """
+    for post in posts:
+        if "_id" in post:
+            post["id"] = str(post.pop("_id"))
+
+    author_ids = {post["author_id"] for post in posts if post.get("author_id")}
+    category_ids = {post["category_id"] for post in posts if post.get("category_id")}
+    tag_ids = {tag_id for post in posts for tag_id in (post.get("tags") or [])}
+
+    # Queue every key before awaiting so each loader issues a single batch
+    authors = loaders.users.load_many(author_ids)
+    categories = loaders.categories.load_many(category_ids)
+    tags = loaders.tags.load_many(tag_ids)
+    authors = dict(zip(author_ids, await authors))
+    categories = dict(zip(category_ids, await categories))
+    tags = dict(zip(tag_ids, await tags))
+
+    for post in posts:
+        # Get author info
+        author = authors.get(post.get("author_id"))
+        post["author_name"] = author.get("full_name") or author["username"] if author else "Unknown"
+
+        # Get category info
+        category = categories.get(post.get("category_id"))
+        post["category_name"] = category["name"] if category else "Uncategorized"
+
+        # Get tag info
+        post["tags_info"] = [
+            {"id": tag_id, "name": tags[tag_id]["name"]}
+            for tag_id in (post.get("tags") or [])
+            if tags.get(tag_id)
+        ]
+    return posts
+
+
+async def enrich_posts(loaders: Loaders, posts: List[dict]) -> List[PostWithDetails]:
+    return [PostWithDetails(**post) for post in await add_post_details(loaders, posts)]
+
+
+async def backfill_post_summaries(db: Database) -> int:
+    """
+    Store excerpt and reading stats on posts written before they existed or
+    summarized by an older SUMMARY_VERSION.
+    """
+    updated = 0
+    operations = []
+    async for post in db.posts.find({"summary_version": {"$ne": SUMMARY_VERSION}}, {"text": 1}):
+        operations.append(UpdateOne({"_id": post["_id"]}, {"$set": summarize(post.get("text") or ""), "$inc": {"version": 1}}))
+        if len(operations) == BULK_WRITE_CHUNK_SIZE:
+            updated += (await db.posts.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        updated += (await db.posts.bulk_write(operations, ordered=False)).modified_count
+    return updated
@@ -0,0 +1,82 @@
+from typing import Iterable, List, Optional, Set, Tuple
+
+from pymongo import IndexModel
+
+from app.db.indexes import INDEX_SPEC
+
+# Outcome of planning a listing query, from cheapest to most expensive
+INDEXED = "indexed"  # an index serves the filters and the sort order
+CAPPED = "capped"  # an index narrows the posts, but sorting or filtering the rest is in memory
+SCAN = "scan"  # no index narrows the posts; every post would be read
+
+# Equality on these fields selects a small share of the posts; is_visible does not
+SELECTIVE_FIELDS = {"_id", "category_id", "tags", "author_id"}
+
+_RANK = {INDEXED: 0, CAPPED: 1, SCAN: 2}
+
+
+class QueryPlan:
+    def __init__(self, shape: str, index: Optional[List[Tuple[str, int]]] = None):
+        self.shape = shape
+        self.index = index
+
+    def __repr__(self) -> str:
+        return f"QueryPlan({self.shape!r}, {self.index!r})"
+
+
+def _plan_index(
+    key: List[Tuple[str, int]],
+    equality: Set[str],
+    ranges: Set[str],
+    sort: List[Tuple[str, int]],
+    unindexed: Set[str] = frozenset(),
+) -> Tuple[str, int]:
+    # Equality fields can appear in the index prefix in any order
+    position = 0
+    while position < len(key) and key[position][0] in equality:
+        position += 1
+    prefix = {field for field, _ in key[:position]}
+
+    # Next come the sort keys, in the same or the exactly reversed direction
+    following = key[position:position + len(sort)]
+    sort_served = not sort or following == sort or following == [(field, -direction) for field, direction in sort]
+
+    # A range on the key right after the prefix is served by index bounds
+    bounded = position < len(key) and key[position][0] in ranges
+    narrowed = bool(prefix & SELECTIVE_FIELDS) or bounded
+    residual = (equality - prefix) | (ranges - ({key[position][0]} if bounded else set())) | unindexed
+
+    # Conditions no index can serve (unanchored regexes) may have to read
+    # every post the index yields before a page is found
+    if sort_served and not unindexed and (narrowed or not residual):
+        return INDEXED, position
+    if narrowed or (sort_served and unindexed):
+        return CAPPED, position
+    return SCAN, position
+
+
+def plan_query(
+    equality: Iterable[str],
+    ranges: Iterable[str] = (),
+    sort: Iterable[Tuple[str, int]] = (),
+    indexes: Optional[List[IndexModel]] = None,
+    unindexed: Iterable[str] = (),
+) -> QueryPlan:
+    """
+    Classify a posts query by the best declared index for it.
+
+    `equality` holds fields matched by value (including $in and $all),
+    `ranges` fields bounded by $gt/$lt, `unindexed` fields matched by a
+    condition no index serves (such as a case-insensitive regex) and `sort`
+    the requested order. An unfiltered query in index order is INDEXED since
+    it stops after one page; any `unindexed` field makes it CAPPED at best.
+    """
+    equality, ranges, sort, unindexed = set(equality), set(ranges), list(sort), set(unindexed)
+    best = QueryPlan(SCAN)
+    best_prefix = -1
+    for model in indexes if indexes is not None else INDEX_SPEC["posts"]:
+        key = [(field, int(direction)) for field, direction in model.document["key"].items()]
+        shape, prefix = _plan_index(key, equality, ranges, sort, unindexed)
+        if (_RANK[shape], -prefix) < (_RANK[best.shape], -best_prefix):
+            best, best_prefix = QueryPlan(shape, key if shape != SCAN else None), prefix
+    return best
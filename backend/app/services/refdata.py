@@ -0,0 +1,138 @@
+import asyncio
+import logging
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo.database import Database
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import settings
+from app.services.versions import get_versions
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_COLLECTIONS = ("categories", "tags")
+
+# Changes worth a reload: every post write $incs post_count, which snapshots do not track
+CHANGE_PIPELINE = [
+    {"$match": {
+        "ns.coll": {"$in": list(REFERENCE_COLLECTIONS)},
+        "$or": [
+            {"operationType": {"$ne": "update"}},
+            {"updateDescription.removedFields.0": {"$exists": True}},
+            {"$expr": {"$gt": [
+                {"$size": {"$filter": {
+                    "input": {"$objectToArray": "$updateDescription.updatedFields"},
+                    "cond": {"$ne": ["$$this.k", "post_count"]},
+                }}},
+                0,
+            ]}},
+        ],
+    }},
+]
+
+
+class _Snapshot:
+    def __init__(self, docs: Iterable[dict] = (), version: int = -1):
+        self.by_id: Dict[str, dict] = {str(doc["_id"]): doc for doc in docs}
+        self.version = version
+
+
+class ReferenceStore:
+    """
+    In-memory snapshot of the small, rarely written categories and tags collections.
+
+    Snapshots are reloaded after local writes and whenever the collection
+    version changes, either through a change stream (replica sets) or by
+    polling collection_versions. Stored post counters are not kept fresh here;
+    read them from Mongo.
+    """
+
+    def __init__(self):
+        self._snapshots: Dict[str, _Snapshot] = {name: _Snapshot() for name in REFERENCE_COLLECTIONS}
+        self._task: Optional[asyncio.Task] = None
+        self._listeners: List[Callable[[str], None]] = []
+        self.loaded = False
+
+    def get(self, collection: str, doc_id: str) -> Optional[dict]:
+        return self._snapshots[collection].by_id.get(doc_id)
+
+    def all(self, collection: str) -> List[dict]:
+        return list(self._snapshots[collection].by_id.values())
+
+    def replace(self, collection: str, docs: Iterable[dict], version: int = -1) -> None:
+        # Swap in a whole new snapshot so readers never see a half-built one
+        self._snapshots[collection] = _Snapshot(docs, version)
+        for listener in self._listeners:
+            listener(collection)
+
+    def subscribe(self, listener: Callable[[str], None]) -> None:
+        """
+        Call `listener(collection)` whenever a snapshot is replaced.
+        """
+        self._listeners.append(listener)
+
+    async def reload(self, db: Database, collection: str) -> None:
+        versions, _ = await get_versions(db, [collection])
+        docs = await db[collection].find({}).to_list(length=None)
+        self.replace(collection, docs, versions[collection])
+
+    async def refresh(self, db: Database) -> None:
+        """
+        Reload the snapshots whose collection version moved since they were taken.
+        """
+        versions, _ = await get_versions(db, REFERENCE_COLLECTIONS)
+        for collection in REFERENCE_COLLECTIONS:
+            if versions[collection] != self._snapshots[collection].version:
+                await self.reload(db, collection)
+
+    async def start(self, db: Database) -> None:
+        for collection in REFERENCE_COLLECTIONS:
+            await self.reload(db, collection)
+        self.loaded = True
+        self._task = asyncio.create_task(self._follow(db))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _follow(self, db: Database) -> None:
+        try:
+            await self._watch(db)
+        except OperationFailure:
+            # Change streams need a replica set; fall back to polling versions
+            logger.info("Change streams unavailable, polling reference data versions")
+        except PyMongoError as e:
+            logger.error(f"Reference data change stream failed, polling instead: {e}")
+        await self._poll(db)
+
+    async def _watch(self, db: Database) -> None:
+        async with db.watch(CHANGE_PIPELINE) as stream:
+            # Catch up on writes made between the initial load and opening the stream
+            await self.refresh(db)
+            async for change in stream:
+                # Coalesce a burst of changes, e.g. an import, into one reload per collection
+                pending = {change["ns"]["coll"]}
+                while True:
+                    change = await stream.try_next()
+                    if change is None:
+                        break
+                    pending.add(change["ns"]["coll"])
+                for collection in REFERENCE_COLLECTIONS:
+                    if collection in pending:
+                        await self.reload(db, collection)
+
+    async def _poll(self, db: Database) -> None:
+        while True:
+            await asyncio.sleep(settings.REFDATA_POLL_INTERVAL_SECONDS)
+            try:
+                await self.refresh(db)
+            except PyMongoError as e:
+                logger.error(f"Failed to refresh reference data: {e}")
+
+
+reference_store = ReferenceStore()
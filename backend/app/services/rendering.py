@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Union
+
+import bleach
+import markdown
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+from app.core.config import settings
+from app.services.versions import bump_versions
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the Markdown extensions or sanitizer rules change, then run
+# `python -m app.db.render` to refresh the stored HTML
+RENDERER_VERSION = 1
+
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "sane_lists"]
+ALLOWED_TAGS = bleach.sanitizer.ALLOWED_TAGS | {
+    "p", "br", "hr", "pre", "h1", "h2", "h3", "h4", "h5", "h6",
+    "img", "table", "thead", "tbody", "tr", "th", "td", "del",
+}
+ALLOWED_ATTRIBUTES = {
+    "a": ["href", "title"],
+    "img": ["src", "alt", "title"],
+    "code": ["class"],
+    "th": ["align"],
+    "td": ["align"],
+}
+ALLOWED_PROTOCOLS = ["http", "https", "mailto"]
+
+RENDER_BATCH_SIZE = 100
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def render_markdown(text: str) -> str:
+    """
+    Render Markdown to HTML that is safe to embed in a page.
+    """
+    html = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+    return bleach.clean(
+        html,
+        tags=ALLOWED_TAGS,
+        attributes=ALLOWED_ATTRIBUTES,
+        protocols=ALLOWED_PROTOCOLS,
+        strip=True,
+    )
+
+
+def _render_batch(texts: List[str]) -> List[str]:
+    return [render_markdown(text) for text in texts]
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Spawned workers do not inherit the event loop or open Mongo sockets
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.MARKDOWN_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_renderer() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def needs_render(post: Optional[dict], text: str) -> bool:
+    """
+    Whether the stored HTML is missing or was rendered from other text or by another renderer version.
+    """
+    if not post:
+        return True
+    return post.get("content_hash") != content_hash(text) or post.get("renderer_version") != RENDERER_VERSION
+
+
+async def render_post_text(text: str) -> Dict[str, Union[str, int]]:
+    """
+    Rendered fields stored alongside a post's Markdown source.
+
+    Large posts are rendered in the worker pool so the event loop keeps serving requests.
+    """
+    if len(text) >= settings.MARKDOWN_OFFLOAD_MIN_CHARS:
+        loop = asyncio.get_running_loop()
+        html = (await loop.run_in_executor(_get_executor(), _render_batch, [text]))[0]
+    else:
+        html = render_markdown(text)
+    return {"html": html, "content_hash": content_hash(text), "renderer_version": RENDERER_VERSION}
+
+
+async def render_post_texts(texts: List[str]) -> List[Dict[str, Union[str, int]]]:
+    """
+    Rendered fields for many posts at once, rendered in the worker pool.
+    """
+    loop = asyncio.get_running_loop()
+    htmls = await loop.run_in_executor(_get_executor(), _render_batch, texts)
+    return [
+        {"html": html, "content_hash": content_hash(text), "renderer_version": RENDERER_VERSION}
+        for text, html in zip(texts, htmls)
+    ]
+
+
+async def rerender_posts(db: Database, force: bool = False) -> int:
+    """
+    Re-render posts whose HTML predates the current renderer version (all posts with `force`).
+    """
+    query = {} if force else {"renderer_version": {"$ne": RENDERER_VERSION}}
+    loop = asyncio.get_running_loop()
+    rendered = 0
+
+    async def flush(batch: List[dict]) -> int:
+        texts = [post.get("text") or "" for post in batch]
+        htmls = await loop.run_in_executor(_get_executor(), _render_batch, texts)
+        operations = [
+            UpdateOne(
+                # Skip posts edited while the batch was rendering; their write already rendered them
+                {"_id": post["_id"], "text": post.get("text")},
+                {
+                    "$set": {"html": html, "content_hash": content_hash(text), "renderer_version": RENDERER_VERSION},
+                    "$inc": {"version": 1},
+                },
+            )
+            for post, text, html in zip(batch, texts, htmls)
+        ]
+        await db.posts.bulk_write(operations, ordered=False)
+        return len(operations)
+
+    batch = []
+    async for post in db.posts.find(query, {"text": 1}):
+        batch.append(post)
+        if len(batch) == RENDER_BATCH_SIZE:
+            rendered += await flush(batch)
+            batch = []
+    if batch:
+        rendered += await flush(batch)
+    if rendered:
+        # New HTML means new representations, so conditional GETs must not match old tags
+        await bump_versions(db, "posts")
+    logger.info(f"Re-rendered {rendered} posts with renderer version {RENDERER_VERSION}")
+    return rendered
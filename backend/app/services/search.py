@@ -0,0 +1,645 @@
+import asyncio
+import bisect
+import heapq
+import html
+import logging
+import math
+import os
+import pickle
+import re
+import time
+from array import array
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+from pymongo.database import Database
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.core.config import settings
+from app.services.loaders import to_object_ids
+from app.services.refdata import REFERENCE_COLLECTIONS, reference_store
+from app.services.suggest import PrefixIndex
+from app.services.text import WORD, normalize, tokenize
+from app.services.versions import get_versions
+
+logger = logging.getLogger(__name__)
+
+# Bump when tokenization or the stored layout changes; older snapshots are rebuilt
+INDEX_FORMAT_VERSION = 2
+
+# BM25F parameters; title matches count TITLE_WEIGHT times a body match
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 3.0
+
+# Terms in more than this share of the posts are only scored on posts that
+# rarer query terms already matched, which keeps "the"-like terms cheap
+COMMON_TERM_RATIO = 0.1
+
+SNIPPET_LENGTH = 200
+SYNC_BATCH_SIZE = 500
+# Workers' clocks differ, so the catch-up query looks back a little further
+CLOCK_SKEW = timedelta(seconds=5)
+
+INDEXED_FIELDS = {
+    "title": 1, "text": 1, "is_visible": 1, "category_id": 1,
+    "tags": 1, "author_id": 1, "date": 1, "updated_at": 1,
+}
+
+_WHITESPACE = re.compile(r"\s+")
+_EPOCH = datetime(1970, 1, 1)
+_MAX_TF = 0xFFFF
+
+
+def make_snippet(text: str, terms, length: int = SNIPPET_LENGTH) -> str:
+    """
+    HTML-escaped window of the text around the first match, with matches wrapped in <mark>.
+    """
+    text = _WHITESPACE.sub(" ", text or "").strip()
+    terms = set(terms)
+    matches = [m for m in WORD.finditer(text) if normalize(m.group()) in terms]
+    start = 0
+    if matches and matches[0].start() > length // 3:
+        start = text.rfind(" ", 0, matches[0].start() - length // 3) + 1
+    end = min(len(text), start + length)
+    if end < len(text) and " " in text[start:end]:
+        end = text.rindex(" ", start, end)
+
+    parts = ["…" if start else ""]
+    position = start
+    for match in matches:
+        if match.start() < start:
+            continue
+        if match.end() > end:
+            break
+        parts.append(html.escape(text[position:match.start()]))
+        parts.append(f"<mark>{html.escape(match.group())}</mark>")
+        position = match.end()
+    parts.append(html.escape(text[position:end]))
+    if end < len(text):
+        parts.append("…")
+    return "".join(parts)
+
+
+def _timestamp(value: Optional[datetime]) -> float:
+    return (value - _EPOCH).total_seconds() if isinstance(value, datetime) else 0.0
+
+
+class InvertedIndex:
+    """
+    Term -> postings index over post titles and bodies, ranked with BM25F.
+
+    Every indexed version of a post gets a new document number. Postings are
+    kept as two compact arrays per term, (doc numbers, packed title/body term
+    frequencies), that only grow by appending. Removing a post just marks its
+    number dead; dead postings are skipped at query time until a compacted
+    copy, with the live documents renumbered densely, replaces the index.
+    Like Lucene, document frequencies include dead postings until then,
+    which only nudges idf slightly.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.doc_nums: Dict[str, int] = {}
+        # Per document number; post_ids[num] is None once the number is dead
+        self.post_ids: List[Optional[str]] = []
+        self.meta: List[Optional[tuple]] = []
+        self.title_lengths = array("I")
+        self.body_lengths = array("I")
+        self.total_title_length = 0
+        self.total_body_length = 0
+        self.dead = 0
+        self.watermark: Optional[datetime] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_nums)
+
+    def __contains__(self, post_id: str) -> bool:
+        return post_id in self.doc_nums
+
+    def updated_at(self, post_id: str) -> Optional[datetime]:
+        num = self.doc_nums.get(post_id)
+        return self.meta[num][5] if num is not None else None
+
+    def add(self, post: dict) -> None:
+        post_id = str(post.get("_id") or post["id"])
+        self.remove(post_id)
+
+        title_terms = Counter(tokenize(post.get("title")))
+        body_terms = Counter(tokenize(post.get("text")))
+        num = len(self.post_ids)
+        self.doc_nums[post_id] = num
+        self.post_ids.append(post_id)
+        self.meta.append((
+            post.get("category_id"),
+            post.get("author_id"),
+            frozenset(post.get("tags") or ()),
+            _timestamp(post.get("date")),
+            bool(post.get("is_visible")),
+            post.get("updated_at"),
+        ))
+        title_length = sum(title_terms.values())
+        body_length = sum(body_terms.values())
+        self.title_lengths.append(title_length)
+        self.body_lengths.append(body_length)
+        self.total_title_length += title_length
+        self.total_body_length += body_length
+
+        for term in title_terms.keys() | body_terms.keys():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = (array("I"), array("I"))
+            postings[0].append(num)
+            postings[1].append(min(title_terms[term], _MAX_TF) << 16 | min(body_terms[term], _MAX_TF))
+
+        updated_at = post.get("updated_at")
+        if updated_at and (self.watermark is None or updated_at > self.watermark):
+            self.watermark = updated_at
+
+    def remove(self, post_id: str) -> bool:
+        num = self.doc_nums.pop(post_id, None)
+        if num is None:
+            return False
+        self.post_ids[num] = None
+        self.meta[num] = None
+        self.total_title_length -= self.title_lengths[num]
+        self.total_body_length -= self.body_lengths[num]
+        self.dead += 1
+        return True
+
+    def renumbered(self) -> Tuple["InvertedIndex", array]:
+        """
+        A copy holding the live documents under dense numbers, without postings yet,
+        and the map from current document numbers to new ones (-1 for dead ones).
+        """
+        copy = InvertedIndex()
+        remap = array("i", [-1]) * len(self.post_ids)
+        for num, post_id in enumerate(self.post_ids):
+            if post_id is None:
+                continue
+            remap[num] = len(copy.post_ids)
+            copy.doc_nums[post_id] = remap[num]
+            copy.post_ids.append(post_id)
+            copy.meta.append(self.meta[num])
+            copy.title_lengths.append(self.title_lengths[num])
+            copy.body_lengths.append(self.body_lengths[num])
+        copy.total_title_length = sum(copy.title_lengths)
+        copy.total_body_length = sum(copy.body_lengths)
+        copy.watermark = self.watermark
+        return copy, remap
+
+    def copy_postings(self, source: "InvertedIndex", terms: List[str], remap: array) -> None:
+        """
+        Copy the live postings of the given terms from `source`, renumbered by `remap`;
+        done in slices so callers can yield in between. Postings of documents
+        added to `source` after `remap` was made are left out.
+        """
+        known = len(remap)
+        for term in terms:
+            postings = source.postings.get(term)
+            if postings is None:
+                continue
+            live = [(remap[num], packed) for num, packed in zip(*postings) if num < known and remap[num] >= 0]
+            if live:
+                self.postings[term] = (array("I", (num for num, _ in live)), array("I", (packed for _, packed in live)))
+
+    def search(
+        self,
+        terms: List[str],
+        *,
+        categories: Optional[Set[str]] = None,
+        tags: Optional[Set[str]] = None,
+        match_all_tags: bool = False,
+        author_id: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        visible_only: bool = True,
+        offset: int = 0,
+        limit: int = 10,
+    ) -> Tuple[int, List[Tuple[str, float]]]:
+        """
+        Total number of matching posts and one page of (post id, score), best first.
+        """
+        total_docs = len(self.doc_nums)
+        if not total_docs or limit <= 0:
+            return 0, []
+        title_norms, body_norms = self._norms()
+
+        # Rarest terms first, so common ones can be restricted to their matches
+        weighted = []
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if postings:
+                weighted.append((len(postings[0]), term, postings))
+        weighted.sort()
+
+        scores: Dict[int, float] = {}
+        current = scores.get
+        for df, term, (nums, tfs) in weighted:
+            df = min(df, total_docs)
+            weight = math.log(1 + (total_docs - df + 0.5) / (df + 0.5)) * (K1 + 1)
+            if not scores or df <= total_docs * COMMON_TERM_RATIO:
+                pairs = zip(nums, tfs)
+            elif len(scores) * 16 < df:
+                # Few candidates: look them up in the sorted postings instead of scanning them
+                pairs = []
+                for num in list(scores):
+                    i = bisect.bisect_left(nums, num)
+                    if i < len(nums) and nums[i] == num:
+                        pairs.append((num, tfs[i]))
+            else:
+                pairs = [(num, packed) for num, packed in zip(nums, tfs) if num in scores]
+            # Dead documents have zero norms, so they score 0 and are dropped below
+            for num, packed in pairs:
+                if packed > _MAX_TF:
+                    tf = TITLE_WEIGHT * (packed >> 16) * title_norms[num] + (packed & _MAX_TF) * body_norms[num]
+                else:
+                    tf = packed * body_norms[num]
+                scores[num] = current(num, 0.0) + weight * tf / (K1 + tf)
+
+        meta = self.meta
+        start = _timestamp(date_from) if date_from else None
+        end = _timestamp(date_to) if date_to else None
+        matches = []
+        for num, score in scores.items():
+            doc = meta[num]
+            if doc is None:
+                continue
+            doc_category, doc_author, doc_tags, date, is_visible, _ = doc
+            if visible_only and not is_visible:
+                continue
+            if categories and doc_category not in categories:
+                continue
+            if author_id and doc_author != author_id:
+                continue
+            if tags and not (tags <= doc_tags if match_all_tags else tags & doc_tags):
+                continue
+            if (start is not None and date < start) or (end is not None and date >= end):
+                continue
+            matches.append((score, date, num))
+
+        # Ties go to the newer post
+        page = heapq.nlargest(offset + limit, matches)[offset:]
+        return len(matches), [(self.post_ids[num], score) for score, _, num in page]
+
+    def _norms(self) -> Tuple[List[float], List[float]]:
+        """
+        Per document BM25 length normalization of each field, recomputed after writes.
+        """
+        key = (len(self.post_ids), len(self.doc_nums), self.total_title_length, self.total_body_length)
+        if getattr(self, "_norms_key", None) != key:
+            total_docs = max(len(self.doc_nums), 1)
+            title_scale = B / max(self.total_title_length / total_docs, 1.0)
+            body_scale = B / max(self.total_body_length / total_docs, 1.0)
+            alive = [post_id is not None for post_id in self.post_ids]
+            self._norms_cache = (
+                [1 / (1 - B + title_scale * length) if live else 0.0 for length, live in zip(self.title_lengths, alive)],
+                [1 / (1 - B + body_scale * length) if live else 0.0 for length, live in zip(self.body_lengths, alive)],
+            )
+            self._norms_key = key
+        return self._norms_cache
+
+
+class SearchService:
+    """
+    Keeps an InvertedIndex of all posts in sync with Mongo and on disk.
+
+    On start the last snapshot is loaded and reconciled with the posts
+    collection in the background; until then `ready` is False and callers
+    fall back to a plain query. Local writes update the index directly.
+    Writes from other workers arrive through a change stream on replica sets,
+    or by polling for posts updated since the index watermark, with a
+    periodic full id comparison to notice deletions.
+    """
+
+    def __init__(self):
+        self.index = InvertedIndex()
+        # Local writes made while a compacted copy of the index is being built
+        self._replay: Optional[List[Tuple[str, object]]] = None
+        # Typeahead over visible post titles, and over category and tag names
+        self.titles = PrefixIndex()
+        self._names = {collection: PrefixIndex() for collection in REFERENCE_COLLECTIONS}
+        self.ready = False
+        self._tasks: List[asyncio.Task] = []
+        self._dirty = False
+        reference_store.subscribe(self._reference_changed)
+
+    # Queries
+
+    def search(self, query: str, **filters) -> Tuple[List[str], int, List[Tuple[str, float]]]:
+        """
+        Query terms, total number of matches and one page of (post id, score).
+        """
+        terms = tokenize(query)
+        total, hits = self.index.search(terms, **filters)
+        return terms, total, hits
+
+    async def load_hits(
+        self, db: Database, hits: List[Tuple[str, float]], terms: List[str], projection: Optional[dict] = None
+    ) -> List[dict]:
+        """
+        Fetch the posts of a result page in rank order with their score and snippet.
+        """
+        if projection is not None:
+            projection = {**projection, "text": 1}
+        docs = await db.posts.find({"_id": {"$in": to_object_ids(post_id for post_id, _ in hits)}}, projection).to_list(length=None)
+        by_id = {str(doc["_id"]): doc for doc in docs}
+
+        posts = []
+        for post_id, score in hits:
+            post = by_id.get(post_id)
+            if post is None:
+                # Deleted by another worker since it was indexed
+                self.remove_post(post_id)
+                continue
+            post["score"] = round(score, 4)
+            post["snippet"] = make_snippet(post.get("text"), terms)
+            posts.append(post)
+        return posts
+
+    def suggest(self, prefix: str, limit: int = 5) -> Dict[str, List[dict]]:
+        """
+        Visible post titles (newest first), categories and tags (most posts first) matching a prefix.
+        """
+        return {
+            "posts": [{"id": entry_id, "text": label} for entry_id, label in self.titles.complete(prefix, limit)],
+            **{
+                collection: [{"id": entry_id, "text": label} for entry_id, label in names.complete(prefix, limit)]
+                for collection, names in self._names.items()
+            },
+        }
+
+    # Local write hooks
+
+    def index_post(self, post: dict) -> None:
+        self.index.add(post)
+        if self._replay is not None:
+            self._replay.append(("add", post))
+        post_id = str(post.get("_id") or post["id"])
+        if post.get("is_visible") and post.get("title"):
+            self.titles.add(post_id, post["title"], _timestamp(post.get("date")))
+        else:
+            self.titles.remove(post_id)
+        self._dirty = True
+
+    async def reindex_posts(self, db: Database, post_ids: List[ObjectId]) -> None:
+        """
+        Index again the posts changed by a bulk write, such as removing a deleted tag.
+        """
+        async for post in db.posts.find({"_id": {"$in": post_ids}}, INDEXED_FIELDS):
+            self.index_post(post)
+
+    def remove_post(self, post_id: str) -> None:
+        self.titles.remove(post_id)
+        if self._replay is not None:
+            self._replay.append(("remove", post_id))
+        if self.index.remove(post_id):
+            self._dirty = True
+
+    def _reference_changed(self, collection: str) -> None:
+        # Category and tag sets are small, so each change rebuilds their names
+        self._names[collection].replace_all(
+            (str(doc["_id"]), doc["name"], doc.get("post_count", 0))
+            for doc in reference_store.all(collection)
+        )
+
+    async def refresh_name_weights(self, db: Database) -> None:
+        """
+        Re-rank category and tag suggestions by their live post counters.
+
+        Reference snapshots are not reloaded when only a counter moves, so
+        the weights they were built with go stale as posts are written.
+        """
+        for collection, names in self._names.items():
+            weights = {
+                str(doc["_id"]): doc.get("post_count", 0)
+                async for doc in db[collection].find({}, {"post_count": 1})
+            }
+            names.reweight(weights)
+
+    # Lifecycle
+
+    async def start(self, db: Database) -> None:
+        self._tasks.append(asyncio.create_task(self._run(db)))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self.ready:
+            await self.save()
+
+    async def _run(self, db: Database) -> None:
+        started = time.perf_counter()
+        loaded = await self.load()
+        try:
+            changed = await self.sync(db)
+        except PyMongoError as e:
+            logger.error(f"Search index sync failed: {e}")
+            changed = 0
+        self.ready = True
+        logger.info(
+            f"Search index ready with {len(self.index)} posts "
+            f"({'snapshot' if loaded else 'full build'}, {changed} changes applied) "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        if changed:
+            await self.save()
+        self._tasks.append(asyncio.create_task(self._save_periodically()))
+        self._tasks.append(asyncio.create_task(self._refresh_name_weights_periodically(db)))
+        await self._follow(db)
+
+    # Keeping up with Mongo
+
+    async def sync(self, db: Database) -> int:
+        """
+        Reconcile the index with every post: index new or changed posts, drop deleted ones.
+        """
+        stale = []
+        seen = set()
+        async for doc in db.posts.find({}, {"updated_at": 1}):
+            post_id = str(doc["_id"])
+            seen.add(post_id)
+            if post_id not in self.index or self.index.updated_at(post_id) != doc.get("updated_at"):
+                stale.append(doc["_id"])
+        removed = [post_id for post_id in self.index.doc_nums if post_id not in seen]
+        for post_id in removed:
+            self.remove_post(post_id)
+
+        for start in range(0, len(stale), SYNC_BATCH_SIZE):
+            batch = stale[start:start + SYNC_BATCH_SIZE]
+            async for post in db.posts.find({"_id": {"$in": batch}}, INDEXED_FIELDS):
+                self.index_post(post)
+            # Tokenizing is CPU bound; let requests in between batches
+            await asyncio.sleep(0)
+        await self.compact()
+        return len(stale) + len(removed)
+
+    async def catch_up(self, db: Database) -> int:
+        """
+        Index posts updated since the watermark, which covers creates and edits made elsewhere.
+        """
+        query = {}
+        if self.index.watermark:
+            query["updated_at"] = {"$gte": self.index.watermark - CLOCK_SKEW}
+        changed = 0
+        async for post in db.posts.find(query, INDEXED_FIELDS):
+            if self.index.updated_at(str(post["_id"])) != post.get("updated_at"):
+                self.index_post(post)
+                changed += 1
+        return changed
+
+    async def compact(self) -> None:
+        """
+        Replace the index with a copy without dead documents, so postings, per
+        document arrays and norms only cover live posts.
+
+        The copy is built in slices while the current index keeps serving;
+        writes made meanwhile are applied to both.
+        """
+        if self._replay is not None or self.index.dead <= max(1000, len(self.index) // 4):
+            return
+        self._replay = []
+        try:
+            compacted, remap = self.index.renumbered()
+            terms = list(self.index.postings)
+            for start in range(0, len(terms), 5000):
+                compacted.copy_postings(self.index, terms[start:start + 5000], remap)
+                await asyncio.sleep(0)
+            # Posts indexed after the copy started are not in it; replay every local write
+            for action, value in self._replay:
+                if action == "add":
+                    compacted.add(value)
+                else:
+                    compacted.remove(value)
+            self.index = compacted
+            self._dirty = True
+        finally:
+            self._replay = None
+
+    async def _follow(self, db: Database) -> None:
+        try:
+            await self._watch(db)
+        except OperationFailure:
+            # Change streams need a replica set; fall back to polling
+            logger.info("Change streams unavailable, polling for post changes")
+        except PyMongoError as e:
+            logger.error(f"Post change stream failed, polling instead: {e}")
+        await self._poll(db)
+
+    async def _watch(self, db: Database) -> None:
+        async with db.posts.watch() as stream:
+            # Catch up on writes made between the initial sync and opening the stream
+            await self.catch_up(db)
+            async for change in stream:
+                post_id = change["documentKey"]["_id"]
+                if change["operationType"] == "delete":
+                    self.remove_post(str(post_id))
+                    continue
+                updated = (change.get("updateDescription") or {}).get("updatedFields")
+                # Counter and render updates do not change what is searchable
+                if updated is not None and not INDEXED_FIELDS.keys() & updated.keys():
+                    continue
+                post = await db.posts.find_one({"_id": post_id}, INDEXED_FIELDS)
+                if post:
+                    self.index_post(post)
+                else:
+                    self.remove_post(str(post_id))
+
+    async def _poll(self, db: Database) -> None:
+        last_version = None
+        last_full_sync = time.monotonic()
+        while True:
+            await asyncio.sleep(settings.SEARCH_POLL_INTERVAL_SECONDS)
+            try:
+                if time.monotonic() - last_full_sync >= settings.SEARCH_FULL_SYNC_INTERVAL_SECONDS:
+                    await self.sync(db)
+                    last_full_sync = time.monotonic()
+                    continue
+                versions, _ = await get_versions(db, ["posts"])
+                if versions["posts"] != last_version:
+                    await self.catch_up(db)
+                    last_version = versions["posts"]
+            except PyMongoError as e:
+                logger.error(f"Failed to refresh search index: {e}")
+
+    async def _refresh_name_weights_periodically(self, db: Database) -> None:
+        while True:
+            await asyncio.sleep(settings.SUGGEST_WEIGHTS_REFRESH_SECONDS)
+            try:
+                await self.refresh_name_weights(db)
+            except PyMongoError as e:
+                logger.error(f"Failed to refresh suggestion weights: {e}")
+
+    # Persistence
+
+    async def _save_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.SEARCH_SAVE_INTERVAL_SECONDS)
+            await self.compact()
+            if self._dirty:
+                await self.save()
+
+    async def save(self) -> None:
+        path = settings.SEARCH_INDEX_PATH
+        if not path:
+            return
+        # Pickling reads the live structures, so it has to run on the loop; only the write is offloaded
+        data = pickle.dumps((INDEX_FORMAT_VERSION, self.index, self.titles), protocol=pickle.HIGHEST_PROTOCOL)
+        self._dirty = False
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, _write_atomic, path, data)
+        except OSError as e:
+            self._dirty = True
+            logger.error(f"Failed to save search index to {path}: {e}")
+
+    async def load(self) -> bool:
+        path = settings.SEARCH_INDEX_PATH
+        if not path or not os.path.exists(path):
+            return False
+        try:
+            # The snapshot is written by this service only, never from user input
+            version, *state = await asyncio.get_running_loop().run_in_executor(None, _read_snapshot, path)
+        except Exception as e:
+            logger.error(f"Ignoring unreadable search index snapshot {path}: {e}")
+            return False
+        if version != INDEX_FORMAT_VERSION:
+            logger.info(f"Search index snapshot format {version} is outdated, rebuilding")
+            return False
+        self.index, self.titles = state
+        return True
+
+    async def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "posts": len(self.index),
+            "terms": len(self.index.postings),
+            "titles": len(self.titles),
+            "dead_postings": self.index.dead,
+            "watermark": self.index.watermark,
+        }
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+def _read_snapshot(path: str):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+search_service = SearchService()
@@ -0,0 +1,131 @@
+import bisect
+import heapq
+from typing import Dict, Iterable, List, Tuple
+
+from app.services.text import tokenize
+
+# Titles can be matched from any of their first MAX_KEY_STARTS words
+MAX_KEY_STARTS = 8
+MAX_KEY_WORDS = 8
+MAX_CACHED_PREFIXES = 1024
+
+
+def normalize_phrase(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+def _keys_for(label: str) -> Tuple[str, ...]:
+    words = tokenize(label)
+    return tuple({" ".join(words[start:start + MAX_KEY_WORDS]) for start in range(min(len(words), MAX_KEY_STARTS))})
+
+
+class PrefixIndex:
+    """
+    Sorted (key, entry id) list answering "labels with a word starting with this prefix".
+
+    Every label is stored under one key per word it may be matched from, so
+    "python" and "learning py" both find "Learning Python". A prefix maps to
+    a contiguous range found with two bisections; wide ranges (one or two
+    letter prefixes) are ranked once, cached, and patched by later writes.
+    """
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str]] = []
+        self._entries: Dict[str, Tuple[str, float, Tuple[str, ...]]] = {}
+        self._cache: Dict[Tuple[str, int], List[Tuple[str, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self) -> dict:
+        return {"_keys": self._keys, "_entries": self._entries, "_cache": {}}
+
+    def add(self, entry_id: str, label: str, weight: float = 0.0) -> None:
+        previous = self._entries.get(entry_id)
+        if previous and previous[0] == label:
+            keys = previous[2]
+        else:
+            if previous:
+                self._remove_keys(entry_id, previous[2])
+            keys = _keys_for(label)
+            for key in keys:
+                bisect.insort(self._keys, (key, entry_id))
+        self._entries[entry_id] = (label, weight, keys)
+
+        # Patch cached rankings in place rather than re-ranking wide prefixes after every write
+        for cache_key, result in list(self._cache.items()):
+            prefix, limit = cache_key
+            matches = any(key.startswith(prefix) for key in keys)
+            listed = any(item[0] == entry_id for item in result)
+            if listed and (not matches or weight < previous[1]):
+                # An entry that was not listed may now rank higher
+                del self._cache[cache_key]
+            elif matches:
+                ranked = [item for item in result if item[0] != entry_id] + [(entry_id, label)]
+                ranked.sort(key=lambda item: (self._entries[item[0]][1], item[0]), reverse=True)
+                self._cache[cache_key] = ranked[:limit]
+
+    def remove(self, entry_id: str) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        self._remove_keys(entry_id, entry[2])
+        for cache_key, result in list(self._cache.items()):
+            if any(item[0] == entry_id for item in result):
+                del self._cache[cache_key]
+
+    def _remove_keys(self, entry_id: str, keys: Tuple[str, ...]) -> None:
+        for key in keys:
+            i = bisect.bisect_left(self._keys, (key, entry_id))
+            if i < len(self._keys) and self._keys[i] == (key, entry_id):
+                del self._keys[i]
+
+    def replace_all(self, entries: Iterable[Tuple[str, str, float]]) -> None:
+        """
+        Rebuild from (entry id, label, weight) triples with a single sort.
+        """
+        self._entries = {}
+        keys = []
+        for entry_id, label, weight in entries:
+            entry_keys = _keys_for(label)
+            self._entries[entry_id] = (label, weight, entry_keys)
+            keys.extend((key, entry_id) for key in entry_keys)
+        keys.sort()
+        self._keys = keys
+        self._cache = {}
+
+    def reweight(self, weights: Dict[str, float]) -> int:
+        """
+        Update the weights of known entries, keeping their keys; returns how many changed.
+        """
+        changed = 0
+        for entry_id, weight in weights.items():
+            entry = self._entries.get(entry_id)
+            if entry is not None and entry[1] != weight:
+                self._entries[entry_id] = (entry[0], weight, entry[2])
+                changed += 1
+        if changed:
+            self._cache = {}
+        return changed
+
+    def complete(self, prefix: str, limit: int = 5) -> List[Tuple[str, str]]:
+        """
+        Up to `limit` (entry id, label) pairs matching the prefix, highest weight first.
+        """
+        prefix = normalize_phrase(prefix)
+        if not prefix or limit <= 0:
+            return []
+        cached = self._cache.get((prefix, limit))
+        if cached is not None:
+            return cached
+
+        lo = bisect.bisect_left(self._keys, (prefix,))
+        hi = bisect.bisect_left(self._keys, (prefix + "\U0010ffff",), lo)
+        entry_ids = {entry_id for _, entry_id in self._keys[lo:hi]}
+        best = heapq.nlargest(limit, entry_ids, key=lambda entry_id: (self._entries[entry_id][1], entry_id))
+        result = [(entry_id, self._entries[entry_id][0]) for entry_id in best]
+
+        if len(self._cache) >= MAX_CACHED_PREFIXES:
+            self._cache.clear()
+        self._cache[(prefix, limit)] = result
+        return result
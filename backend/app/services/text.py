@@ -0,0 +1,74 @@
+import html
+import math
+import re
+import unicodedata
+from typing import Dict, List, Optional, Union
+
+EXCERPT_LENGTH = 280
+WORDS_PER_MINUTE = 200
+# Bump whenever summaries are derived differently, then run
+# `python -m app.db.reconcile` to refresh the stored ones
+SUMMARY_VERSION = 2
+
+WORD = re.compile(r"\w+")
+_WHITESPACE = re.compile(r"\s+")
+_COMBINING = re.compile("[\u0300-\u036f]")
+
+# Markdown syntax dropped from teasers, leaving the words a reader sees
+_MARKDOWN_RULES = [
+    (re.compile(r"^\s*(```|~~~).*$", re.M), ""),
+    (re.compile(r"^\s*([-*_]\s*){3,}$", re.M), ""),
+    (re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$", re.M), ""),
+    (re.compile(r"!\[([^\]]*)\]\([^)]*\)"), r"\1"),
+    (re.compile(r"\[([^\]]*)\]\([^)]*\)"), r"\1"),
+    (re.compile(r"^\s{0,3}(#{1,6}\s+|(>\s?)+|[-*+]\s+|\d+[.)]\s+)", re.M), ""),
+    (re.compile(r"<[^>]+>"), " "),
+    (re.compile(r"\*+|~~|`+|(?<!\w)_+|_+(?!\w)|\|"), ""),
+]
+
+
+def normalize(text: str) -> str:
+    # Case- and accent-insensitive matching: "Café" and "cafe" are the same term
+    return _COMBINING.sub("", unicodedata.normalize("NFKD", text.casefold()))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return WORD.findall(normalize(text or ""))
+
+
+def plain_text(markdown: str) -> str:
+    """
+    The readable text of a Markdown source, without markup or HTML tags.
+    """
+    for pattern, replacement in _MARKDOWN_RULES:
+        markdown = pattern.sub(replacement, markdown)
+    return html.unescape(markdown)
+
+
+def make_excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    """
+    First `length` characters of the text, cut back to a word boundary.
+    """
+    text = _WHITESPACE.sub(" ", text).strip()
+    if len(text) <= length:
+        return text
+    cut = text[:length]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+def summarize(text: str) -> Dict[str, Union[str, int]]:
+    """
+    Teaser fields stored on a post so listings never need its full text.
+
+    They describe the text as read, so Markdown syntax is stripped first.
+    """
+    text = plain_text(text)
+    word_count = len(text.split())
+    return {
+        "excerpt": make_excerpt(text),
+        "word_count": word_count,
+        "reading_time": max(1, math.ceil(word_count / WORDS_PER_MINUTE)) if word_count else 0,
+        "summary_version": SUMMARY_VERSION,
+    }
@@ -0,0 +1,36 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.database import Database
+
+VERSIONS_COLLECTION = "collection_versions"
+
+
+async def bump_versions(db: Database, *collections: str) -> None:
+    """
+    Record a write to the given collections for conditional GET validators.
+    """
+    if not collections:
+        return
+    now = datetime.utcnow()
+    operations = [
+        UpdateOne({"_id": name}, {"$inc": {"version": 1}, "$set": {"updated_at": now}}, upsert=True)
+        for name in set(collections)
+    ]
+    await db[VERSIONS_COLLECTION].bulk_write(operations, ordered=False)
+
+
+async def get_versions(db: Database, collections: Iterable[str]) -> Tuple[Dict[str, int], Optional[datetime]]:
+    """
+    Current version of each collection and the time of the latest write among them.
+    """
+    names = sorted(set(collections))
+    versions = {name: 0 for name in names}
+    last_modified = None
+    async for doc in db[VERSIONS_COLLECTION].find({"_id": {"$in": names}}):
+        versions[doc["_id"]] = doc.get("version", 0)
+        updated_at = doc.get("updated_at")
+        if updated_at and (last_modified is None or updated_at > last_modified):
+            last_modified = updated_at
+    return versions, last_modified
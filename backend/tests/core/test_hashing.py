@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.core.hashing import PasswordHasher
+
+
+@pytest.mark.asyncio
+async def test_hashes_off_the_loop_within_the_concurrency_limit():
+    hasher = PasswordHasher(workers=1)
+    try:
+        hashes = await asyncio.gather(*(hasher.hash(f"secret-{i}") for i in range(3)))
+        stats = hasher.stats()
+        assert stats["completed"] == 3 and stats["max_queue_depth"] == 2
+        assert stats["queue_depth"] == 0 and stats["running"] == 0
+
+        verified, new_hash = await hasher.verify("secret-1", hashes[1])
+        assert verified and new_hash is None
+        assert await hasher.verify("wrong", hashes[1]) == (False, None)
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_outdated_cost_is_rehashed_on_verify():
+    rounds = 4 if settings.BCRYPT_ROUNDS != 4 else 5
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds).hash("secret")
+    hasher = PasswordHasher(workers=1)
+    try:
+        verified, new_hash = await hasher.verify("secret", old_hash)
+        assert verified and new_hash.startswith(f"$2b${settings.BCRYPT_ROUNDS:02d}$")
+        assert hasher.stats()["rehashed"] == 1
+    finally:
+        hasher.shutdown()
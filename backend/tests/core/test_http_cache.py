@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from fastapi import Request, Response
+
+from app.core.http_cache import is_not_modified, make_etag, not_modified, set_validators
+
+
+def make_request(**headers) -> Request:
+    raw_headers = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw_headers})
+
+
+def test_make_etag():
+    assert make_etag("post", 1) == make_etag("post", 1)
+    assert make_etag("post", 1) != make_etag("post", 2)
+    assert make_etag("post", 1).startswith('"') and make_etag("post", 1).endswith('"')
+
+
+def test_if_none_match():
+    etag = make_etag("post", 1)
+    assert is_not_modified(make_request(if_none_match=etag), etag)
+    assert is_not_modified(make_request(if_none_match=f'"other", W/{etag}'), etag)
+    assert is_not_modified(make_request(if_none_match="*"), etag)
+    assert not is_not_modified(make_request(if_none_match='"other"'), etag)
+    assert not is_not_modified(make_request(), etag)
+
+
+def test_if_modified_since():
+    etag = make_etag("post", 1)
+    last_modified = datetime(2024, 3, 1, 10, 30, 15, 500000)
+    response = Response()
+    set_validators(response, etag, last_modified)
+    header = response.headers["Last-Modified"]
+    assert header == "Fri, 01 Mar 2024 10:30:15 GMT"
+
+    assert is_not_modified(make_request(if_modified_since=header), etag, last_modified)
+    assert not is_not_modified(make_request(if_modified_since=header), etag, last_modified + timedelta(seconds=1))
+    assert not is_not_modified(make_request(if_modified_since="garbage"), etag, last_modified)
+
+    # If-None-Match takes precedence over If-Modified-Since
+    assert not is_not_modified(make_request(if_none_match='"other"', if_modified_since=header), etag, last_modified)
+
+
+def test_not_modified_response():
+    etag = make_etag("post", 1)
+    response = not_modified(etag)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.body == b""
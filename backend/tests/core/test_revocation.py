@@ -0,0 +1,52 @@
+from fastapi import HTTPException
+from jose import jwt
+import pytest
+
+from app.core.auth import _decode_access_token, _user_from_claims
+from app.core.config import settings
+from app.core.revocation import BloomFilter, RevocationSet, revocation_store
+from app.core.security import create_access_token, create_refresh_token, user_claims
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(size_bits=4096, hash_count=5)
+    values = [f"user-{i}" for i in range(200)]
+    for value in values:
+        bloom.add(value)
+    assert all(value in bloom for value in values)
+    false_positives = sum(f"other-{i}" in bloom for i in range(1000))
+    assert false_positives < 100
+
+
+def test_revocation_set_rejects_tokens_below_the_valid_version():
+    revoked = RevocationSet({"alice": 2})
+    assert revoked.is_revoked("alice", 1)
+    assert not revoked.is_revoked("alice", 2)
+    assert not revoked.is_revoked("bob", 0)
+
+    revoked.add("alice", 1)
+    assert revoked.is_revoked("alice", 1)
+    revoked.add("bob", 1)
+    assert revoked.is_revoked("bob", 0)
+
+
+def test_access_tokens_authorize_from_claims():
+    user = {"_id": "65f000000000000000000001", "username": "alice", "email": "alice@example.com",
+            "is_superuser": True, "token_version": 3}
+    token = create_access_token(user["_id"], claims=user_claims(user))
+    error = HTTPException(status_code=401)
+
+    current = _user_from_claims(_decode_access_token(token, error), error)
+    assert current.id == user["_id"] and current.is_superuser and current.is_active
+    assert current.username == "alice" and current.token_version == 3
+
+    revocation_store.add(user["_id"], 4)
+    with pytest.raises(HTTPException):
+        _user_from_claims(_decode_access_token(token, error), error)
+
+
+def test_refresh_tokens_are_not_access_tokens():
+    token = create_refresh_token("65f000000000000000000002", 1)
+    assert jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])["typ"] == "refresh"
+    with pytest.raises(HTTPException):
+        _decode_access_token(token, HTTPException(status_code=401))
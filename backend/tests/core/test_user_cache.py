@@ -0,0 +1,86 @@
+import time
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.core.auth import get_current_user
+from app.core.revocation import revocation_store
+from app.core.security import create_access_token
+from app.core.user_cache import UserCache
+
+
+def _user():
+    return {"_id": ObjectId(), "username": "alice"}
+
+
+def test_hits_and_invalidation_by_user_tag():
+    cache = UserCache(max_entries=10, ttl_seconds=60)
+    user = _user()
+    cache.set("token-a", user, None, cache.generation)
+    cache.set("token-b", user, None, cache.generation)
+    assert cache.get("token-a") is user
+    assert cache.get("other") is None
+
+    cache.on_invalidation({f"user:{user['_id']}", "posts:all"})
+    assert cache.get("token-a") is None and cache.get("token-b") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["entries"] == 0
+
+
+def test_lookups_racing_an_invalidation_are_not_cached():
+    cache = UserCache(max_entries=10, ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate_user("someone")
+    cache.set("token", _user(), None, generation)
+    assert cache.get("token") is None
+
+
+def test_entries_expire_with_the_token_and_are_bounded():
+    cache = UserCache(max_entries=2, ttl_seconds=60)
+    cache.set("expired", _user(), time.time() - 1, cache.generation)
+    assert cache.get("expired") is None
+
+    for token in ("a", "b", "c"):
+        cache.set(token, _user(), None, cache.generation)
+    assert cache.get("a") is None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+class _Users:
+    def __init__(self, document):
+        self.document = document
+        self.loads = 0
+
+    async def load(self, user_id):
+        self.loads += 1
+        return self.document
+
+    def prime(self, user_id, document):
+        pass
+
+
+class _Loaders:
+    def __init__(self, document):
+        self.users = _Users(document)
+
+
+@pytest.mark.asyncio
+async def test_cached_users_still_check_the_token_and_revocations():
+    user = {**_user(), "email": "alice@example.com", "hashed_password": "x", "token_version": 1}
+    user_id = str(user["_id"])
+    token = create_access_token(user_id, claims={"tv": 1})
+    loaders = _Loaders(user)
+    assert (await get_current_user(token=token, loaders=loaders)).id == user_id
+    assert (await get_current_user(token=token, loaders=loaders)).id == user_id
+    assert loaders.users.loads == 1
+
+    # A token signed with another key never reaches the cache
+    with pytest.raises(HTTPException):
+        await get_current_user(token=token[:-2] + "xx", loaders=loaders)
+
+    # Another worker revoked the user's tokens: the cached document is reloaded
+    revocation_store.add(user_id, 2)
+    loaders.users.document = {**user, "token_version": 2}
+    with pytest.raises(HTTPException):
+        await get_current_user(token=token, loaders=loaders)
+    assert loaders.users.loads == 2
@@ -0,0 +1,54 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from app.db.indexes import INDEX_SPEC, _signature, _spec_signatures, index_spec_version
+
+
+def test_signature_matches_index_information():
+    model = IndexModel([("category_id", ASCENDING), ("date", DESCENDING)], unique=True)
+    # Shape returned by Collection.index_information()
+    info = {"key": [("category_id", 1.0), ("date", -1)], "unique": True, "v": 2}
+    assert _signature(info["key"], info) in _spec_signatures([model])
+
+    # Options are part of the identity, names are not
+    assert _signature(info["key"], {"key": info["key"]}) not in _spec_signatures([model])
+
+
+def test_index_spec_version():
+    assert index_spec_version() == index_spec_version()
+
+    changed = dict(INDEX_SPEC)
+    changed["tags"] = INDEX_SPEC["tags"] + [IndexModel([("created_at", ASCENDING)])]
+    assert index_spec_version(changed) != index_spec_version()
+
+
+def test_listing_indexes_end_with_keyset_sort():
+    for model in INDEX_SPEC["posts"]:
+        fields = list(model.document["key"].items())
+        if ("date", DESCENDING) not in fields:
+            continue
+        assert fields[-2:] == [("date", DESCENDING), ("_id", DESCENDING)]
+
+
+def test_signature_covers_every_creation_option():
+    sparse = IndexModel([("email", ASCENDING)], sparse=True)
+    assert _signature([("email", 1)], {"key": [("email", 1)]}) not in _spec_signatures([sparse])
+
+    # Collation fields the server fills in do not count as a difference
+    model = IndexModel([("name", ASCENDING)], collation={"locale": "en", "strength": 2})
+    info = {"key": [("name", 1)], "v": 2, "collation": {
+        "locale": "en", "caseLevel": False, "caseFirst": "off", "strength": 2, "numericOrdering": False,
+        "alternate": "non-ignorable", "maxVariable": "punct", "normalization": False, "backwards": False,
+        "version": "57.1",
+    }}
+    assert _signature(info["key"], info) in _spec_signatures([model])
+
+
+def test_ttl_changes_are_detected_but_keep_the_signature():
+    ttl = IndexModel([("updated_at", ASCENDING)], expireAfterSeconds=3600)
+    info = {"key": [("updated_at", 1)], "expireAfterSeconds": 86400.0}
+    assert _signature(info["key"], info) in _spec_signatures([ttl])
+    assert _signature(info["key"], {"key": info["key"]}) not in _spec_signatures([ttl])
+
+    changed = dict(INDEX_SPEC)
+    changed["revocations"] = [ttl]
+    assert index_spec_version(changed) != index_spec_version()
@@ -0,0 +1,42 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from app.core.config import settings
+from app.db.mongodb import client_options
+from app.db.pool_monitor import PoolMonitor
+
+ADDRESS = ("db1", 27017)
+
+
+def test_tracks_checked_out_connections_and_waiters():
+    monitor = PoolMonitor()
+    monitor.pool_created(monitoring.PoolCreatedEvent(ADDRESS, {}))
+    monitor.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, 1))
+    monitor.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    monitor.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    monitor.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 1))
+
+    pool = monitor.stats()["db1:27017"]
+    assert pool["open"] == 1 and pool["checked_out"] == 1
+    assert pool["waiters"] == 1 and pool["max_waiters"] == 2 and pool["check_outs"] == 1
+
+    monitor.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDRESS, "timeout"))
+    monitor.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+    monitor.pool_cleared(monitoring.PoolClearedEvent(ADDRESS))
+    pool = monitor.stats()["db1:27017"]
+    assert pool["checked_out"] == 0 and pool["waiters"] == 0
+    assert pool["check_out_failures"] == 1 and pool["cleared"] == 1
+
+    monitor.pool_closed(monitoring.PoolClosedEvent(ADDRESS))
+    assert monitor.stats() == {}
+
+
+def test_unset_client_options_keep_the_uri_values(monkeypatch):
+    monkeypatch.setattr(settings, "MONGODB_MAX_POOL_SIZE", 50)
+    options = client_options()
+    assert options["maxPoolSize"] == 50 and "minPoolSize" not in options and "readPreference" not in options
+
+    client = AsyncIOMotorClient("mongodb://db1/?minPoolSize=3&readPreference=secondaryPreferred", connect=False, **options)
+    assert client.options.pool_options.min_pool_size == 3
+    assert client.options.pool_options.max_pool_size == 50
+    assert client.options.read_preference.mongos_mode == "secondaryPreferred"
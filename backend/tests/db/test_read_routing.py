@@ -0,0 +1,78 @@
+import time
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic import ValidationError
+from pymongo.read_preferences import Primary, SecondaryPreferred
+from starlette.requests import Request
+
+from app.core.cache import skip_cache_reads
+from app.core.config import Settings, settings
+from app.db.mongodb import db
+from app.db.read_routing import LAST_WRITE_HEADER, LastWriteMiddleware, get_read_database, sign_last_write
+
+
+def _request(headers=()):
+    return Request({"type": "http", "method": "GET", "headers": [(k.lower().encode(), v.encode()) for k, v in headers]})
+
+
+@pytest.fixture
+def secondary_reads(monkeypatch):
+    monkeypatch.setattr(settings, "READ_FROM_SECONDARIES", True)
+    monkeypatch.setattr(db, "db", AsyncIOMotorClient("mongodb://localhost:1", connect=False)["tinyblog"])
+
+
+@pytest.mark.asyncio
+async def test_public_reads_go_to_secondaries_within_the_staleness_bound(secondary_reads):
+    database = await get_read_database(_request())
+    assert isinstance(database.read_preference, SecondaryPreferred)
+    assert database.read_preference.max_staleness == settings.READ_MAX_STALENESS_SECONDS
+    assert not skip_cache_reads.get()
+
+
+@pytest.mark.asyncio
+async def test_recent_writers_read_from_the_primary_without_cache(secondary_reads):
+    database = await get_read_database(_request([(LAST_WRITE_HEADER, sign_last_write(time.time() - 1))]))
+    assert isinstance(database.read_preference, Primary)
+    assert skip_cache_reads.get()
+
+    stale = sign_last_write(time.time() - settings.READ_YOUR_WRITES_SECONDS - 1)
+    cookie = ("cookie", f"tinyblog_last_write={stale}")
+    database = await get_read_database(_request([cookie]))
+    assert isinstance(database.read_preference, SecondaryPreferred)
+
+    # Stamps from the future would keep a client on the primary forever
+    database = await get_read_database(_request([(LAST_WRITE_HEADER, sign_last_write(time.time() + 3600))]))
+    assert isinstance(database.read_preference, SecondaryPreferred)
+
+
+@pytest.mark.asyncio
+async def test_unsigned_or_tampered_stamps_are_ignored(secondary_reads):
+    signed = sign_last_write(time.time() - 1)
+    tampered = sign_last_write(time.time() - 3600).rpartition(".")[0] + "." + signed.rpartition(".")[2]
+    for stamp in (f"{time.time() - 1:.3f}", tampered, "not-a-stamp", signed + "0"):
+        database = await get_read_database(_request([(LAST_WRITE_HEADER, stamp)]))
+        assert isinstance(database.read_preference, SecondaryPreferred)
+
+
+def test_read_your_writes_window_covers_staleness_and_cache_ttl():
+    assert settings.READ_YOUR_WRITES_SECONDS >= settings.READ_MAX_STALENESS_SECONDS + settings.RESPONSE_CACHE_TTL_SECONDS
+    with pytest.raises(ValidationError):
+        Settings(READ_MAX_STALENESS_SECONDS=90, RESPONSE_CACHE_TTL_SECONDS=60, READ_YOUR_WRITES_SECONDS=90)
+
+
+@pytest.mark.asyncio
+async def test_successful_writes_are_stamped(secondary_reads):
+    async def endpoint(scope, receive, send):
+        await send({"type": "http.response.start", "status": 201 if scope["method"] == "POST" else 400, "headers": []})
+
+    cases = (("POST", "/api/v1/posts/", True), ("PUT", "/api/v1/posts/1", False), ("POST", "/api/v1/auth/login", False))
+    for method, path, stamped in cases:
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await LastWriteMiddleware(endpoint)({"type": "http", "method": method, "path": path}, None, send)
+        names = [name for name, _ in messages[0]["headers"]]
+        assert (b"set-cookie" in names and LAST_WRITE_HEADER.lower().encode() in names) == stamped
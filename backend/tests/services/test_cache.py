@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.cache import MemoryCacheBackend, RedisCacheBackend, make_cache_key, reads_as_of
+
+
+def test_make_cache_key():
+    assert make_cache_key("posts", limit=10, skip=0) == make_cache_key("posts", skip=0, limit=10)
+    assert make_cache_key("posts", skip=0, search=None) == "posts?skip=0"
+    assert make_cache_key("posts", skip=0) != make_cache_key("tags", skip=0)
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction():
+    cache = MemoryCacheBackend(max_entries=2, ttl_seconds=60)
+    await cache.set("a", 1)
+    await cache.set("b", 2)
+    assert await cache.get("a") == 1  # "b" is now least recently used
+    await cache.set("c", 3)
+
+    assert await cache.get("b") is None
+    assert await cache.get("a") == 1
+    assert await cache.get("c") == 3
+    stats = await cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_ttl_expiry():
+    cache = MemoryCacheBackend(max_entries=10, ttl_seconds=60)
+    await cache.set("fresh", 1)
+    await cache.set("stale", 2, ttl_seconds=0)
+    assert await cache.get("fresh") == 1
+    assert await cache.get("stale") is None
+    assert (await cache.stats())["entries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_tag_invalidation():
+    cache = MemoryCacheBackend(max_entries=10, ttl_seconds=60)
+    await cache.set("post", {"id": "1"}, {"post:1", "category:c"})
+    await cache.set("listing", [{"id": "1"}, {"id": "2"}], {"posts:all", "post:1", "post:2"})
+    await cache.set("tags", [], {"tags"})
+
+    await cache.invalidate({"post:1"})
+    assert await cache.get("post") is None
+    assert await cache.get("listing") is None
+    assert await cache.get("tags") == []
+
+    # Re-setting a key replaces its tags
+    await cache.set("tags", [], {"tags"})
+    await cache.set("tags", [1], {"other"})
+    await cache.invalidate({"tags"})
+    assert await cache.get("tags") == [1]
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_notifies_listeners():
+    cache = MemoryCacheBackend(max_entries=10, ttl_seconds=60)
+    received = []
+    cache.subscribe(received.append)
+    await cache.invalidate({"user:1"})
+    assert received == [{"user:1"}]
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_shared_between_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    aioredis = pytest.importorskip("fakeredis.aioredis")
+    server = fakeredis.FakeServer()
+    worker_a = RedisCacheBackend(aioredis.FakeRedis(server=server, decode_responses=True), ttl_seconds=60)
+    worker_b = RedisCacheBackend(aioredis.FakeRedis(server=server, decode_responses=True), ttl_seconds=60)
+
+    await worker_a.set("listing", [{"id": "1"}], {"posts:all", "post:1"})
+    assert await worker_b.get("listing") == [{"id": "1"}]
+
+    # An invalidation by one worker is seen by the other
+    await worker_b.invalidate({"post:1"})
+    assert await worker_a.get("listing") is None
+
+    # Entries stored after the invalidation are valid again
+    await worker_a.set("listing", [{"id": "1"}], {"posts:all", "post:1"})
+    assert await worker_b.get("listing") == [{"id": "1"}]
+    assert await worker_a.get("missing") is None
+    stats = await worker_b.stats()
+    assert stats["hits"] == 2
+    assert stats["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_broadcasts_invalidations():
+    fakeredis = pytest.importorskip("fakeredis")
+    aioredis = pytest.importorskip("fakeredis.aioredis")
+    server = fakeredis.FakeServer()
+    worker_a = RedisCacheBackend(aioredis.FakeRedis(server=server, decode_responses=True), ttl_seconds=60)
+    worker_b = RedisCacheBackend(aioredis.FakeRedis(server=server, decode_responses=True), ttl_seconds=60)
+    received = asyncio.Queue()
+    worker_b.subscribe(received.put_nowait)
+    await worker_b.start()
+    try:
+        await worker_a.invalidate({"user:42"})
+        assert await asyncio.wait_for(received.get(), timeout=5) == {"user:42"}
+    finally:
+        await worker_b.close()
+        await worker_a.close()
+
+
+@pytest.mark.asyncio
+async def test_fills_racing_an_invalidation_are_dropped():
+    cache = MemoryCacheBackend(max_entries=10, ttl_seconds=60)
+    assert await cache.get("post") is None
+    # The post is read from the database, then changed and invalidated before the fill
+    await cache.invalidate({"post:1"})
+    await cache.set("post", {"title": "old"}, {"post:1"})
+    assert await cache.get("post") is None
+    assert (await cache.stats())["stale_fills"] == 1
+
+    await cache.set("post", {"title": "new"}, {"post:1"})
+    assert await cache.get("post") == {"title": "new"}
+
+
+@pytest.mark.asyncio
+async def test_secondary_reads_older_than_the_last_invalidation_are_not_cached():
+    cache = MemoryCacheBackend(max_entries=10, ttl_seconds=60)
+    await cache.invalidate({"post:1"})
+    # The secondary may lag by up to a minute, so it may not have the change yet
+    token = reads_as_of.set(time.time() - 60)
+    try:
+        await cache.set("post", {"title": "old"}, {"post:1"})
+        assert await cache.get("post") is None
+    finally:
+        reads_as_of.reset(token)
+
+    token = reads_as_of.set(time.time() + 1)
+    try:
+        await cache.set("post", {"title": "new"}, {"post:1"})
+        assert await cache.get("post") == {"title": "new"}
+    finally:
+        reads_as_of.reset(token)
+
+
+@pytest.mark.asyncio
+async def test_redis_backend_drops_fills_racing_another_workers_invalidation():
+    fakeredis = pytest.importorskip("fakeredis")
+    aioredis = pytest.importorskip("fakeredis.aioredis")
+    server = fakeredis.FakeServer()
+    worker_a = RedisCacheBackend(aioredis.FakeRedis(server=server, decode_responses=True), ttl_seconds=60)
+    worker_b = RedisCacheBackend(aioredis.FakeRedis(server=server, decode_responses=True), ttl_seconds=60)
+
+    assert await worker_a.get("post") is None
+    await worker_b.invalidate({"post:1"})
+    await worker_a.set("post", {"title": "old"}, {"post:1"})
+    assert await worker_b.get("post") is None
+    assert (await worker_a.stats())["stale_fills"] == 1
+
+    await worker_a.set("post", {"title": "new"}, {"post:1"})
+    assert await worker_b.get("post") == {"title": "new"}
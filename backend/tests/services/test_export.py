@@ -0,0 +1,46 @@
+import gzip
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.services.export import dump_document, export_query, load_document, make_compressor, read_ndjson
+
+
+def test_documents_round_trip_with_bson_types():
+    document = {"_id": ObjectId(), "title": "Café", "date": datetime(2024, 5, 17, 12, 30, 45, 123000), "tags": ["a"]}
+    line = dump_document(document)
+    assert line.endswith(b"\n") and line.count(b"\n") == 1
+    assert load_document(line) == document
+
+
+def test_gzip_stream_is_readable_across_chunks():
+    compressor = make_compressor("gzip")
+    lines = [dump_document({"n": number}) for number in range(1000)]
+    data = compressor.compress(b"".join(lines[:500])) + compressor.compress(b"".join(lines[500:])) + compressor.flush()
+    assert gzip.decompress(data) == b"".join(lines)
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        make_compressor("bzip2")
+    with pytest.raises(ValueError):
+        export_query("not-an-id")
+    object_id = ObjectId()
+    assert export_query(str(object_id)) == {"_id": {"$gt": object_id}}
+    assert export_query(None) == {}
+
+
+async def _chunks(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+@pytest.mark.asyncio
+async def test_read_ndjson_splits_lines_across_chunks():
+    data = gzip.compress(b'{"n": 1}\n\n{"n": 2}\n') + gzip.compress(b'{"n": 3}')
+    lines = [item async for item in read_ndjson(_chunks(data, 7), "gzip")]
+    assert lines == [(1, b'{"n": 1}'), (3, b'{"n": 2}'), (4, b'{"n": 3}')]
+
+    with pytest.raises(ValueError):
+        [item async for item in read_ndjson(_chunks(b"not gzip", 4), "gzip")]
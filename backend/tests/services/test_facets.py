@@ -0,0 +1,11 @@
+from app.services.facets import facet_pipeline
+
+
+def test_facet_pipeline_is_a_single_facet_stage():
+    pipeline = facet_pipeline({"is_visible": True}, limit=5)
+    assert pipeline[0] == {"$match": {"is_visible": True}}
+    assert len(pipeline) == 2
+    facets = pipeline[1]["$facet"]
+    assert set(facets) == {"total", "categories", "tags", "authors", "months"}
+    assert facets["tags"][0] == {"$unwind": "$tags"}
+    assert {"$limit": 5} in facets["authors"]
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.services.importer import Importer
+
+
+def test_post_records_get_defaults_and_summaries():
+    importer = Importer(None, "posts", default_author_id="author")
+    object_id = ObjectId()
+    line, post = importer._validate(1, {
+        "_id": str(object_id), "title": "Hello", "text": "Some words here", "category_id": "c",
+        "date": "2024-05-17T12:00:00Z", "comment_count": 7,
+    })
+    assert line == 1
+    assert post["_id"] == object_id
+    assert post["author_id"] == "author"
+    assert post["date"] == datetime(2024, 5, 17, 12) == post["created_at"]
+    assert post["comment_count"] == 0
+    assert post["word_count"] == 3 and post["is_visible"] is False and post["tags"] == []
+
+
+def test_invalid_records_are_reported_without_raising():
+    importer = Importer(None, "users")
+    assert importer._validate(1, {"username": "a", "email": "a@example.com"}) is None
+    assert importer._validate(2, {"_id": "nope", "username": "b", "password": "pw"}) is None
+    assert importer._validate(3, {"email": "c@example.com", "password": "pw"}) is None
+    assert importer._validate(4, {"username": "d", "password": "pw", "created_at": "yesterday"}) is None
+    assert [error.line for error in importer.report.errors] == [1, 2, 3, 4]
+    assert importer.report.failed == 4
+    assert "username" in importer.report.errors[2].detail
+
+    assert importer._validate(5, {"username": "e", "password": "pw"})[1]["is_active"] is True
+
+
+def test_only_whitelisted_fields_are_imported():
+    importer = Importer(None, "posts", default_author_id="author")
+    _, post = importer._validate(1, {
+        "title": "Hello", "text": "Some words", "category_id": "c",
+        "html": "<script>alert(1)</script>", "content_hash": "x", "renderer_version": 1,
+        "excerpt": "forged", "admin": True,
+    })
+    assert "html" not in post and "content_hash" not in post and "renderer_version" not in post
+    assert "admin" not in post and post["excerpt"] == "Some words"
+
+    _, user = Importer(None, "users")._validate(2, {"username": "u", "password": "pw", "token_version": 9, "roles": ["x"]})
+    assert set(user) == {"username", "password", "is_active", "is_superuser", "created_at", "updated_at"}
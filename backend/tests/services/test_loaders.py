@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+from app.services.loaders import DataLoader, to_object_ids
+
+
+class RecordingBatch:
+    def __init__(self, fail: bool = False):
+        self.calls = []
+        self.fail = fail
+
+    async def __call__(self, keys):
+        self.calls.append(sorted(keys))
+        if self.fail:
+            raise RuntimeError("backend down")
+        return {key: {"id": key} for key in keys if key != "missing"}
+
+
+@pytest.mark.asyncio
+async def test_loads_in_same_tick_are_coalesced():
+    batch = RecordingBatch()
+    loader = DataLoader(batch)
+
+    async def resolve(key):
+        return await loader.load(key)
+
+    results = await asyncio.gather(resolve("a"), resolve("b"), resolve("a"), resolve("missing"))
+    assert results == [{"id": "a"}, {"id": "b"}, {"id": "a"}, None]
+    assert batch.calls == [["a", "b", "missing"]]
+
+
+@pytest.mark.asyncio
+async def test_results_are_memoized():
+    batch = RecordingBatch()
+    loader = DataLoader(batch)
+    assert await loader.load_many(["a", "b"]) == [{"id": "a"}, {"id": "b"}]
+    assert await loader.load("a") == {"id": "a"}
+    assert await loader.load_many(["b", "c"]) == [{"id": "b"}, {"id": "c"}]
+    assert batch.calls == [["a", "b"], ["c"]]
+
+    loader.prime("d", {"id": "primed"})
+    assert await loader.load("d") == {"id": "primed"}
+    assert len(batch.calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_not_memoized():
+    batch = RecordingBatch(fail=True)
+    loader = DataLoader(batch)
+    with pytest.raises(RuntimeError):
+        await loader.load("a")
+
+    batch.fail = False
+    assert await loader.load("a") == {"id": "a"}
+    assert len(batch.calls) == 2
+
+
+def test_to_object_ids():
+    object_id = ObjectId()
+    assert to_object_ids([str(object_id), "not-an-id", None, str(object_id)]) == [object_id]
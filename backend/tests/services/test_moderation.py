@@ -0,0 +1,38 @@
+import pytest
+from bson import ObjectId
+
+from app.models.comment import CommentSelection
+from app.db.indexes import INDEX_SPEC
+from app.services.moderation import _deltas, pending_query, selection_query
+
+
+def test_selection_query_combines_criteria():
+    object_id = ObjectId()
+    query = selection_query(CommentSelection(ids=[str(object_id)], author_email="spam@example.com"))
+    assert query == {"_id": {"$in": [object_id]}, "author_email": "spam@example.com"}
+
+    with pytest.raises(ValueError):
+        selection_query(CommentSelection())
+    with pytest.raises(ValueError):
+        selection_query(CommentSelection(ids=["nope"]))
+
+
+def test_counter_deltas_per_post():
+    comments = [
+        {"post_id": "a", "is_approved": True},
+        {"post_id": "a", "is_approved": False},
+        {"post_id": "b", "is_approved": False},
+    ]
+    assert _deltas("delete", comments) == {"a": (-2, -1), "b": (-1, 0)}
+    assert _deltas("approve", comments[1:]) == {"a": (0, 1), "b": (0, 1)}
+    assert _deltas("reject", comments[:1]) == {"a": (0, -1)}
+
+
+def test_pending_query_matches_partial_index():
+    partial = next(
+        model.document["partialFilterExpression"]
+        for model in INDEX_SPEC["comments"]
+        if "partialFilterExpression" in model.document
+    )
+    assert pending_query() == partial
+    assert pending_query(["a", "b"]) == {**partial, "post_id": {"$in": ["a", "b"]}}
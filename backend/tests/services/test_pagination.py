@@ -0,0 +1,59 @@
+import pytest
+from bson import ObjectId
+from datetime import datetime
+
+from app.services.pagination import apply_cursor, decode_cursor, encode_cursor, next_cursor
+
+
+def test_cursor_round_trip():
+    date = datetime(2024, 5, 17, 12, 30, 45, 123000)
+    object_id = ObjectId()
+    cursor = encode_cursor(date, object_id)
+    assert decode_cursor(cursor) == (date, object_id)
+
+    # Cursors must be safe to pass as a query parameter
+    assert "=" not in cursor
+    assert "/" not in cursor and "+" not in cursor
+
+
+def test_decode_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor(datetime.utcnow(), ObjectId())[:-4])
+
+
+def test_apply_cursor():
+    date = datetime(2024, 1, 1)
+    object_id = ObjectId()
+    cursor = encode_cursor(date, object_id)
+    after = {"$or": [
+        {"date": {"$lt": date}},
+        {"date": date, "_id": {"$lt": object_id}},
+    ]}
+
+    # No cursor leaves the query untouched
+    assert apply_cursor({"is_visible": True}, None) == {"is_visible": True}
+
+    # Existing filters are preserved, including an existing $or
+    assert apply_cursor({}, cursor) == after
+    query = {"is_visible": True, "$or": [{"title": "a"}, {"text": "a"}]}
+    assert apply_cursor(query, cursor) == {"$and": [query, after]}
+
+
+def test_next_cursor():
+    documents = [{"_id": ObjectId(), "date": datetime(2024, 1, day)} for day in (3, 2, 1)]
+    assert next_cursor(documents, 3) == encode_cursor(documents[-1]["date"], documents[-1]["_id"])
+
+    # A short page is the last one
+    assert next_cursor(documents, 10) is None
+    assert next_cursor([], 10) is None
+
+
+def test_apply_cursor_ascending():
+    date = datetime(2024, 1, 1)
+    object_id = ObjectId()
+    assert apply_cursor({}, encode_cursor(date, object_id), ascending=True) == {"$or": [
+        {"date": {"$gt": date}},
+        {"date": date, "_id": {"$gt": object_id}},
+    ]}
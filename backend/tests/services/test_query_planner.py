@@ -0,0 +1,42 @@
+import pytest
+from fastapi import HTTPException
+
+from app.services.post_filters import POST_SORTS, check_query_plan
+from app.services.query_planner import CAPPED, INDEXED, SCAN, plan_query
+
+
+def test_public_date_listings_are_indexed():
+    plan = plan_query({"is_visible"}, sort=POST_SORTS["newest"])
+    assert plan.shape == INDEXED
+    assert plan.index[0] == ("is_visible", 1)
+
+    # The same index read backwards serves the oldest-first order
+    assert plan_query({"is_visible"}, sort=POST_SORTS["oldest"]).shape == INDEXED
+    assert plan_query({"is_visible", "tags"}, sort=POST_SORTS["newest"]).shape == INDEXED
+
+
+def test_date_range_is_served_by_index_bounds():
+    plan = plan_query({"is_visible"}, {"date"}, POST_SORTS["newest"])
+    assert plan.shape == INDEXED
+
+
+def test_unindexed_sort_is_capped_when_filtered_and_scanned_otherwise():
+    assert plan_query({"is_visible", "tags"}, sort=POST_SORTS["title"]).shape == CAPPED
+    plan = plan_query({"is_visible"}, sort=POST_SORTS["title"])
+    assert plan.shape == SCAN
+    assert plan.index is None
+
+
+def test_popular_listing_has_its_own_index():
+    assert plan_query({"is_visible"}, sort=POST_SORTS["popular"]).shape == INDEXED
+
+
+def test_regex_search_fallback_is_never_indexed():
+    search = {"$or": [{"title": {"$regex": "mongo", "$options": "i"}}, {"text": {"$regex": "mongo", "$options": "i"}}]}
+    plan = check_query_plan({"is_visible": True, **search}, POST_SORTS["newest"], 0, 10, None)
+    assert plan.shape == CAPPED
+
+    assert plan_query({"is_visible", "tags"}, sort=POST_SORTS["newest"], unindexed={"title"}).shape == CAPPED
+    assert plan_query({"is_visible"}, sort=POST_SORTS["title"], unindexed={"title"}).shape == SCAN
+    with pytest.raises(HTTPException):
+        check_query_plan({"is_visible": True, **search}, POST_SORTS["newest"], 495, 10, None)
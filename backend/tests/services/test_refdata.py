@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+
+from app.services.refdata import ReferenceStore
+
+
+def test_replace_builds_id_map():
+    store = ReferenceStore()
+    news, tech = ObjectId(), ObjectId()
+    store.replace("categories", [{"_id": news, "name": "News"}, {"_id": tech, "name": "Tech"}], version=3)
+
+    assert store.get("categories", str(news))["name"] == "News"
+    assert store.get("categories", str(tech))["name"] == "Tech"
+    assert store.get("categories", str(ObjectId())) is None
+    assert store.get("tags", str(news)) is None
+    assert len(store.all("categories")) == 2
+
+
+def test_replace_drops_removed_documents():
+    store = ReferenceStore()
+    tag = ObjectId()
+    store.replace("tags", [{"_id": tag, "name": "python"}])
+    store.replace("tags", [])
+
+    assert store.get("tags", str(tag)) is None
+    assert store.all("tags") == []
+
+
+class _Stream:
+    def __init__(self, changes):
+        self._changes = list(changes)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._changes:
+            raise StopAsyncIteration
+        return self._changes.pop(0)
+
+    async def try_next(self):
+        return self._changes.pop(0) if self._changes else None
+
+
+@pytest.mark.asyncio
+async def test_bursts_of_changes_reload_each_collection_once():
+    store = ReferenceStore()
+    reloads = []
+
+    async def reload(db, collection):
+        reloads.append(collection)
+
+    async def refresh(db):
+        pass
+
+    store.reload = reload
+    store.refresh = refresh
+    changes = [{"ns": {"coll": name}} for name in ("tags", "categories", "tags", "tags")]
+    db = SimpleNamespace(watch=lambda pipeline: _Stream(changes))
+    await store._watch(db)
+    assert reloads == ["categories", "tags"]
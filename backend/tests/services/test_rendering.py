@@ -0,0 +1,46 @@
+import pytest
+
+from app.core.config import settings
+from app.services.rendering import (
+    RENDERER_VERSION,
+    content_hash,
+    needs_render,
+    render_markdown,
+    render_post_text,
+    shutdown_renderer,
+)
+
+
+def test_render_markdown():
+    html = render_markdown("# Title\n\nSome *emphasis* and [a link](https://example.com).")
+    assert "<h1>Title</h1>" in html
+    assert "<em>emphasis</em>" in html
+    assert '<a href="https://example.com">a link</a>' in html
+
+
+def test_render_markdown_sanitizes():
+    html = render_markdown('<script>alert(1)</script>\n\n[x](javascript:alert(1)) <img src="a.png" onerror="x()">')
+    assert "<script" not in html
+    assert "javascript:" not in html
+    assert "onerror" not in html
+
+
+def test_needs_render():
+    text = "hello"
+    post = {"content_hash": content_hash(text), "renderer_version": RENDERER_VERSION}
+    assert not needs_render(post, text)
+    assert needs_render(post, "hello!")
+    assert needs_render({**post, "renderer_version": RENDERER_VERSION - 1}, text)
+    assert needs_render(None, text)
+
+
+@pytest.mark.asyncio
+async def test_large_posts_render_in_worker_pool(monkeypatch):
+    monkeypatch.setattr(settings, "MARKDOWN_OFFLOAD_MIN_CHARS", 0)
+    try:
+        rendered = await render_post_text("**bold**")
+    finally:
+        shutdown_renderer()
+    assert rendered["html"] == "<p><strong>bold</strong></p>"
+    assert rendered["content_hash"] == content_hash("**bold**")
+    assert rendered["renderer_version"] == RENDERER_VERSION
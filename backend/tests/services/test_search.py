@@ -0,0 +1,87 @@
+import pickle
+
+from app.services.search import InvertedIndex, make_snippet, tokenize
+
+
+def _post(post_id, title, text, **extra):
+    return {"_id": post_id, "title": title, "text": text, "is_visible": True, **extra}
+
+
+def test_tokenize_folds_case_and_accents():
+    assert tokenize("Café au LAIT, naïve!") == ["cafe", "au", "lait", "naive"]
+
+
+def test_title_matches_rank_higher():
+    index = InvertedIndex()
+    index.add(_post("body", "Weekly notes", "Notes on python packaging and more python"))
+    index.add(_post("title", "Python tips", "Short notes"))
+    index.add(_post("other", "Gardening", "Tomatoes"))
+
+    total, hits = index.search(tokenize("python"))
+    assert total == 2
+    assert [post_id for post_id, _ in hits] == ["title", "body"]
+
+
+def test_filters_and_visibility():
+    index = InvertedIndex()
+    index.add(_post("a", "Rust", "rust", category_id="c1", tags=["t1"], author_id="u1"))
+    index.add(_post("b", "Rust", "rust", category_id="c2", tags=["t2"], author_id="u2"))
+    index.add(_post("draft", "Rust", "rust", category_id="c1", is_visible=False))
+
+    assert index.search(["rust"])[0] == 2
+    assert index.search(["rust"], visible_only=False)[0] == 3
+    assert [hit[0] for hit in index.search(["rust"], categories={"c2"})[1]] == ["b"]
+    assert [hit[0] for hit in index.search(["rust"], tags={"t1"})[1]] == ["a"]
+    assert [hit[0] for hit in index.search(["rust"], author_id="u2")[1]] == ["b"]
+
+
+def test_updates_and_removals():
+    index = InvertedIndex()
+    index.add(_post("a", "Old title", "alpha"))
+    index.add(_post("a", "New title", "beta"))
+    assert index.search(["alpha"]) == (0, [])
+    assert index.search(["beta"])[0] == 1
+
+    index.remove("a")
+    assert len(index) == 0
+    assert index.search(["beta"]) == (0, [])
+
+    compacted, remap = index.renumbered()
+    compacted.copy_postings(index, list(index.postings), remap)
+    assert compacted.postings == {}
+    assert compacted.post_ids == []
+
+
+def test_renumbering_drops_dead_documents():
+    index = InvertedIndex()
+    for version in range(3):
+        index.add(_post("a", "Python", f"draft {version}"))
+    index.add(_post("b", "Gardening", "python tomatoes"))
+
+    compacted, remap = index.renumbered()
+    compacted.copy_postings(index, list(index.postings), remap)
+    assert compacted.post_ids == ["a", "b"]
+    assert len(compacted.title_lengths) == len(compacted.body_lengths) == 2
+    assert compacted.total_body_length == sum(compacted.body_lengths)
+    assert compacted.search(["python"]) == index.search(["python"])
+    assert compacted.search(["draft"])[0] == 1
+
+
+def test_paging_and_persistence():
+    index = InvertedIndex()
+    for number in range(5):
+        index.add(_post(str(number), f"Post {number}", "shared word"))
+    total, first = index.search(["shared"], limit=2)
+    _, second = index.search(["shared"], offset=2, limit=2)
+    assert total == 5
+    assert not {hit[0] for hit in first} & {hit[0] for hit in second}
+
+    restored = pickle.loads(pickle.dumps(index))
+    assert restored.search(["shared"], limit=2) == (total, first)
+
+
+def test_snippet_highlights_and_escapes():
+    snippet = make_snippet("Intro <b>text</b>. " * 20 + "The Zebra crossed.", ["zebra"], length=60)
+    assert "<mark>Zebra</mark>" in snippet
+    assert "&lt;b&gt;" in snippet
+    assert snippet.startswith("…")
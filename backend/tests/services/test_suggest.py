@@ -0,0 +1,64 @@
+import pickle
+
+from app.services.suggest import PrefixIndex
+
+
+def test_matches_any_word_prefix():
+    index = PrefixIndex()
+    index.add("1", "Learning Python", weight=1)
+    index.add("2", "Python tips", weight=2)
+    index.add("3", "Gardening", weight=3)
+
+    assert index.complete("pyth") == [("2", "Python tips"), ("1", "Learning Python")]
+    assert index.complete("learning py") == [("1", "Learning Python")]
+    assert index.complete("PYTHON T") == [("2", "Python tips")]
+    assert index.complete("rust") == []
+    assert index.complete("   ") == []
+
+
+def test_limit_and_updates():
+    index = PrefixIndex()
+    for number in range(10):
+        index.add(str(number), f"Post {number}", weight=number)
+    assert [entry_id for entry_id, _ in index.complete("post", limit=3)] == ["9", "8", "7"]
+
+    index.add("9", "Renamed", weight=9)
+    index.remove("8")
+    assert [entry_id for entry_id, _ in index.complete("post", limit=3)] == ["7", "6", "5"]
+    assert index.complete("ren") == [("9", "Renamed")]
+
+
+def test_replace_all_and_pickle():
+    index = PrefixIndex()
+    index.add("old", "Old name")
+    index.replace_all([("a", "Café", 5), ("b", "Cars", 1)])
+    assert index.complete("ca") == [("a", "Café"), ("b", "Cars")]
+    assert index.complete("old") == []
+
+    restored = pickle.loads(pickle.dumps(index))
+    assert restored.complete("caf") == [("a", "Café")]
+
+
+def test_cached_rankings_follow_writes():
+    index = PrefixIndex()
+    index.replace_all([(str(number), f"Post {number}", number) for number in range(5)])
+    assert [entry_id for entry_id, _ in index.complete("p", limit=2)] == ["4", "3"]
+
+    index.add("new", "Pinned post", weight=10)
+    assert [entry_id for entry_id, _ in index.complete("p", limit=2)] == ["new", "4"]
+    index.add("new", "Pinned post", weight=0)
+    assert [entry_id for entry_id, _ in index.complete("p", limit=2)] == ["4", "3"]
+    index.add("4", "Moved away", weight=4)
+    assert [entry_id for entry_id, _ in index.complete("p", limit=2)] == ["3", "2"]
+    index.remove("3")
+    assert [entry_id for entry_id, _ in index.complete("p", limit=2)] == ["2", "1"]
+
+
+def test_reweight_reranks_cached_prefixes():
+    index = PrefixIndex()
+    index.replace_all([("a", "Python", 1), ("b", "Pyramids", 2)])
+    assert [entry_id for entry_id, _ in index.complete("py")] == ["b", "a"]
+
+    assert index.reweight({"a": 5, "b": 2, "missing": 9}) == 1
+    assert [entry_id for entry_id, _ in index.complete("py")] == ["a", "b"]
+    assert index.complete("pyt") == [("a", "Python")]
@@ -0,0 +1,39 @@
+import pytest
+
+from app.services.posts import parse_fields, post_projection
+from app.services.text import make_excerpt, plain_text, summarize
+
+
+def test_excerpt_cuts_at_word_boundary():
+    text = "word " * 100
+    excerpt = make_excerpt(text, length=22)
+    assert excerpt == "word word word word…"
+    assert make_excerpt("  short\n\ntext  ") == "short text"
+
+
+def test_summarize_reading_stats():
+    summary = summarize("word " * 450)
+    assert summary["word_count"] == 450
+    assert summary["reading_time"] == 3
+    assert summarize("")["reading_time"] == 0
+
+
+def test_summaries_describe_the_text_without_markdown():
+    summary = summarize("# Hi\n\nSome **python** text, see [the docs](http://x) for `snake_case`")
+    assert summary["excerpt"] == "Hi Some python text, see the docs for snake_case"
+    assert summary["word_count"] == 9
+    assert plain_text("> quoted\n\n- item\n\n```py\ncode\n```").split() == ["quoted", "item", "code"]
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None
+    assert parse_fields("title, author_name") == {"id", "title", "author_name"}
+    assert "text" not in parse_fields(None, view="summary")
+    with pytest.raises(ValueError):
+        parse_fields("title,password")
+
+
+def test_projection_reads_derived_field_sources():
+    assert post_projection({"id", "title", "author_name", "tags_info"}) == {
+        "date": 1, "title": 1, "author_id": 1, "tags": 1,
+    }